@@ -0,0 +1,27 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import shutil
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		src = self.output + '/src'
+		shutil.copytree(self.input, src)
+		cache = ['--cacheDir', self.output + '/cache']
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--input', src, '--output', self.output + '/first.json'] + cache)
+
+		# Only the file declaring the parameters changes, the block in the other file refers to them.
+		with open(src + '/CacheBlockParameters.mon', 'a', encoding='utf8') as f:
+			print('/** Extra parameters. */\nevent CacheBlockExtra_$Parameters {\n\t/** Offset. */\n\tfloat offset;\n}', file=f)
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--input', src, '--output', self.output + '/edited.json'] + cache)
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--input', src, '--output', self.output + '/cached.json'] + cache)
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--input', src, '--output', self.output + '/uncached.json'])
+
+	def validate(self):
+		self.assertGrep('first.json', expr='"id": *"factor"')
+		self.assertDiff('edited.json', 'uncached.json', filedir1=self.output, filedir2=self.output)
+		self.assertDiff('cached.json', 'uncached.json', filedir1=self.output, filedir2=self.output)
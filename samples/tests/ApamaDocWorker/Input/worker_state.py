@@ -0,0 +1,43 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+# Usage: worker_state.py <sdk> <output directory>
+# Checks where the apamadoc worker is recorded, which records are trusted, and what a build does when the worker
+# accepts a request but never replies, using a fake worker rather than a JVM.
+import json, os, socket, subprocess, sys, tempfile
+from pathlib import Path
+
+sdk, output = sys.argv[1:3]
+sys.path.insert(0, os.path.join(sdk, 'scripts'))
+import apamadocWorker
+
+home = Path(output, 'home')
+os.environ['HOME'] = os.environ['USERPROFILE'] = os.environ['LOCALAPPDATA'] = str(home)
+for name in ['XDG_RUNTIME_DIR', 'XDG_CACHE_HOME', apamadocWorker.apamadocCache.CACHE_DIR_ENV]:
+	os.environ.pop(name, None)
+stateFile = apamadocWorker.state_file()
+print(f'state file in shared temporary directory: {stateFile.parent == Path(tempfile.gettempdir())}')
+print(f'state file in home directory: {home in stateFile.parents}')
+
+# a fake worker which accepts connections but never replies
+server = socket.socket()
+server.bind(('127.0.0.1', 0))
+server.listen(5)
+sleeper = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(600)'])
+state = {'pid': sleeper.pid, 'port': server.getsockname()[1], 'token': 'token', 'apamaHome': os.path.abspath(output)}
+
+def writeState(mode):
+	stateFile.parent.mkdir(parents=True, exist_ok=True)
+	stateFile.write_text(json.dumps(state), encoding='UTF8')
+	os.chmod(stateFile, mode)
+
+def generate():
+	return apamadocWorker.generate(output, output + '/apamadoc', output, output + '/out.log', output + '/err.log', timeout=2)
+
+if hasattr(os, 'getuid'):
+	writeState(0o644)
+	print(f'readable by others: generate returned {generate()}, state file kept {stateFile.exists()}')
+writeState(0o600)
+print(f'private: generate returned {generate()}, state file kept {stateFile.exists()}')
+print(f'worker stopped: {sleeper.wait(timeout=60) is not None}')
@@ -0,0 +1,26 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		self.startProcess(sys.executable, [self.input + '/worker_state.py', self.project.ANALYTICS_BUILDER_SDK, self.output],
+			stdout='worker_state.out', stderr='worker_state.err', displayName='worker_state',
+			environs=dict(os.environ, PYTHONDONTWRITEBYTECODE='true'))
+
+	def validate(self):
+		self.assertGrep('worker_state.out', expr='^state file in shared temporary directory: False$')
+		self.assertGrep('worker_state.out', expr='^state file in home directory: True$')
+		if not IS_WINDOWS:
+			# the record of a worker is ignored, and left alone, unless only the current user can read and write it
+			self.assertGrep('worker_state.out', expr='^readable by others: generate returned None, state file kept True$')
+		# the worker does not reply within the timeout, so it is stopped and forgotten, and the build runs apamadoc directly
+		self.assertOrderedGrep('worker_state.out', exprList=[
+			'^The apamadoc worker did not reply within 2 seconds, so stopping it and running apamadoc directly$',
+			'^private: generate returned None, state file kept False$',
+			'^worker stopped: True$',
+		])
@@ -0,0 +1,41 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import json, shutil
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		process = self.runAnalyticsBuilderScript(['build', 'metadata', '--native', '--jobs', '2',
+			'--input', self.input + '/first', '--output', self.output + '/first.json',
+			'--input', self.input + '/second', '--output', self.output + '/second.json',
+			'--profile', self.output + '/profile.json'])
+		shutil.copyfile(process.stdout, self.output + '/batch.out')
+
+		# Write out the name of each phase, and whether it is within the time of the command, one per line.
+		with open(self.output + '/profile.json', encoding='utf8') as f:
+			phases = json.load(f)['phases']
+		commandEnd = phases[0]['startSeconds'] + phases[0]['wallSeconds']
+		with open(self.output + '/phases.txt', 'w', encoding='utf8') as f:
+			for phase in phases:
+				# allow for the clocks of the processes differing slightly
+				within = phase['startSeconds'] >= -0.1 and phase['startSeconds'] + phase['wallSeconds'] <= commandEnd + 0.1
+				print(f'{phase["name"]}: {within}', file=f)
+
+	def validate(self):
+		self.assertGrep('batch.out', expr='^OK .*first: created .*first.json$')
+		self.assertGrep('batch.out', expr='^OK .*second: created .*second.json$')
+		self.assertGrep('first.json', expr='"id": *"apamax.analyticsbuilder.test.FirstBlock"')
+		self.assertGrep('second.json', expr='"id": *"apamax.analyticsbuilder.test.SecondBlock"')
+
+		# the phases of each catalog are inside the command, and within its time
+		self.assertGrep('phases.txt', expr='^build metadata: True$')
+		for catalog in ['catalog 0', 'catalog 1']:
+			self.assertGrep('phases.txt', expr=f'^build metadata/{catalog}: True$')
+			self.assertGrep('phases.txt', expr=f'^build metadata/{catalog}/find files: True$')
+			self.assertGrep('phases.txt', expr=f'^build metadata/{catalog}/extract blocks: True$')
+			self.assertGrep('phases.txt', expr=f'^build metadata/{catalog}/write JSON: True$')
+		self.assertGrep('phases.txt', expr=': False$', contains=False)
@@ -0,0 +1,56 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import json, shutil
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		process = self.runAnalyticsBuilderScript(['benchmark', 'extension', '--sizes', '10', '--repeat', '1', '--native', '--output', self.output + '/results.json'])
+		shutil.copyfile(process.stdout, self.output + '/extension.out')
+
+		# Write out the metrics and phases of each benchmark, one per line.
+		with open(self.output + '/results.json', encoding='utf8') as f:
+			results = json.load(f)
+		with open(self.output + '/metrics.txt', 'w', encoding='utf8') as f:
+			for size, benchmarks in results['results'].items():
+				for name, result in benchmarks.items():
+					print(f'{size} {name}: ' + ' '.join(sorted(result)), file=f)
+					for phase in result['phases']:
+						print(f'{size} {name} phase: {phase}', file=f)
+
+		process = self.runAnalyticsBuilderScript(['benchmark', 'compare', '--baseline', self.output + '/results.json', '--current', self.output + '/results.json'])
+		shutil.copyfile(process.stdout, self.output + '/compare_same.out')
+
+		# a baseline with half the zip size of the results, which are then regressions
+		for benchmarks in results['results'].values():
+			for result in benchmarks.values():
+				result['zipBytes'] //= 2
+		with open(self.output + '/smaller.json', 'w', encoding='utf8') as f:
+			json.dump(results, f)
+		process = self.runAnalyticsBuilderScript(['benchmark', 'compare', '--baseline', self.output + '/smaller.json', '--current', self.output + '/results.json'], ignoreExitStatus=True)
+		shutil.copyfile(process.stdout, self.output + '/compare_smaller.out')
+		shutil.copyfile(process.stderr, self.output + '/compare_smaller.err')
+
+	def validate(self):
+		self.assertOrderedGrep('extension.out', exprList=[
+			'^ +10 blocks +build extension +[0-9.]+ s +[0-9]+ bytes +[0-9]+ bytes zip$',
+			'^ +10 blocks +build extension --cdp +[0-9.]+ s +[0-9]+ bytes +[0-9]+ bytes zip$',
+			'^Created .*results.json$',
+		])
+		for name in ['build extension', 'build extension --cdp']:
+			self.assertGrep('metrics.txt', expr=f'^10 {name}: peakBytes phases processPeakRSSBytes seconds zipBytes$')
+			self.assertGrep('metrics.txt', expr=f'^10 {name} phase: metadata$')
+			self.assertGrep('metrics.txt', expr=f'^10 {name} phase: zip$')
+		self.assertGrep('metrics.txt', expr='^10 build extension --cdp phase: package CDP$')
+		self.assertGrep('metrics.txt', expr='^10 build extension phase: package CDP$', contains=False)
+
+		self.assertGrep('compare_same.out', expr='^No benchmark regressions of more than 10%$')
+		self.assertOrderedGrep('compare_smaller.out', exprList=[
+			'^REGRESSION  10 blocks, build extension: zipBytes [0-9]+ is 10[0-9]% more than the baseline [0-9]+$',
+			'^REGRESSION  10 blocks, build extension --cdp: zipBytes [0-9]+ is 10[0-9]% more than the baseline [0-9]+$',
+		])
+		self.assertGrep('compare_smaller.err', expr='^Command failed: 2 benchmark regression\\(s\\) of more than 10%$')
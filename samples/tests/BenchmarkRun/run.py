@@ -0,0 +1,45 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import json, shutil
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		process = self.runAnalyticsBuilderScript(['benchmark', 'run', '--sizes', '10', '--repeat', '1', '--output', self.output + '/results.json'])
+		shutil.copyfile(process.stdout, self.output + '/run.out')
+
+		# Write out the metrics of each benchmark, one per line.
+		with open(self.output + '/results.json', encoding='utf8') as f:
+			results = json.load(f)
+		with open(self.output + '/metrics.txt', 'w', encoding='utf8') as f:
+			for size, benchmarks in results['results'].items():
+				for name, result in benchmarks.items():
+					print(f'{size} {name}: ' + ' '.join(sorted(result)), file=f)
+
+		process = self.runAnalyticsBuilderScript(['benchmark', 'compare', '--baseline', self.output + '/results.json', '--current', self.output + '/results.json'])
+		shutil.copyfile(process.stdout, self.output + '/compare_same.out')
+
+		# a baseline ten times faster than the results, which are then regressions
+		for benchmarks in results['results'].values():
+			for result in benchmarks.values():
+				result['seconds'] /= 10
+		with open(self.output + '/faster.json', 'w', encoding='utf8') as f:
+			json.dump(results, f)
+		process = self.runAnalyticsBuilderScript(['benchmark', 'compare', '--baseline', self.output + '/faster.json', '--current', self.output + '/results.json'], ignoreExitStatus=True)
+		shutil.copyfile(process.stdout, self.output + '/compare_faster.out')
+		shutil.copyfile(process.stderr, self.output + '/compare_faster.err')
+
+	def validate(self):
+		self.assertGrep('run.out', expr='^ +10 blocks +getAllValidBlockElements +[0-9.]+ s +[0-9]+ bytes$')
+		self.assertGrep('run.out', expr='^Created .*results.json$')
+		for name in ['getAllValidBlockElements', 'getAllValidBlockElementsFromFile', 'extract messages', 'write JSON']:
+			self.assertGrep('metrics.txt', expr=f'^10 {name}: peakBytes seconds$')
+
+		self.assertGrep('compare_same.out', expr='^No benchmark regressions of more than 10%$')
+		self.assertGrep('compare_faster.out', expr='^REGRESSION  10 blocks, getAllValidBlockElements: seconds .* is [0-9]+% more than the baseline ')
+		self.assertGrep('compare_faster.out', expr='^REGRESSION  10 blocks, .*: peakBytes', contains=False)
+		self.assertGrep('compare_faster.err', expr='^Command failed: 4 benchmark regression\\(s\\) of more than 10%$')
@@ -0,0 +1,17 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+# Usage: build_workspace.py <sdk> <workspace manifest> <temporary directory>
+# Builds a workspace without the checks of the analytics_builder script, and prints why it failed.
+import os, sys
+
+sdk, manifest, tmpDir = sys.argv[1:4]
+sys.path.insert(0, os.path.join(sdk, 'scripts'))
+import buildWorkspace
+
+try:
+	buildWorkspace.build_workspace(buildWorkspace.read_workspace(manifest), tmpDir, printMsg=True)
+	print('Built')
+except Exception as e:
+	print(f'Failed: {e}')
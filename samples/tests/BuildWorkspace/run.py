@@ -0,0 +1,46 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import shutil, zipfile
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		workspace = self.output + '/workspace'
+		shutil.copytree(self.input, workspace)
+		process = self.runAnalyticsBuilderScript(['build', 'workspace', '--manifest', workspace + '/workspace.json', '--jobs', '2'])
+		shutil.copyfile(process.stdout, self.output + '/workspace.out')
+		for name in ['First', 'Second']:
+			with zipfile.ZipFile(f'{workspace}/out/{name}.zip') as zf, open(f'{self.output}/{name}.txt', 'w', encoding='utf8') as f:
+				for entry in sorted(zf.namelist()):
+					print(f'{entry}: {zf.read(entry).decode("utf8", errors="replace")}', file=f)
+
+		# a problem shared by every extension fails the build before any of them is built
+		shutil.rmtree(workspace + '/out')
+		process = self.runAnalyticsBuilderScript(['build', 'workspace', '--manifest', workspace + '/workspace.json'],
+			environs={'APAMA_HOME': ''}, ignoreExitStatus=True)
+		shutil.copyfile(process.stderr, self.output + '/no_apama_home.err')
+		self.startProcess(sys.executable, [self.input + '/build_workspace.py', self.project.ANALYTICS_BUILDER_SDK, workspace + '/workspace.json', self.output + '/tmp'],
+			stdout='build_workspace.out', stderr='build_workspace.err', displayName='build_workspace',
+			environs=dict(os.environ, APAMA_HOME='', PYTHONDONTWRITEBYTECODE='true'))
+		with open(self.output + '/no_apama_home_outputs.txt', 'w', encoding='utf8') as f:
+			print('\n'.join(sorted(os.listdir(workspace))), file=f)
+
+	def validate(self):
+		self.assertOrderedGrep('workspace.out', exprList=[
+			'^OK .*first: created .*First.zip$',
+			'^OK .*second: created .*Second.zip$',
+			'^Built 2 of 2 extensions in ',
+		])
+		self.assertGrep('First.txt', expr='^files/events/.*_metadata.evt: .*FirstBlock')
+		self.assertGrep('First.txt', expr='SecondBlock', contains=False)
+		self.assertGrep('Second.txt', expr='^files/events/.*_metadata.evt: .*SecondBlock')
+		self.assertGrep('Second.txt', expr='FirstBlock', contains=False)
+		self.assertGrep('Second.txt', expr='^priority.txt: 2$')
+
+		self.assertGrep('no_apama_home.err', expr='^Command failed: Please run this script from an apama_env shell or Apama Command Prompt.$')
+		self.assertGrep('build_workspace.out', expr='^Failed: APAMA_HOME is not set or does not exist. ')
+		self.assertGrep('no_apama_home_outputs.txt', expr='^out$', contains=False)
@@ -0,0 +1,54 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import shutil, zipfile
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		src = self.output + '/src'
+		shutil.copytree(self.input, src)
+		self.build(src, 'first')
+		self.build(src, 'unchanged')
+
+		with open(src + '/SecondBlock.mon', 'a', encoding='utf8') as f:
+			f.write('\n// changed\n')
+		self.build(src, 'changed')
+
+	def build(self, src, name):
+		"""Build the extension with a CDP file per package in the <name> directory, writing the CDP inputs it lists to <name>.out and the files of the zip to <name>.txt."""
+		zip = f'{self.output}/{name}/PerPackage.zip'
+		process = self.runAnalyticsBuilderScript(['build', 'extension', '--native', '--input', src, '--output', zip,
+			'--cdp', '--cdpPerPackage', '--listCdpInputs', '--cacheDir', self.output + '/cache', '--tmpDir', f'{self.output}/tmp_{name}'])
+		shutil.copyfile(process.stdout, f'{self.output}/{name}.out')
+		with zipfile.ZipFile(zip) as zf, open(f'{self.output}/{name}.txt', 'w', encoding='utf8') as f:
+			for entry in sorted(zf.namelist()):
+				print(entry, file=f)
+
+	def validate(self):
+		# one CDP file per EPL package, each packaged from the mon files of its package
+		self.assertOrderedGrep('first.txt', exprList=[
+			'^files/PerPackage_apamax.analyticsbuilder.test.first.cdp$',
+			'^files/PerPackage_apamax.analyticsbuilder.test.second.cdp$',
+		])
+		self.assertGrep('first.txt', expr='\\.mon$', contains=False)
+		self.assertOrderedGrep('first.out', exprList=[
+			'^PerPackage_apamax.analyticsbuilder.test.first.cdp packaged from:$',
+			'^  FirstBlock.mon$',
+			'^PerPackage_apamax.analyticsbuilder.test.second.cdp packaged from:$',
+			'^  SecondBlock.mon$',
+			'^  ThirdBlock.mon$',
+		])
+		self.assertGrep('first.out', expr='\\(cached\\)', contains=False)
+
+		# nothing changed, so both are reused
+		self.assertGrep('unchanged.out', expr='^PerPackage_apamax.analyticsbuilder.test.first.cdp \\(cached\\) packaged from:$')
+		self.assertGrep('unchanged.out', expr='^PerPackage_apamax.analyticsbuilder.test.second.cdp \\(cached\\) packaged from:$')
+
+		# only the CDP file of the changed package is packaged again
+		self.assertGrep('changed.out', expr='^PerPackage_apamax.analyticsbuilder.test.first.cdp \\(cached\\) packaged from:$')
+		self.assertGrep('changed.out', expr='^PerPackage_apamax.analyticsbuilder.test.second.cdp packaged from:$')
+		self.assertDiff('changed.txt', 'first.txt', filedir1=self.output, filedir2=self.output)
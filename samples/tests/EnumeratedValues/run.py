@@ -0,0 +1,32 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import json
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--input', self.input, '--output', self.output + '/metadata.json'])
+
+		# Write out the enumerated values of each parameter, one per line.
+		with open(self.output + '/metadata.json', encoding='utf8') as f:
+			metadata = json.load(f)
+		with open(self.output + '/enums.txt', 'w', encoding='utf8') as f:
+			for block in metadata['analytics']:
+				for parameter in block['parameters']:
+					for enum in parameter.get('enumeratedValues', []):
+						print(f'{parameter["id"]}: {enum["id"]} = {enum["value"]}', file=f)
+
+	def validate(self):
+		# The longest matching prefix wins.
+		self.assertOrderedGrep('enums.txt', exprList=['^mode: FAST = fast$', '^mode: SLOW = slow$'])
+		self.assertOrderedGrep('enums.txt', exprList=['^mode_level: HIGH = high$', '^mode_level: LOW = low$'])
+		self.assertGrep('enums.txt', expr='^mode: level_', contains=False)
+
+		# Only constants of the same type as the parameter are matched.
+		self.assertGrep('enums.txt', expr='^count: ONE = 1$')
+		self.assertGrep('enums.txt', expr='OTHER', contains=False)
+		self.assertGrep('enums.txt', expr='unknown', contains=False)
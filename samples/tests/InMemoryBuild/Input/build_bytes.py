@@ -0,0 +1,25 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+# Usage: build_bytes.py <sdk> <input directory> <output directory>
+# Builds the extension in memory from the directory and from a dictionary of its files, writing each zip and its SHA-256.
+import hashlib, os, sys, tempfile
+from pathlib import Path
+
+sdk, input, output = sys.argv[1:4]
+sys.path.insert(0, os.path.join(sdk, 'scripts'))
+import buildExtension
+
+files = {f.relative_to(input).as_posix(): f.read_bytes() for f in Path(input).rglob('*') if f.is_file()}
+builds = [
+	# apamadoc needs the files on disk, so this uses a temporary directory
+	('directory', buildExtension.build_extension_bytes(input, 'InMemory')),
+	('dictionary', buildExtension.build_extension_bytes(files, 'InMemory', native=True)),
+]
+for label, result in builds:
+	Path(output, label).mkdir(parents=True, exist_ok=True)
+	Path(output, label, 'InMemory.zip').write_bytes(result.zip_bytes)
+	print(f'{label}: {hashlib.sha256(result.zip_bytes).hexdigest()}')
+	print(f'{label} digest: {result.digest}')
+print(f'temporary files: {len(os.listdir(tempfile.gettempdir()))}')
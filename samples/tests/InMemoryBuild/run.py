@@ -0,0 +1,33 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import hashlib, json, zipfile
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		blocks = self.input + '/blocks'
+		# An empty temporary directory for the in-memory builds, which they must leave empty.
+		tmp = self.output + '/tmp'
+		os.makedirs(tmp)
+		self.startProcess(sys.executable, [self.input + '/build_bytes.py', self.project.ANALYTICS_BUILDER_SDK, blocks, self.output + '/bytes'],
+			stdout='build_bytes.out', stderr='build_bytes.err', displayName='build_bytes',
+			environs=dict(os.environ, PYTHONDONTWRITEBYTECODE='true', TMPDIR=tmp, TEMP=tmp, TMP=tmp))
+
+		with open(self.output + '/disk.out', 'w', encoding='utf8') as f:
+			for label, args in [('directory', []), ('dictionary', ['--native'])]:
+				zip = f'{self.output}/disk/{label}/InMemory.zip'
+				self.runAnalyticsBuilderScript(['build', 'extension', '--input', blocks, '--output', zip, '--tmpDir', f'{self.output}/tmp_{label}'] + args)
+				with open(zip, 'rb') as z:
+					print(f'{label}: {hashlib.sha256(z.read()).hexdigest()}', file=f)
+				with zipfile.ZipFile(zip) as z:
+					print(f'{label} digest: {json.loads(z.read("extension-manifest.json").decode("utf8"))["digest"]}', file=f)
+
+	def validate(self):
+		self.assertGrep('build_bytes.out', expr='^temporary files: 0$')
+		self.assertOrderedGrep('build_bytes.out', exprList=['^directory: [0-9a-f]{64}$', '^directory digest: ', '^dictionary: [0-9a-f]{64}$', '^dictionary digest: '])
+		self.assertDiff('build_bytes.out', 'disk.out', filedir1=self.output, filedir2=self.output,
+			ignores=['^temporary files: '])
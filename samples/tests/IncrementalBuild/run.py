@@ -0,0 +1,49 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import os, shutil, zipfile
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		src = self.output + '/src'
+		shutil.copytree(self.input, src)
+		self.build(src, 'first', incremental=True)
+
+		os.remove(src + '/SecondBlock.mon')
+		os.remove(src + '/Extra.evt')
+		self.build(src, 'some_deleted', incremental=True)
+		self.build(src, 'some_deleted_clean')
+
+		os.remove(src + '/FirstBlock.mon')
+		self.build(src, 'all_deleted', incremental=True)
+		self.build(src, 'all_deleted_clean')
+
+	def build(self, src, name, incremental=False):
+		"""Build the extension in the <name> directory, and write the names and contents of its files to <name>.txt."""
+		# The name of the zip is the name of the extension, so is the same for every build.
+		zip = f'{self.output}/{name}/Incremental.zip'
+		args = ['build', 'extension', '--native', '--input', src, '--output', zip]
+		if incremental:
+			args += ['--incremental', '--tmpDir', self.output + '/staging']
+		else:
+			args += ['--tmpDir', f'{self.output}/tmp_{name}']
+		self.runAnalyticsBuilderScript(args)
+		with zipfile.ZipFile(zip) as zf, open(f'{self.output}/{name}.txt', 'w', encoding='utf8') as f:
+			for entry in sorted(zf.namelist()):
+				print(f'{entry}: {zf.read(entry).decode("utf8", errors="replace")}', file=f)
+
+	def validate(self):
+		self.assertGrep('first.txt', expr='^files/events/.*_metadata.evt: .*SecondBlock')
+		self.assertGrep('first.txt', expr='^files/Extra.evt: ')
+
+		self.assertDiff('some_deleted.txt', 'some_deleted_clean.txt', filedir1=self.output, filedir2=self.output)
+		self.assertGrep('some_deleted.txt', expr='SecondBlock', contains=False)
+		self.assertGrep('some_deleted.txt', expr='Extra', contains=False)
+
+		self.assertDiff('all_deleted.txt', 'all_deleted_clean.txt', filedir1=self.output, filedir2=self.output)
+		self.assertGrep('all_deleted.txt', expr='_metadata.evt', contains=False)
+		self.assertGrep('all_deleted.txt', expr='FirstBlock', contains=False)
@@ -0,0 +1,80 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import json, os
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		with open(self.input + '/EN/Shards.json', encoding='utf8') as f:
+			metadata = json.load(f)
+		with open(self.input + '/Shards-messages.json', encoding='utf8') as f:
+			messages = json.load(f)
+		blockSizes = [self.blockSize(block) for block in metadata['analytics']]
+		messageSizes = [self.messageSize(item) for item in messages.items()]
+		limits = {
+			'none': None,
+			'one': 1,
+			'twoBlocks': blockSizes[0] + blockSizes[1],
+			'twoBlocksMinusOne': blockSizes[0] + blockSizes[1] - 1,
+			'twoMessages': messageSizes[0] + messageSizes[1],
+			'twoMessagesMinusOne': messageSizes[0] + messageSizes[1] - 1,
+			'all': 1000000,
+		}
+
+		with open(self.output + '/shards.txt', 'w', encoding='utf8') as summary:
+			for label, limit in limits.items():
+				packed = f'{self.output}/packed_{label}'
+				extracted = f'{self.output}/extracted_{label}'
+				self.runAnalyticsBuilderScript(['json', 'pack', '--input', self.input, '--output', packed, '--name', 'Shards']
+					+ (['--maxEventSize', str(limit)] if limit else []))
+				self.runAnalyticsBuilderScript(['json', 'extract', '--input', packed, '--output', extracted])
+
+				for kind, evtFile, original, jsonFile, items, sizeOf in [
+						('metadata', 'Shards_metadata.evt', metadata, 'EN/Shards.json', lambda shard: shard['analytics'], self.blockSize),
+						('messages', 'Shards_messages.evt', messages, 'EN/Shards-messages.json', lambda shard: shard.items(), self.messageSize)]:
+					shards = [items(shard) for shard in self.readShards(os.path.join(packed, 'events', evtFile))]
+					# Only a shard holding a single item, which is larger than the limit on its own, may exceed it.
+					oversized = [s for s in shards if limit and len(s) > 1 and sum(map(sizeOf, s)) > limit]
+					with open(os.path.join(extracted, jsonFile), encoding='utf8') as f:
+						roundTrip = 'ok' if json.load(f) == original else 'differs'
+					print(f'{kind} {label}: shards={len(shards)} oversized={len(oversized)} roundTrip={roundTrip}', file=summary)
+
+	# The sizes used for sharding: the compact JSON of each block with a separating comma, and of each message as an object.
+	def blockSize(self, block):
+		return len(json.dumps(block, separators=(',', ':'))) + 1
+
+	def messageSize(self, item):
+		return len(json.dumps(dict([item]), separators=(',', ':')))
+
+	def readShards(self, evtFile):
+		"""Return the JSON of each event in an evt file."""
+		shards = []
+		with open(evtFile, encoding='utf8') as f:
+			for line in f:
+				line = line.rstrip('\r\n')
+				if '(' in line:
+					(_, _, jsonstr) = json.loads('[' + line.split('(', 1)[1][0:-1] + ']')
+					shards.append(json.loads(jsonstr))
+		return shards
+
+	def validate(self):
+		for label in ['none', 'one', 'twoBlocks', 'twoBlocksMinusOne', 'twoMessages', 'twoMessagesMinusOne', 'all']:
+			self.assertGrep('shards.txt', expr=f'^metadata {label}: .* oversized=0 roundTrip=ok$')
+			self.assertGrep('shards.txt', expr=f'^messages {label}: .* oversized=0 roundTrip=ok$')
+
+		self.assertGrep('shards.txt', expr='^metadata none: shards=1 ')
+		self.assertGrep('shards.txt', expr='^messages none: shards=1 ')
+		self.assertGrep('shards.txt', expr='^metadata all: shards=1 ')
+		self.assertGrep('shards.txt', expr='^messages all: shards=1 ')
+		# every item on its own, even though each is larger than the limit
+		self.assertGrep('shards.txt', expr='^metadata one: shards=3 ')
+		self.assertGrep('shards.txt', expr='^messages one: shards=4 ')
+		# the first two items just fit in one event, and the large third item is on its own
+		self.assertGrep('shards.txt', expr='^metadata twoBlocks: shards=2 ')
+		self.assertGrep('shards.txt', expr='^metadata twoBlocksMinusOne: shards=3 ')
+		self.assertGrep('shards.txt', expr='^messages twoMessages: shards=3 ')
+		self.assertGrep('shards.txt', expr='^messages twoMessagesMinusOne: shards=4 ')
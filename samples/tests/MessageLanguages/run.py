@@ -0,0 +1,51 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import os, shutil, zipfile
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		src = self.output + '/src'
+		shutil.copytree(self.input, src)
+		self.build(src, 'first', incremental=True)
+
+		os.remove(src + '/messages_de.json')
+		self.build(src, 'deleted', incremental=True)
+		self.build(src, 'deleted_clean')
+
+	def build(self, src, name, incremental=False):
+		"""Build the extension in the <name> directory, writing its output to <name>.out and the names and contents of its evt files to <name>.txt."""
+		# The name of the zip is the name of the extension, so is the same for every build.
+		zip = f'{self.output}/{name}/Translated.zip'
+		args = ['build', 'extension', '--native', '--input', src, '--output', zip]
+		if incremental:
+			args += ['--incremental', '--tmpDir', self.output + '/staging']
+		else:
+			args += ['--tmpDir', f'{self.output}/tmp_{name}']
+		process = self.runAnalyticsBuilderScript(args)
+		shutil.copyfile(process.stdout, f'{self.output}/{name}.out')
+		with zipfile.ZipFile(zip) as zf, open(f'{self.output}/{name}.txt', 'w', encoding='utf8') as f:
+			for entry in sorted(zf.namelist()):
+				if entry.endswith('.evt'):
+					print(f'{entry}: {zf.read(entry).decode("utf8")}', file=f)
+
+	def validate(self):
+		# The English messages include those from the messages file, and the other languages have their own evt file.
+		self.assertGrep('first.txt', expr='^files/events/Translated_messages.evt: apama.analyticsbuilder.BlockMessages\("Translated", "EN", .*Goodbye')
+		self.assertGrep('first.txt', expr='^files/events/Translated_messages_FR.evt: apama.analyticsbuilder.BlockMessages\("Translated", "FR", .*Bonjour')
+		self.assertGrep('first.txt', expr='^files/events/Translated_messages_DE.evt: apama.analyticsbuilder.BlockMessages\("Translated", "DE", .*Auf Wiedersehen')
+		self.assertGrep('first.txt', expr='^files/events/Translated_messages.evt: .*(Bonjour|Hallo)', contains=False)
+
+		# Missing and unknown translations are reported.
+		self.assertGrep('first.out', expr='^Language FR is missing [0-9]+ of the [0-9]+ EN messages: .*apamax.analyticsbuilder.test.Translated.farewell')
+		self.assertGrep('first.out', expr='^Language FR has 1 messages which are not EN messages: apamax.analyticsbuilder.test.Translated.unknown$')
+		self.assertGrep('first.out', expr='^Language DE has ', contains=False)
+
+		# Deleting the messages file of a language removes its evt file.
+		self.assertGrep('deleted.txt', expr='_messages_DE.evt', contains=False)
+		self.assertGrep('deleted.txt', expr='^files/events/Translated_messages_FR.evt: ')
+		self.assertDiff('deleted.txt', 'deleted_clean.txt', filedir1=self.output, filedir2=self.output)
@@ -0,0 +1,45 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import json, shutil
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		# Generates the metadata with apamadoc and fails if the native extractor differs from it.
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--checkNative', '--input', self.input, '--output', self.output + '/apamadoc.json'])
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--native', '--input', self.input, '--output', self.output + '/native.json'])
+		# The sample blocks include a multi-line <code> element and inputs of type Value.
+		samples = self.project.ANALYTICS_BUILDER_SDK + '/samples/blocks'
+		process = self.runAnalyticsBuilderScript(['build', 'metadata', '--checkNative', '--input', samples, '--output', self.output + '/samples_apamadoc.json'])
+		shutil.copyfile(process.stdout, self.output + '/samples_check.out')
+		self.runAnalyticsBuilderScript(['build', 'metadata', '--native', '--input', samples, '--output', self.output + '/samples_native.json'])
+
+		# Write out the parameters of the block, one per line.
+		with open(self.output + '/native.json', encoding='utf8') as f:
+			metadata = json.load(f)
+		with open(self.output + '/parameters.txt', 'w', encoding='utf8') as f:
+			for block in metadata['analytics']:
+				for parameter in block['parameters']:
+					print(f'{parameter["id"]}: {parameter["type"]}', file=f)
+
+		# Write out the extended description and input types of the HTTPOutput sample block.
+		with open(self.output + '/samples_native.json', encoding='utf8') as f:
+			metadata = json.load(f)
+		with open(self.output + '/httpOutput.txt', 'w', encoding='utf8') as f:
+			for block in metadata['analytics']:
+				if block['id'] == 'apamax.analyticsbuilder.samples.HTTPOutput':
+					print(block['extendedDescription'], file=f)
+					for input in block['inputs']:
+						print(f'input {input["id"]}: {input["type"]}', file=f)
+
+	def validate(self):
+		self.assertGrep('analytics_builder.out', expr='Native metadata extraction matches apamadoc')
+		self.assertGrep('samples_check.out', expr='Native metadata extraction matches apamadoc')
+		self.assertOrderedGrep('parameters.txt', exprList=['^lower: ', '^upper: ', '^label: ', '^scale: '])
+		self.assertGrep('parameters.txt', expr='^(action|create|timeFormat|import)', contains=False)
+		self.assertOrderedGrep('httpOutput.txt', exprList=['^An example of HTTP request from the block: <pre>$', '^Content-Type: application/json$', '^modelName":"model_0",$', '^</pre>$', '^input value: any$'])
+		self.assertGrep('httpOutput.txt', expr='<code>', contains=False)
@@ -0,0 +1,21 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+# Usage: extract_inputs.py <sdk> <structure.xml>
+# Prints the inputs of each block of a structure.xml, extracted by parsing and by streaming it.
+import os, sys
+import xml.etree.ElementTree as ElementTree
+
+sdk, xmlPath = sys.argv[1:3]
+sys.path.insert(0, os.path.join(sdk, 'scripts'))
+import blockMetadataGenerator
+
+generator = blockMetadataGenerator.BlockGenerator()
+for (kind, blocks) in [
+	('parsed', generator.getAllValidBlockElements(ElementTree.parse(xmlPath).getroot())),
+	('streamed', generator.getAllValidBlockElementsFromFile(xmlPath)),
+]:
+	for block in blocks:
+		for input in block['inputs']:
+			print(f'{kind} {block["id"]}: {input["id"]} {input["type"]} "{input["name"]}"')
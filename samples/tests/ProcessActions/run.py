@@ -0,0 +1,21 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		self.startProcess(sys.executable, [self.input + '/extract_inputs.py', self.project.ANALYTICS_BUILDER_SDK, self.input + '/structure.xml'],
+			stdout='extract_inputs.out', stderr='extract_inputs.err', displayName='extract_inputs',
+			environs=dict(os.environ, PYTHONDONTWRITEBYTECODE='true'))
+
+	def validate(self):
+		# the inputs of both actions, in order, each named by the $inputName tag on the other action
+		for kind in ['parsed', 'streamed']:
+			self.assertOrderedGrep('extract_inputs.out', exprList=[
+				f'^{kind} apamax.analyticsbuilder.test.TwoProcessBlock: value float "Value Input"$',
+				f'^{kind} apamax.analyticsbuilder.test.TwoProcessBlock: extra boolean "Extra Input"$',
+			])
@@ -0,0 +1,53 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import json, shutil
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		process = self.runAnalyticsBuilderScript(['build', 'extension', '--native', '--input', self.input, '--output', self.output + '/Profiled.zip',
+			'--profile', self.output + '/profile.json', '--profileSummary'])
+		shutil.copyfile(process.stdout, self.output + '/summary.out')
+		self.writeSchema('profile')
+
+		# the report is written even if the command fails
+		self.runAnalyticsBuilderScript(['build', 'extension', '--native', '--input', self.output + '/missing', '--output', self.output + '/Failed.zip',
+			'--profile', self.output + '/failed.json'], ignoreExitStatus=True)
+		self.writeSchema('failed')
+
+	def writeSchema(self, name):
+		"""Write the keys and value types of the <name>.json report, and of each of its phases, to <name>_schema.txt."""
+		with open(f'{self.output}/{name}.json', encoding='utf8') as f:
+			report = json.load(f)
+		with open(f'{self.output}/{name}_schema.txt', 'w', encoding='utf8') as f:
+			print(' '.join(f'{key}:{type(value).__name__}' for key, value in report.items()), file=f)
+			for phase in report['phases']:
+				print(phase['name'] + ' ' + ' '.join(f'{key}:{type(value).__name__}' for key, value in phase.items() if key != 'name'), file=f)
+
+	def validate(self):
+		self.assertGrep('profile_schema.txt', expr='^command:str python:str platform:str startTime:float phases:list$')
+		# the numbers are int or float in JSON depending on their value, and the peak RSS and bytes are null on some platforms
+		number = '(int|float)'
+		optional = '(int|NoneType)'
+		phase = (f' startSeconds:{number} wallSeconds:{number} cpuSeconds:{number} childCpuSeconds:{number}'
+			f' processPeakRSSBytes:{optional} childProcessPeakRSSBytes:{optional} readBytes:{optional} writeBytes:{optional}$')
+		self.assertOrderedGrep('profile_schema.txt', exprList=[
+			'^build extension' + phase,
+			'^build extension/find files' + phase,
+			'^build extension/metadata' + phase,
+			'^build extension/zip' + phase,
+		])
+		self.assertGrep('profile.json', expr='"command": "build extension"')
+
+		self.assertGrep('failed_schema.txt', expr='^command:str python:str platform:str startTime:float phases:list$')
+		self.assertGrep('failed_schema.txt', expr='^build extension' + phase)
+
+		self.assertOrderedGrep('summary.out', exprList=[
+			'^Phase +Wall\\(s\\) +CPU\\(s\\) +Child\\(s\\) +MaxRSS\\(MB\\) +Read\\(MB\\) +Write\\(MB\\)$',
+			'^build extension +[0-9.]+ +[0-9.]+ +[0-9.]+ +[0-9.-]+ +[0-9.-]+ +[0-9.-]+$',
+			'^build extension/zip +[0-9.]+ ',
+		])
@@ -0,0 +1,39 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import hashlib, os, shutil, time
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	COMPRESSION = {'default': [], 'stored': ['--compression', '0'], 'best': ['--compression', '9']}
+
+	def execute(self):
+		src = self.output + '/src'
+		shutil.copytree(self.input, src)
+		self.buildAll(src, 'first')
+
+		# Change the modification times of the input files, which must not change the zip.
+		later = time.time() + 3600
+		for f in os.listdir(src):
+			os.utime(os.path.join(src, f), (later, later))
+		self.buildAll(src, 'second')
+
+	def buildAll(self, src, run):
+		"""Build the extension at each compression level, writing the SHA-256 of each zip to <run>.sha256."""
+		with open(f'{self.output}/{run}.sha256', 'w', encoding='utf8') as f:
+			for label, args in self.COMPRESSION.items():
+				# The name of the zip is the name of the extension, so is the same for both runs.
+				zip = f'{self.output}/{run}_{label}/Reproducible.zip'
+				self.runAnalyticsBuilderScript(['build', 'extension', '--native', '--input', src, '--output', zip,
+					'--tmpDir', f'{self.output}/tmp_{run}_{label}'] + args)
+				with open(zip, 'rb') as z:
+					print(f'{label}: {hashlib.sha256(z.read()).hexdigest()}', file=f)
+
+	def validate(self):
+		self.assertDiff('first.sha256', 'second.sha256', filedir1=self.output, filedir2=self.output)
+		self.assertGrep('first.sha256', expr='^default: [0-9a-f]{64}$')
+		self.assertGrep('first.sha256', expr='^stored: [0-9a-f]{64}$')
+		self.assertGrep('first.sha256', expr='^best: [0-9a-f]{64}$')
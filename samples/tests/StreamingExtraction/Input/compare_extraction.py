@@ -0,0 +1,43 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+# Usage: compare_extraction.py <sdk> <output directory>
+# Writes a structure.xml for the sample blocks, the mon files of each test and a synthetic catalog, with the types of
+# each package in order and reversed, and prints whether streaming each file gives the same blocks as parsing it.
+import os, sys
+from pathlib import Path
+import xml.etree.ElementTree as ElementTree
+
+sdk, output = sys.argv[1:3]
+sys.path.insert(0, os.path.join(sdk, 'scripts'))
+import benchmark, blockMetadataGenerator, eplDocParser
+
+def extract(extraction):
+	try:
+		return extraction()
+	except Exception as e:
+		return f'error: {e}'
+
+catalogs = [('samples/blocks', eplDocParser.generate_structure(sorted(Path(sdk, 'samples/blocks').glob('*.mon'))))]
+for input in sorted(Path(sdk, 'samples/tests').glob('*/Input')):
+	monFiles = sorted(input.rglob('*.mon'))
+	if monFiles:
+		catalogs.append((input.relative_to(sdk).as_posix(), eplDocParser.generate_structure(monFiles)))
+catalogs.append(('synthetic', benchmark.generate_structure(50, packages=3)))
+
+for name, root in catalogs:
+	for order in ['in order', 'reversed']:
+		if order == 'reversed':
+			# parameters types are usually declared before their block, so this puts them after it
+			for package in root:
+				types = list(package)
+				for t in types: package.remove(t)
+				package.extend(reversed(types))
+		xmlPath = os.path.join(output, name.replace('/', '_') + ('_reversed' if order == 'reversed' else '') + '.xml')
+		ElementTree.ElementTree(root).write(xmlPath, encoding='UTF-8', xml_declaration=True)
+		generator = blockMetadataGenerator.BlockGenerator()
+		parsed = extract(lambda: generator.getAllValidBlockElements(ElementTree.parse(xmlPath).getroot()))
+		streamed = extract(lambda: generator.getAllValidBlockElementsFromFile(xmlPath))
+		result = 'equal' if parsed == streamed else 'DIFFERENT'
+		print(f'{name} {order}: {len(parsed) if isinstance(parsed, list) else parsed.splitlines()[0]} blocks, {result}')
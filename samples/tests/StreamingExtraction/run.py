@@ -0,0 +1,24 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		self.startProcess(sys.executable, [self.input + '/compare_extraction.py', self.project.ANALYTICS_BUILDER_SDK, self.output],
+			stdout='compare_extraction.out', stderr='compare_extraction.err', displayName='compare_extraction',
+			environs=dict(os.environ, PYTHONDONTWRITEBYTECODE='true'))
+
+	def validate(self):
+		self.assertGrep('compare_extraction.out', expr='DIFFERENT', contains=False)
+		self.assertOrderedGrep('compare_extraction.out', exprList=[
+			'^samples/blocks in order: [1-9][0-9]* blocks, equal$',
+			'^samples/blocks reversed: [1-9][0-9]* blocks, equal$',
+			'^samples/tests/EnumeratedValues/Input in order: 1 blocks, equal$',
+			'^samples/tests/EnumeratedValues/Input reversed: 1 blocks, equal$',
+			'^synthetic in order: 50 blocks, equal$',
+			'^synthetic reversed: 50 blocks, equal$',
+		])
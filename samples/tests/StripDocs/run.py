@@ -0,0 +1,51 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+from apama.correlator import CorrelatorHelper
+import re, zipfile
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		self.runAnalyticsBuilderScript(['build', 'extension', '--stripDocs', '--input', self.input, '--output', self.output + '/StripDocs.zip'])
+		with zipfile.ZipFile(self.output + '/StripDocs.zip') as zf:
+			with open(self.output + '/StripDocs.mon', 'wb') as f:
+				f.write(zf.read('files/StripDocs.mon'))
+
+		# The line breaks are kept, so each statement is on the same line as in the source.
+		with open(self.input + '/StripDocs.mon', encoding='utf8') as f:
+			source = f.read().splitlines()
+		with open(self.output + '/StripDocs.mon', encoding='utf8') as f:
+			stripped = f.read().splitlines()
+		self.throwsLine = next(i for i, line in enumerate(source) if '// THROWS' in line) + 1
+		with open(self.output + '/lines.txt', 'w', encoding='utf8') as f:
+			print(f'source lines={len(source)} stripped lines={len(stripped)}', file=f)
+			print(f'throws line={stripped[self.throwsLine - 1]}', file=f)
+
+		corr = CorrelatorHelper(self, name='correlator')
+		corr.start(logfile='correlator.log')
+		corr.injectEPL(self.output + '/StripDocs.mon')
+		corr.flush()
+
+	def validate(self):
+		self.assertGrep('lines.txt', expr='^source lines=([0-9]+) stripped lines=\\1$')
+		self.assertGrep('lines.txt', expr='^throws line=log\\(1 / zero\\)')
+		for comment in ['Monitor with comments', 'a comment after a string', 'comment ending with a backslash \\\\$', 'divided by', 'THROWS', 'multi-line comment']:
+			self.assertGrep('StripDocs.mon', expr=comment, contains=False)
+
+		# The strings, including comment markers in them, are unchanged.
+		for name, value in [
+				('DOC', '/** not a doc comment */'),
+				('COMMENT', '// not a comment'),
+				('BLOCK', '/* not a comment */ */ /*'),
+				('ESCAPES', 'a "quoted /* string */" and a backslash \\'),
+				('BACKSLASH', 'ends with a backslash \\'),
+				('AFTER_BACKSLASH', 'the line after a comment ending with a backslash'),
+				('EMPTY_COMMENT', 'after an empty comment')]:
+			self.assertGrep('correlator.log', expr=re.escape(f'{name}={value}') + '$')
+		self.assertGrep('correlator.log', expr='quotient=4 difference=7$')
+		self.assertGrep('correlator.log', expr=f'exception=ArithmeticException stack=.*line {self.throwsLine}\\b')
+		self.assertGrep('correlator.log', expr=' (ERROR|FATAL) ', contains=False)
@@ -0,0 +1,32 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+# Usage: validate_tags.py <sdk> <output directory> <mon directory>...
+# Writes a structure.xml for the mon files of each directory, extracts its blocks by parsing and by streaming it, and
+# writes the result of each to <directory name>_parsed.txt and <directory name>_streamed.txt.
+import os, sys
+from pathlib import Path
+import xml.etree.ElementTree as ElementTree
+
+sdk, output = sys.argv[1:3]
+sys.path.insert(0, os.path.join(sdk, 'scripts'))
+import blockMetadataGenerator, eplDocParser
+
+def extract(extraction):
+	try:
+		return '\n'.join(block['id'] for block in extraction())
+	except RuntimeError as e:
+		return f'error: {e}'
+
+for monDir in sys.argv[3:]:
+	name = Path(monDir).name
+	xmlPath = os.path.join(output, name + '.xml')
+	ElementTree.ElementTree(eplDocParser.generate_structure(sorted(Path(monDir).glob('*.mon')))).write(xmlPath, encoding='UTF-8', xml_declaration=True)
+	generator = blockMetadataGenerator.BlockGenerator()
+	for (kind, extraction) in [
+		('parsed', lambda: generator.getAllValidBlockElements(ElementTree.parse(xmlPath).getroot())),
+		('streamed', lambda: generator.getAllValidBlockElementsFromFile(xmlPath)),
+	]:
+		with open(os.path.join(output, f'{name}_{kind}.txt'), 'w', encoding='utf8') as f:
+			print(extract(extraction), file=f)
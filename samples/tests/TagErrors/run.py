@@ -0,0 +1,41 @@
+#
+#  $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+#   This file is licensed under the Apache 2.0 license - see https://www.apache.org/licenses/LICENSE-2.0
+#
+
+from pysys.constants import *
+from apamax.analyticsbuilder.basetest import AnalyticsBuilderBaseTest
+import shutil
+
+class PySysTest(AnalyticsBuilderBaseTest):
+	def execute(self):
+		self.startProcess(sys.executable, [self.input + '/validate_tags.py', self.project.ANALYTICS_BUILDER_SDK, self.output, self.input + '/invalid', self.input + '/valid'],
+			stdout='validate_tags.out', stderr='validate_tags.err', displayName='validate_tags',
+			environs=dict(os.environ, PYTHONDONTWRITEBYTECODE='true'))
+
+		process = self.runAnalyticsBuilderScript(['build', 'metadata', '--native', '--input', self.input + '/invalid', '--output', self.output + '/invalid.json'], ignoreExitStatus=True)
+		shutil.copyfile(process.stderr, self.output + '/invalid_build.err')
+		process = self.runAnalyticsBuilderScript(['build', 'metadata', '--native', '--input', self.input + '/valid', '--output', self.output + '/valid.json'])
+		shutil.copyfile(process.stdout, self.output + '/valid_build.out')
+
+	def validate(self):
+		# every invalid tag of both types is reported, in document order, by the one failure of the build
+		invalidTags = [
+			'Error = Multiple tags \\$blockCategory are present in the block$',
+			'Error = .\\$inputName. tag .* on .helper. inside the event .FirstInvalid. is not valid. This is only valid on a \\$process action.$',
+			'Error = .\\$unitOfMeasure. tag .* on .counter. inside the event .SecondInvalid. is not valid.$',
+			'Error = .\\$semanticType. tag .* on .\\$process. inside the event .SecondInvalid. is not valid. This is only valid on an event field.$',
+		]
+		self.assertOrderedGrep('invalid_build.err', exprList=['^Command failed: Invalid tag present in the monitor file. ' + invalidTags[0]] +
+			['^Invalid tag present in the monitor file. ' + e for e in invalidTags[1:]])
+
+		# streaming structure.xml reports the same errors as parsing it
+		self.assertOrderedGrep('invalid_parsed.txt', exprList=['^error: Invalid tag present in the monitor file. ' + invalidTags[0]] +
+			['^Invalid tag present in the monitor file. ' + e for e in invalidTags[1:]])
+		self.assertDiff('invalid_streamed.txt', 'invalid_parsed.txt', filedir1=self.output, filedir2=self.output)
+
+		# a catalog without invalid tags still builds
+		self.assertGrep('valid_parsed.txt', expr='^apamax.analyticsbuilder.test.ValidBlock$')
+		self.assertDiff('valid_streamed.txt', 'valid_parsed.txt', filedir1=self.output, filedir2=self.output)
+		self.assertGrep('valid_build.out', expr='^Created .*valid.json$')
+		self.assertGrep('valid.json', expr='"id": *"apamax.analyticsbuilder.test.ValidBlock"')
@@ -0,0 +1,122 @@
+// $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+// Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+
+import java.io.*;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.*;
+import java.util.jar.JarFile;
+
+/**
+ * Long-lived process which runs the apamadoc generator for requests from the analytics_builder script,
+ * so that each build does not pay the cost of starting a JVM and loading the generator.
+ *
+ * Run with the Java source launcher:
+ * java -cp ap-generate-apamadoc.jar ApamaDocWorker.java &lt;jar&gt; &lt;port file&gt; &lt;token&gt;
+ *
+ * The worker listens on a loopback port, which it writes to the port file once it is ready. Each
+ * connection sends lines with the token and a command: GENERATE followed by the output directory,
+ * input directory, stdout log and stderr log; PING; or STOP. The worker replies with a single line,
+ * OK or ERROR followed by a message.
+ */
+public class ApamaDocWorker {
+
+	/** Thrown instead of exiting the JVM when the generator calls System.exit. */
+	static final class ExitTrappedException extends SecurityException {
+		final int status;
+
+		ExitTrappedException(int status) {
+			super("exit " + status);
+			this.status = status;
+		}
+	}
+
+	public static void main(String[] args) throws Exception {
+		String mainClass;
+		try (JarFile jar = new JarFile(args[0])) {
+			mainClass = jar.getManifest().getMainAttributes().getValue("Main-Class");
+		}
+		Method entry = Class.forName(mainClass).getMethod("main", String[].class);
+		String token = args[2];
+		trapExit();
+
+		try (ServerSocket server = new ServerSocket(0, 50, InetAddress.getLoopbackAddress())) {
+			Path portFile = Paths.get(args[1]);
+			Path tmp = Paths.get(args[1] + ".tmp");
+			Files.write(tmp, Integer.toString(server.getLocalPort()).getBytes(StandardCharsets.UTF_8));
+			Files.move(tmp, portFile, StandardCopyOption.REPLACE_EXISTING, StandardCopyOption.ATOMIC_MOVE);
+
+			while (true) {
+				try (Socket socket = server.accept()) {
+					BufferedReader in = new BufferedReader(new InputStreamReader(socket.getInputStream(), StandardCharsets.UTF_8));
+					Writer out = new OutputStreamWriter(socket.getOutputStream(), StandardCharsets.UTF_8);
+					if (!token.equals(in.readLine())) continue;
+					String command = in.readLine();
+					String reply;
+					if ("GENERATE".equals(command)) {
+						reply = generate(entry, in.readLine(), in.readLine(), in.readLine(), in.readLine());
+					} else if ("PING".equals(command) || "STOP".equals(command)) {
+						reply = "OK";
+					} else {
+						reply = "ERROR unknown command " + command;
+					}
+					out.write(reply + "\n");
+					out.flush();
+					if ("STOP".equals(command)) return;
+				} catch (IOException e) {
+					e.printStackTrace();
+				}
+			}
+		}
+	}
+
+	/** Run the generator, redirecting its output to the log files. */
+	static String generate(Method entry, String outputDir, String inputDir, String outLog, String errLog) {
+		PrintStream oldOut = System.out, oldErr = System.err;
+		try (PrintStream out = new PrintStream(new FileOutputStream(outLog), true, "UTF-8");
+		     PrintStream err = new PrintStream(new FileOutputStream(errLog), true, "UTF-8")) {
+			System.setOut(out);
+			System.setErr(err);
+			try {
+				entry.invoke(null, (Object) new String[] { outputDir, inputDir });
+				return "OK";
+			} catch (InvocationTargetException e) {
+				Throwable cause = e.getCause();
+				if (cause instanceof ExitTrappedException) {
+					int status = ((ExitTrappedException) cause).status;
+					return status == 0 ? "OK" : "ERROR exit status " + status;
+				}
+				cause.printStackTrace();
+				return "ERROR " + cause;
+			}
+		} catch (Exception e) {
+			return "ERROR " + e;
+		} finally {
+			System.setOut(oldOut);
+			System.setErr(oldErr);
+		}
+	}
+
+	/** Stop the generator exiting the worker. */
+	@SuppressWarnings({"deprecation", "removal"})
+	static void trapExit() {
+		try {
+			System.setSecurityManager(new SecurityManager() {
+				@Override
+				public void checkPermission(java.security.Permission perm) {
+				}
+
+				@Override
+				public void checkExit(int status) {
+					throw new ExitTrappedException(status);
+				}
+			});
+		} catch (UnsupportedOperationException e) {
+			// Not supported by this JVM: if the generator exits, the worker stops and builds run apamadoc directly
+		}
+	}
+}
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+import hashlib, os, re
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+CACHE_DIR_ENV = 'ANALYTICS_BUILDER_CACHE_DIR'
+
+_commentsAndStrings = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"', re.DOTALL)
+_packageDecl = re.compile(r'\bpackage\s+([\w.]+)\s*;')
+_typeDecl = re.compile(r'\b(?:event|monitor)\s+([\w$]+)\s*\{')
+
+def default_cache_dir(cacheDir=None):
+	"""Return the cache directory to use, falling back to the ANALYTICS_BUILDER_CACHE_DIR environment variable."""
+	return cacheDir or os.getenv(CACHE_DIR_ENV, None)
+
+def file_digest(path):
+	"""Return the SHA-256 hex digest of the content of a file."""
+	h = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(1 << 16), b''):
+			h.update(chunk)
+	return h.hexdigest()
+
+def declared_types(monFile):
+	"""
+	Find the package and the event and monitor types declared in a mon file.
+	:param monFile: The mon file to scan.
+	:return: Tuple of package name and set of type names.
+	"""
+	text = _commentsAndStrings.sub(' ', Path(monFile).read_text(encoding='UTF8', errors='replace'))
+	m = _packageDecl.search(text)
+	return (m.group(1) if m else ''), set(_typeDecl.findall(text))
+
+class ApamaDocCache(object):
+	"""
+	Persistent cache of the apamadoc structure for individual mon files.
+
+	Each mon file is stored as a fragment of structure.xml under a directory for the SDK version,
+	keyed by the SHA-256 of its content and of the types declared by all the mon files, as apamadoc
+	qualifies references to types declared in other files. If every file has a fragment they are
+	merged into a single structure.xml, otherwise apamadoc runs over all the files and the fragments
+	of the files that were missing are added to the cache.
+	"""
+
+	def __init__(self, cacheDir, version):
+		self.dir = Path(cacheDir).resolve() / 'apamadoc' / version
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def _key(digest, typesDigest):
+		return hashlib.sha256(f'{digest}:{typesDigest}'.encode('ascii')).hexdigest()
+
+	@staticmethod
+	def _typesDigest(monFiles):
+		"""Return a digest of the types declared by all the mon files, which apamadoc output depends on."""
+		h = hashlib.sha256()
+		for package, t in sorted({(package, t) for package, types in map(declared_types, monFiles) for t in types}):
+			h.update(f'{package}.{t}\n'.encode('UTF8'))
+		return h.hexdigest()
+
+	def _fragmentPath(self, digest):
+		return self.dir / (digest + '.xml')
+
+	def _writeFragment(self, digest, packages):
+		self.dir.mkdir(parents=True, exist_ok=True)
+		root = ElementTree.Element('Packages')
+		root.extend(packages)
+		tmp = self.dir / f'{digest}.{os.getpid()}.tmp'
+		ElementTree.ElementTree(root).write(tmp, encoding='UTF-8', xml_declaration=True)
+		os.replace(tmp, self._fragmentPath(digest))	# atomic, so concurrent builds never see a partial fragment
+
+	def _splitByFile(self, structureXml, monFiles):
+		"""
+		Split a structure.xml into fragments for each of the mon files.
+		:param structureXml: The structure.xml generated from the mon files.
+		:param monFiles: Map of fragment key to the mon file.
+		:return: Map of fragment key to list of Package elements, or None if a type could not be attributed to a file.
+		"""
+		owners = {}
+		for digest, f in monFiles.items():
+			package, types = declared_types(f)
+			for t in types:
+				owners[(package, t)] = digest
+
+		fragments = {digest: {} for digest in monFiles}
+		for package in ElementTree.parse(str(structureXml)).getroot().findall('./Package'):
+			packageName = package.get('name', '')
+			for typeElement in package.findall('./Type'):
+				# nested types are named <outer>.<inner>, so attribute them by the outer type
+				digest = owners.get((packageName, typeElement.get('name', '').split('.')[0]))
+				if digest is None:
+					return None
+				byPackage = fragments[digest]
+				if packageName not in byPackage:
+					byPackage[packageName] = ElementTree.Element('Package', package.attrib)
+				byPackage[packageName].append(typeElement)
+		return {digest: list(byPackage.values()) for digest, byPackage in fragments.items()}
+
+	def _merge(self, digests, output):
+		"""Merge the fragments for the digests in order into a single structure.xml."""
+		root = ElementTree.Element('Packages')
+		packages = {}
+		for digest in digests:
+			for package in ElementTree.parse(str(self._fragmentPath(digest))).getroot().findall('./Package'):
+				name = package.get('name', '')
+				if name not in packages:
+					packages[name] = ElementTree.SubElement(root, 'Package', package.attrib)
+				packages[name].extend(package.findall('./Type'))
+		output.parent.mkdir(parents=True, exist_ok=True)
+		ElementTree.ElementTree(root).write(output, encoding='UTF-8', xml_declaration=True)
+		return output
+
+	def generate(self, inputDir, tmpDir, runApamaDoc, manifest=None):
+		"""
+		Generate structure.xml for all mon files in the input directory, running apamadoc only if a file has changed.
+		:param inputDir: The input directory containing the mon files.
+		:param tmpDir: The temporary directory.
+		:param runApamaDoc: Callable taking an input and an output directory, which runs apamadoc and returns the path to structure.xml.
+		:param manifest: The InputManifest of the input directory, which provides the mon files and their digests.
+		:return: Path to the structure.xml.
+		"""
+		inputDir = Path(inputDir)
+		tmpDir = Path(tmpDir)
+		if manifest is None:
+			monFiles = sorted(inputDir.rglob('*.mon'))
+			digests = [file_digest(f) for f in monFiles]
+		else:
+			inputDir = manifest.inputDir
+			mons = sorted(manifest.mons, key=lambda f: f.path)
+			monFiles = [f.path for f in mons]
+			digests = [f.sha256 for f in mons]
+
+		typesDigest = self._typesDigest(monFiles)
+		keys = [self._key(digest, typesDigest) for digest in digests]
+		missing = {key for key in keys if not self._fragmentPath(key).exists()}
+		self.misses = len(missing)
+		self.hits = len(set(keys)) - self.misses
+		if not missing:
+			return self._merge(list(dict.fromkeys(keys)), tmpDir / 'apamadoc' / 'structure.xml')
+
+		# Cross-file type references are only qualified if apamadoc sees the other files, so always run it over all of them.
+		if manifest is not None and manifest.filtered:
+			inputDir = manifest.stage(manifest.mons, tmpDir / 'apamadoc_input')
+		structureXml = runApamaDoc(str(inputDir), str(tmpDir / 'apamadoc'))
+		fragments = self._splitByFile(structureXml, dict(zip(keys, monFiles)))
+		if fragments is not None:
+			# otherwise could not tell which file a type came from, so do not cache anything
+			for key in missing:
+				self._writeFragment(key, fragments[key])
+		return structureXml
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+import json, os, secrets, signal, socket, stat, subprocess, sys, time
+from pathlib import Path
+
+import apamadocCache
+
+WORKER_SOURCE = Path(__file__).resolve().parent / 'ApamaDocWorker.java'
+STATE_FILE_NAME = 'apamadoc-worker.json'
+GENERATE_TIMEOUT = 600  # seconds to wait for the worker to generate Apama Doc before running it directly
+
+def _userDir():
+	"""Return a directory of the current user for the worker state, as the system temporary directory is shared."""
+	if sys.platform == 'win32':
+		base = os.getenv('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+	else:
+		base = os.getenv('XDG_RUNTIME_DIR') or os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache'
+	return Path(base) / 'analytics_builder'
+
+def state_file(cacheDir=None):
+	"""Return the file recording the running worker, in the cache directory or a directory of the current user."""
+	return Path(apamadocCache.default_cache_dir(cacheDir) or _userDir()) / STATE_FILE_NAME
+
+def _isOwned(path, mode=None):
+	"""Return whether the path is a regular file owned by the current user, and with the given permissions if any."""
+	if not hasattr(os, 'getuid'): return os.path.isfile(path)  # Windows, where the user directory is private
+	try:
+		st = os.lstat(path)
+	except OSError:
+		return False
+	return stat.S_ISREG(st.st_mode) and st.st_uid == os.getuid() and (mode is None or stat.S_IMODE(st.st_mode) == mode)
+
+def _readState(stateFile):
+	# the state holds the token, so only trust it if no other user could have written or read it
+	if not _isOwned(stateFile, 0o600): return None
+	try:
+		return json.loads(stateFile.read_text(encoding='UTF8'))
+	except (OSError, ValueError):
+		return None
+
+def _removeState(stateFile):
+	try:
+		stateFile.unlink()
+	except OSError:
+		pass
+
+def _request(state, lines, timeout=None):
+	"""Send a request to the worker and return its reply, or an empty string if the worker closed the connection."""
+	with socket.create_connection(('127.0.0.1', state['port']), timeout=10) as s:
+		s.settimeout(timeout)
+		s.sendall(''.join(l + '\n' for l in [state['token']] + lines).encode('UTF8'))
+		with s.makefile('r', encoding='UTF8') as f:
+			return f.readline().strip()
+
+def _kill(state):
+	try:
+		os.kill(state['pid'], signal.SIGTERM)
+	except (OSError, KeyError):
+		pass
+
+def _isAlive(state):
+	try:
+		return _request(state, ['PING'], timeout=10) == 'OK'
+	except OSError:
+		return False
+
+def _matches(state, apamaHome):
+	return os.path.normcase(state.get('apamaHome', '')) == os.path.normcase(os.path.abspath(apamaHome))
+
+def start(apamaHome, javaHome, cacheDir=None, timeout=60):
+	"""
+	Start an apamadoc worker, unless one is already running.
+	:param apamaHome: The Apama installation containing ap-generate-apamadoc.jar.
+	:param javaHome: The Java installation to run the worker with, which must be Java 11 or later.
+	:param cacheDir: The cache directory, which determines where the worker is recorded.
+	:param timeout: The number of seconds to wait for the worker to start.
+	:return: Tuple of the worker state and whether it was started.
+	"""
+	stateFile = state_file(cacheDir)
+	state = _readState(stateFile)
+	if state and _isAlive(state):
+		if _matches(state, apamaHome): return (state, False)
+		stop(cacheDir)
+
+	stateFile.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+	portFile = stateFile.with_suffix('.port')
+	logFile = stateFile.with_suffix('.log')
+	_removeState(portFile)
+	token = secrets.token_hex(16)
+	jar = os.path.join(apamaHome, 'lib', 'ap-generate-apamadoc.jar')
+	cmd = [
+		os.path.join(javaHome, 'bin', 'java'),
+		'-DAPAMA_HOME=' + apamaHome,
+		'-Djava.awt.headless=true',
+		'-cp', jar,
+		str(WORKER_SOURCE),
+		jar,
+		str(portFile),
+		token,
+	]
+	if sys.platform == 'win32':
+		detach = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP | 0x00000008}	# DETACHED_PROCESS
+	else:
+		detach = {'start_new_session': True}
+	with open(logFile, 'w') as log:
+		process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **detach)
+
+	deadline = time.monotonic() + timeout
+	while not _isOwned(portFile):
+		if process.poll() is not None:
+			raise Exception(f'The apamadoc worker failed to start. Please check {logFile} file for more details')
+		if time.monotonic() > deadline:
+			process.kill()
+			raise Exception(f'Timed out waiting for the apamadoc worker to start. Please check {logFile} file for more details')
+		time.sleep(0.1)
+
+	state = {'pid': process.pid, 'port': int(portFile.read_text()), 'token': token,
+	         'apamaHome': os.path.abspath(apamaHome)}
+	# only the current user may read the token, so create a new file rather than reuse any existing one
+	_removeState(stateFile)
+	try:
+		fd = os.open(str(stateFile), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+	except OSError as err:
+		process.kill()
+		raise Exception(f'Unable to record the apamadoc worker in {stateFile}: {err}')
+	if hasattr(os, 'fchmod'): os.fchmod(fd, 0o600)  # regardless of the umask
+	with os.fdopen(fd, 'w', encoding='UTF8') as f:
+		json.dump(state, f)
+	_removeState(portFile)
+	return (state, True)
+
+def stop(cacheDir=None):
+	"""
+	Stop the running apamadoc worker.
+	:param cacheDir: The cache directory, which determines where the worker is recorded.
+	:return: True if a worker was stopped.
+	"""
+	stateFile = state_file(cacheDir)
+	state = _readState(stateFile)
+	if not state: return False
+	try:
+		stopped = _request(state, ['STOP'], timeout=10) == 'OK'
+	except OSError:
+		stopped = False
+	_removeState(stateFile)
+	return stopped
+
+def generate(apamaHome, apamaDocOutput, inputDir, outLog, errLog, cacheDir=None, timeout=GENERATE_TIMEOUT):
+	"""
+	Generate Apama Doc using the running worker.
+	:param apamaHome: The Apama installation the worker must be using.
+	:param apamaDocOutput: The directory for the generated Apama Doc.
+	:param inputDir: The directory containing the monitors.
+	:param outLog: The file to write the generator's standard output to.
+	:param errLog: The file to write the generator's standard error to.
+	:param cacheDir: The cache directory, which determines where the worker is recorded.
+	:param timeout: The number of seconds to wait for the worker, after which it is stopped.
+	:return: None if there is no usable worker, otherwise whether the generation succeeded.
+	"""
+	stateFile = state_file(cacheDir)
+	state = _readState(stateFile)
+	if not state or not _matches(state, apamaHome): return None
+	try:
+		reply = _request(state, ['GENERATE', os.path.abspath(apamaDocOutput), os.path.abspath(inputDir),
+		                         os.path.abspath(outLog), os.path.abspath(errLog)], timeout=timeout)
+	except socket.timeout:
+		# the worker handles one request at a time, so it is no use to later builds either
+		print(f'The apamadoc worker did not reply within {timeout} seconds, so stopping it and running apamadoc directly')
+		_kill(state)
+		reply = ''
+	except OSError:
+		reply = ''
+	if not reply:
+		# the worker has gone away, so forget it and run apamadoc directly
+		_removeState(stateFile)
+		return None
+	if reply != 'OK':
+		with open(errLog, 'a') as f:
+			print(reply, file=f)
+	return reply == 'OK'
+
+def add_arguments(parser):
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help=f'the cache directory used by the builds that should use the worker (defaults to the {apamadocCache.CACHE_DIR_ENV} environment variable)')
+
+def run_start(args):
+	# assumes we're running with apama_env sourced
+	java_home = os.path.join(os.environ['APAMA_JRE'], '..')
+	(state, started) = start(os.environ['APAMA_HOME'], java_home, args.cacheDir)
+	print(f'{"Started" if started else "Already running"} apamadoc worker with process id {state["pid"]}')
+
+def run_stop(args):
+	if stop(args.cacheDir):
+		print('Stopped apamadoc worker')
+	else:
+		print('No apamadoc worker running')
+
+def run_status(args):
+	state = _readState(state_file(args.cacheDir))
+	if state and _isAlive(state):
+		print(f'apamadoc worker running with process id {state["pid"]}')
+	else:
+		print('No apamadoc worker running')
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+"""
+Benchmarks of the block metadata generator on synthetic structure.xml files, and of building
+extensions from synthetic block catalogs.
+
+Each benchmark is run several times and the fastest time is recorded, then run once more under
+tracemalloc to record the peak memory allocated by Python. Results are written as JSON, and can be
+compared against a baseline to flag regressions.
+"""
+import json, os, shutil, sys, time, tracemalloc
+import xml.etree.ElementTree as ElementTree
+
+import blockMetadataGenerator, buildExtension, profiler
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_EXTENSION_SIZES = [10, 100, 1000, 5000]
+DEFAULT_THRESHOLD = 0.1
+METRICS = ['seconds', 'peakBytes', 'zipBytes']
+
+BLOCK_TEMPLATE = """package {package};
+
+using apama.analyticsbuilder.BlockBase;
+using apama.analyticsbuilder.Activation;
+using apama.analyticsbuilder.L10N;
+
+/**
+ * Parameters for Block {index}.
+ */
+event {name}_$Parameters {{
+	/**
+	 * Offset.
+	 *
+	 * The offset applied to the input value.
+	 */
+	float offset;
+
+	/** The default offset. */
+	constant float $DEFAULT_offset := 1.0;
+
+	/**
+	 * Mode.
+	 *
+	 * Whether the offset is added to or subtracted from the input value.
+	 */
+	string mode;
+
+	/**
+	 * Add.
+	 *
+	 * Add the offset to the input value.
+	 */
+	constant string mode_add := "add";
+
+	/**
+	 * Subtract.
+	 *
+	 * Subtract the offset from the input value.
+	 */
+	constant string mode_subtract := "subtract";
+
+	/** Validate that the offset is a finite number. */
+	action $validate() {{
+		if not offset.isFinite() {{
+			throw L10N.getLocalizedException("{message}", [offset]);
+		}}
+	}}
+}}
+
+/**
+ * Block {index}.
+ *
+ * Adds an offset to, or subtracts it from, the input value. This is a synthetic block for benchmarks.
+ *
+ * @$blockCategory Calculations
+ */
+event {name} {{
+
+	/**BlockBase object.
+	 *
+	 * This is initialized by the framework when the block is required for a model.
+	 */
+	BlockBase $base;
+
+	/** Parameters, filled in by the framework. */
+	{name}_$Parameters $parameters;
+
+	/**
+	 * This action receives the input value and contains the logic of the block.
+	 *
+	 * @param $activation The current activation, contextual information required when generating a block output.
+	 * @param $input_value Input to the block.
+	 * @$inputName value Value
+	 */
+	action $process(Activation $activation, float $input_value) {{
+		if $parameters.mode = {name}_$Parameters.mode_add {{
+			$setOutput_output($activation, $input_value + $parameters.offset);
+		}} else {{
+			$setOutput_output($activation, $input_value - $parameters.offset);
+		}}
+	}}
+
+	/**
+	 * Output.
+	 *
+	 * The input value with the offset applied.
+	 */
+	action<Activation, float> $setOutput_output;
+}}
+"""
+
+def _description(parent, text):
+	ElementTree.SubElement(parent, 'Description').text = text
+
+def _dollarFields(parent, fields):
+	dollarFields = ElementTree.SubElement(parent, 'DollarFields')
+	for (name, text) in fields:
+		_description(ElementTree.SubElement(dollarFields, 'DollarField', name=name), text)
+
+def _typeParameters(parent, *types):
+	parameters = ElementTree.SubElement(parent, 'Parameters')
+	for t in types:
+		parameter = ElementTree.SubElement(parameters, 'Parameter', type=t[0])
+		if len(t) > 1:
+			_typeParameters(parameter, *t[1:])
+
+def _parametersType(package, name, enums):
+	parameters = ElementTree.SubElement(package, 'Type', category='Event', name=name + '_$Parameters')
+	_description(parameters, 'Parameters of %s.' % name)
+	mode = ElementTree.SubElement(parameters, 'Member', name='mode', type='string')
+	_description(mode, 'Mode.\n\n The mode of the block.')
+	_dollarFields(mode, [('$displayType', 'dropdown')])
+	for i in range(enums):
+		value = ElementTree.SubElement(parameters, 'Member', constant='true', name='mode_V%d' % i, type='string', typeValue='"v%d"' % i)
+		_description(value, 'Value %d.\n\n Tooltip for value %d.' % (i, i))
+	count = ElementTree.SubElement(parameters, 'Member', name='count', type='integer')
+	_description(count, 'Count.\n\n The number of {items}.')
+	_dollarFields(count, [('$semanticType', 'c8y_count')])
+	ElementTree.SubElement(parameters, 'Member', constant='true', name='$DEFAULT_count', type='integer', typeValue='5')
+	threshold = ElementTree.SubElement(parameters, 'Member', name='threshold', type='optional')
+	_typeParameters(threshold, ('float',))
+	_description(threshold, 'Threshold.\n\n Optional threshold.')
+	properties = ElementTree.SubElement(parameters, 'Member', name='properties', type='sequence')
+	_typeParameters(properties, ('NameValue',))
+	_description(properties, 'Properties.\n\n Name and value pairs.')
+	_dollarFields(properties, [('$displayHeaderName', 'Key'), ('$displayHeaderValue', 'Value'), ('$minNumEntries', '1')])
+	names = ElementTree.SubElement(parameters, 'Member', name='names', type='optional')
+	_typeParameters(names, ('sequence', ('string',)))
+	_description(names, 'Names.\n\n Optional sequence of names.')
+
+def _blockType(package, packageName, name, index):
+	block = ElementTree.SubElement(package, 'Type', category='Event', name=name)
+	_description(block, 'Block %d.\n\n Calculates {something} for block %d.\n\n More details.\n\n Even more details.' % (index, index))
+	_dollarFields(block, [('$blockCategory', 'Calculations'), ('$derivedName', 'Block $mode')])
+	ElementTree.SubElement(block, 'Member', name='$base', type='BlockBase', package='apama.analyticsbuilder')
+	ElementTree.SubElement(block, 'Member', name='$parameters', type=name + '_$Parameters', package=packageName)
+	process = ElementTree.SubElement(block, 'Action', name='$process')
+	_dollarFields(process, [('$inputName', 'value Value'), ('$inputName', 'reset Reset')])
+	parameters = ElementTree.SubElement(process, 'Parameters')
+	ElementTree.SubElement(parameters, 'Parameter', name='$activation', type='Activation', package='apama.analyticsbuilder')
+	_description(ElementTree.SubElement(parameters, 'Parameter', name='$input_value', type='float'), 'The input value.')
+	reset = ElementTree.SubElement(parameters, 'Parameter', name='$input_reset', type='optional')
+	_typeParameters(reset, ('boolean',))
+	_description(reset, 'Resets the block.')
+	for output in ['result', 'changed']:
+		member = ElementTree.SubElement(block, 'Member', name='$setOutput_' + output, type='action')
+		outputParameters = ElementTree.SubElement(member, 'Parameters')
+		ElementTree.SubElement(outputParameters, 'Parameter', type='Activation', package='apama.analyticsbuilder')
+		ElementTree.SubElement(outputParameters, 'Parameter', type='float')
+		_description(member, '%s.\n\n The %s output.' % (output.capitalize(), output))
+	ElementTree.SubElement(block, 'Member', constant='true', name='$OUTPUT_TYPE_changed', type='string', typeValue='"pulse"')
+
+def generate_structure(blocks, packages=10, enums=5):
+	"""
+	Generate a synthetic structure.xml, as written by apamadoc.
+	:param blocks: The total number of blocks.
+	:param packages: The number of packages the blocks are spread over.
+	:param enums: The number of enumerated values of each block's dropdown parameter.
+	:return: The Packages element.
+	"""
+	root = ElementTree.Element('Packages')
+	packages = max(1, min(packages, blocks))
+	for p in range(packages):
+		packageName = 'com.example.bench.p%d' % p
+		package = ElementTree.SubElement(root, 'Package', name=packageName, display=packageName)
+		for b in range(p, blocks, packages):
+			name = 'Block%d' % b
+			_parametersType(package, name, enums)
+			_blockType(package, packageName, name, b)
+		helper = ElementTree.SubElement(package, 'Type', category='Event', name='Helper')
+		ElementTree.SubElement(helper, 'Member', name='value', type='float')
+	return root
+
+def generate_catalog(directory, blocks, packages=10):
+	"""
+	Generate a synthetic block catalog, following the conventions of the samples: a mon file for each block,
+	and for each package, a -messages.json file with the messages of its blocks and an evt file.
+	:param directory: The directory to write the catalog to, which is replaced.
+	:param blocks: The total number of blocks.
+	:param packages: The number of packages the blocks are spread over.
+	"""
+	if os.path.exists(directory):
+		shutil.rmtree(directory)
+	packages = max(1, min(packages, blocks))
+	for p in range(packages):
+		package = 'com.example.bench.p%d' % p
+		packageDir = os.path.join(directory, 'p%d' % p)
+		os.makedirs(packageDir)
+		messages = {}
+		events = []
+		for b in range(p, blocks, packages):
+			name = 'Block%d' % b
+			message = 'bench_blk_%s.%s_invalid_offset' % (package, name)
+			messages[message] = "Invalid value for Offset '{{0}}' of block %d." % b
+			events.append('%s.%s_$Parameters(1.0,"add")' % (package, name))
+			with open(os.path.join(packageDir, name + '.mon'), 'w', encoding='utf8') as f:
+				f.write(BLOCK_TEMPLATE.format(package=package, name=name, index=b, message=message))
+		with open(os.path.join(packageDir, 'p%d-messages.json' % p), 'w', encoding='utf8') as f:
+			json.dump(messages, f, indent=4)
+		with open(os.path.join(packageDir, 'p%d.evt' % p), 'w', encoding='utf8') as f:
+			f.write('\n'.join(events) + '\n')
+
+def _measure(function, repeat):
+	"""Return the fastest time of repeat runs of function, the peak traced memory of one more run, and its result."""
+	seconds = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		elapsed = time.perf_counter() - start
+		seconds = elapsed if seconds is None else min(seconds, elapsed)
+	tracemalloc.start()
+	try:
+		result = function()
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+	return {'seconds': round(seconds, 6), 'peakBytes': peak}, result
+
+def run_benchmarks(tmpDir, sizes=None, repeat=3, printMsg=False):
+	"""
+	Run the benchmarks for each number of blocks.
+	:param tmpDir: The directory to write the structure.xml and JSON files to.
+	:param sizes: The numbers of blocks to benchmark, defaults to 100, 1000 and 10000.
+	:param repeat: The number of times each benchmark is timed.
+	:param printMsg: Print each result as it is measured.
+	:return: The results, as a dictionary.
+	"""
+	os.makedirs(tmpDir, exist_ok=True)
+	results = {}
+	for size in sizes or DEFAULT_SIZES:
+		structureXml = os.path.join(tmpDir, 'structure_%d.xml' % size)
+		ElementTree.ElementTree(generate_structure(size)).write(structureXml, encoding='UTF-8', xml_declaration=True)
+		root = ElementTree.parse(structureXml).getroot()
+		runner = blockMetadataGenerator.ScriptRunner(None, None, os.path.join(tmpDir, 'metadata_%d.json' % size), tmpDir, tmpDir, blockMetadataGenerator.version)
+		generator = blockMetadataGenerator.BlockGenerator()
+
+		def writeJson(blockList):
+			holder = blockMetadataGenerator.MetaDataHolder().setVersion(runner.scriptVersion).setBlockList(blockList)
+			with open(runner.outputFile, 'w') as f:
+				holder.writeJsonToFile(f)
+
+		sizeResults = {}
+		sizeResults['getAllValidBlockElements'], blockList = _measure(lambda: generator.getAllValidBlockElements(root), repeat)
+		sizeResults['getAllValidBlockElementsFromFile'], _ = _measure(lambda: generator.getAllValidBlockElementsFromFile(structureXml), repeat)
+		sizeResults['extract messages'], _ = _measure(lambda: runner._extractMessages(blockList), repeat)
+		sizeResults['write JSON'], _ = _measure(lambda: writeJson(blockList), repeat)
+		if len(blockList) != size:
+			raise Exception('Expected %d blocks in the synthetic structure.xml, but extracted %d' % (size, len(blockList)))
+		results[str(size)] = sizeResults
+		if printMsg:
+			for name, r in sizeResults.items():
+				print('%6d blocks  %-34s %10.4f s %12d bytes' % (size, name, r['seconds'], r['peakBytes']))
+	return {
+		'version': blockMetadataGenerator.version,
+		'python': sys.version.split()[0],
+		'platform': sys.platform,
+		'repeat': repeat,
+		'results': results,
+	}
+
+def _measure_build(build, repeat):
+	"""
+	Return the fastest time of repeat runs of build, with the times of the phases of that run, and the peak
+	traced memory of one more run, with the peak RSS of the process up to the end of it.
+	"""
+	best = None
+	for _ in range(repeat):
+		with profiler.profile('build', collect=True) as p:
+			build()
+		phases = {ph['name']: ph for ph in p.report()['phases']}
+		if best is None or phases['build']['wallSeconds'] < best['build']['wallSeconds']:
+			best = phases
+	tracemalloc.start()
+	try:
+		with profiler.profile('build', collect=True) as p:
+			zip_file = build()
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+	return {
+		'seconds': best['build']['wallSeconds'],
+		'peakBytes': peak,
+		'processPeakRSSBytes': p.report()['phases'][0]['processPeakRSSBytes'],
+		'zipBytes': os.path.getsize(zip_file),
+		'phases': {name[len('build/'):]: ph['wallSeconds'] for name, ph in best.items() if name != 'build'},
+	}
+
+def run_extension_benchmarks(tmpDir, sizes=None, repeat=3, cdp=True, native=False, printMsg=False):
+	"""
+	Run the full build_extension pipeline on synthetic block catalogs of each number of blocks.
+	:param tmpDir: The directory to write the catalogs, temporary files and zip files to.
+	:param sizes: The numbers of blocks to benchmark, defaults to 10, 100, 1000 and 5000.
+	:param repeat: The number of times each build is timed.
+	:param cdp: Also benchmark building with the monitors packaged into a CDP file.
+	:param native: Extract the block metadata without running apamadoc.
+	:param printMsg: Print each result as it is measured.
+	:return: The results, as a dictionary.
+	"""
+	os.makedirs(tmpDir, exist_ok=True)
+	results = {}
+	for size in sizes or DEFAULT_EXTENSION_SIZES:
+		catalog = os.path.join(tmpDir, 'catalog_%d' % size)
+		generate_catalog(catalog, size)
+		sizeResults = {}
+		for useCdp in ([False, True] if cdp else [False]):
+			name = 'build extension' + (' --cdp' if useCdp else '')
+			buildDir = os.path.join(tmpDir, 'build_%d' % size)
+			sizeResults[name] = _measure_build(lambda: buildExtension.build_extension(
+				catalog, os.path.join(tmpDir, 'bench_%d.zip' % size), buildDir, cdp=useCdp, native=native), repeat)
+			if printMsg:
+				r = sizeResults[name]
+				print('%6d blocks  %-24s %10.4f s %12d bytes %12d bytes zip' % (size, name, r['seconds'], r['peakBytes'], r['zipBytes']))
+				for phase, seconds in r['phases'].items():
+					print('%6s         %-40s %10.4f s' % ('', phase, seconds))
+		results[str(size)] = sizeResults
+	return {
+		'benchmark': 'extension',
+		'version': blockMetadataGenerator.version,
+		'python': sys.version.split()[0],
+		'platform': sys.platform,
+		'repeat': repeat,
+		'native': native,
+		'results': results,
+	}
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+	"""
+	Compare benchmark results against a baseline.
+	:param baseline: The baseline results.
+	:param current: The current results.
+	:param threshold: The fraction by which a time, peak memory or zip size may exceed the baseline before it is a regression.
+	:return: List of regressions, each describing the benchmark and how much worse it is.
+	"""
+	regressions = []
+	for size, benchmarks in current.get('results', {}).items():
+		for name, result in benchmarks.items():
+			base = baseline.get('results', {}).get(size, {}).get(name)
+			if base is None: continue
+			for metric in METRICS:
+				if base.get(metric) and metric in result and result[metric] > base[metric] * (1 + threshold):
+					regressions.append('%s blocks, %s: %s %s is %.0f%% more than the baseline %s' % (
+						size, name, metric, result[metric], 100.0 * (result[metric] / base[metric] - 1), base[metric]))
+	return regressions
+
+def _readResults(path):
+	with open(path, encoding='utf8') as f:
+		return json.load(f)
+
+def _checkRegressions(baseline, current, threshold):
+	regressions = compare_results(baseline, current, threshold)
+	for r in regressions:
+		print('REGRESSION  ' + r)
+	if regressions:
+		raise Exception('%d benchmark regression(s) of more than %d%%' % (len(regressions), round(threshold * 100)))
+	print('No benchmark regressions of more than %d%%' % round(threshold * 100))
+
+def add_arguments_run(parser):
+	parser.add_argument('--output', metavar='JSON_FILE', type=str, required=True, help='the JSON file to write the results to, which can be used as a baseline')
+	parser.add_argument('--sizes', metavar='N,N,...', type=str, required=False, help='comma-separated numbers of blocks to benchmark (defaults to %s)' % ','.join(map(str, DEFAULT_SIZES)))
+	parser.add_argument('--repeat', metavar='N', type=int, default=3, required=False, help='the number of times each benchmark is timed (defaults to 3)')
+	parser.add_argument('--baseline', metavar='JSON_FILE', type=str, required=False, help='compare the results against this baseline, failing on regressions')
+	parser.add_argument('--threshold', metavar='FRACTION', type=float, default=DEFAULT_THRESHOLD, required=False, help='the fraction by which a result may exceed the baseline (defaults to %s)' % DEFAULT_THRESHOLD)
+
+def add_arguments_extension(parser):
+	parser.add_argument('--output', metavar='JSON_FILE', type=str, required=True, help='the JSON file to write the results to, which can be used as a baseline')
+	parser.add_argument('--sizes', metavar='N,N,...', type=str, required=False, help='comma-separated numbers of blocks to benchmark (defaults to %s)' % ','.join(map(str, DEFAULT_EXTENSION_SIZES)))
+	parser.add_argument('--repeat', metavar='N', type=int, default=3, required=False, help='the number of times each build is timed (defaults to 3)')
+	parser.add_argument('--noCdp', action='store_true', default=False, required=False, help='do not benchmark building with --cdp')
+	parser.add_argument('--native', action='store_true', default=False, required=False, help='extract the block metadata by parsing the mon files directly, without running apamadoc in a JVM')
+	parser.add_argument('--baseline', metavar='JSON_FILE', type=str, required=False, help='compare the results against this baseline, failing on regressions')
+	parser.add_argument('--threshold', metavar='FRACTION', type=float, default=DEFAULT_THRESHOLD, required=False, help='the fraction by which a result may exceed the baseline (defaults to %s)' % DEFAULT_THRESHOLD)
+
+def add_arguments_compare(parser):
+	parser.add_argument('--baseline', metavar='JSON_FILE', type=str, required=True, help='the baseline results')
+	parser.add_argument('--current', metavar='JSON_FILE', type=str, required=True, help='the results to compare against the baseline')
+	parser.add_argument('--threshold', metavar='FRACTION', type=float, default=DEFAULT_THRESHOLD, required=False, help='the fraction by which a result may exceed the baseline (defaults to %s)' % DEFAULT_THRESHOLD)
+
+def run(args):
+	sizes = [int(s) for s in args.sizes.split(',')] if args.sizes else None
+	results = run_benchmarks(args.tmpDir, sizes, args.repeat, printMsg=True)
+	with open(args.output, 'w', encoding='utf8') as f:
+		json.dump(results, f, indent=4)
+	print(f'Created {args.output}')
+	if args.baseline:
+		_checkRegressions(_readResults(args.baseline), results, args.threshold)
+
+def run_extension(args):
+	sizes = [int(s) for s in args.sizes.split(',')] if args.sizes else None
+	results = run_extension_benchmarks(args.tmpDir, sizes, args.repeat, cdp=not args.noCdp, native=args.native, printMsg=True)
+	with open(args.output, 'w', encoding='utf8') as f:
+		json.dump(results, f, indent=4)
+	print(f'Created {args.output}')
+	if args.baseline:
+		_checkRegressions(_readResults(args.baseline), results, args.threshold)
+
+def run_compare(args):
+	_checkRegressions(_readResults(args.baseline), _readResults(args.current), args.threshold)
@@ -4,16 +4,22 @@
 # Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
 
 import argparse
+import copy
 import logging
-import os, glob
+import os
 import shutil
 import sys
 import subprocess
 import json
+from concurrent.futures import ProcessPoolExecutor
 import xml.etree.cElementTree as ElementTree
 from subprocess import CalledProcessError
 from logging import Formatter
 
+import apamadocCache, apamadocWorker, inputManifest
+import profiler
+import eplDocParser
+
 FORMAT = '%(asctime)-15s %(levelname)s : %(message)s'
 
 
@@ -217,11 +223,16 @@ class MetaDataHolder:
 		self.data['analytics'].extend(blockDataList)
 		return self
 
-	def getJson(self):
+	def getJson(self, compact=False):
+		if compact:
+			return json.dumps(self.data, sort_keys=True, separators=(',', ':'))
 		return json.dumps(self.data, sort_keys=True, indent=4)
 
-	def writeJsonToFile(self, file):
-		json.dump(self.data, file, sort_keys=True, indent=4)
+	def writeJsonToFile(self, file, compact=False):
+		if compact:
+			json.dump(self.data, file, sort_keys=True, separators=(',', ':'))
+		else:
+			json.dump(self.data, file, sort_keys=True, indent=4)
 
 
 class ValidateBlockDollarFields:
@@ -234,26 +245,102 @@ class ValidateBlockDollarFields:
 		self.data['$titleIsDerived'] = False
 		self.fieldWithMultipleOccurances = ['$replacesBlock']
 
+# Precomputed tag sets for validation
+singleBlockTags = frozenset(ValidateBlockDollarFields().data)
+blockTags = singleBlockTags.union(ValidateBlockDollarFields().fieldWithMultipleOccurances)
 
 packageXPath = "./Package"
-blockIdentifierXPath = "./Type[@category='Event']/Member[@name=\"$base\"][@type=\"BlockBase\"][@package='apama.analyticsbuilder']/.."
-blockIdentifierXPathAlternate = "./Type[@category='Event']/Member[@name=\"$base\"][@type=\"apama.analyticsbuilder.BlockBase\"]/.."
-blockIdentifierCategoryXPath = "./DollarFields/DollarField[@name='$blockCategory']"
-blockTypeIdentifierTypeXPath = "./DollarFields/DollarField[@name='$blockType']/Description"
-blockTypeIdentifierDerivedNameXPath = "./DollarFields/DollarField[@name='$derivedName']/Description"
-blockTypeIdentifierTitleIsDerivedXPath = "./DollarFields/DollarField[@name='$titleIsDerived']/Description"
-blockReplacesIdentifierXPath = "./DollarFields/DollarField[@name='$replacesBlock']/Description"
-inputIdentifierXPath = "./Action[@name=\"$process\"]/Parameters/Parameter"
-inputNameIdentifierXPath = "./Action[@name=\"$process\"]/DollarFields/DollarField[@name=\'$inputName\']/Description"
-outputIdentifierXPath = "./Member[@type=\"action\"]"
-defaultValueXPath = "./Member[@name=\'{0}\']"
+inputIdentifierXPath = "./Parameters/Parameter"  # relative to the $process action
+inputNameIdentifierXPath = "./DollarFields/DollarField[@name=\'$inputName\']/Description"  # relative to the $process action
 dollarFieldsXPath = "./DollarFields/DollarField"
-genericTagXPath = "./DollarFields/DollarField[@name='$%s']/Description"
 typeFieldsXPath = "./Package/Type"
 vanillaFieldTags = ['semanticType', 'displayType', 'minNumEntries']
 headerFieldTags = [('displayHeaderName', 'name'), ('displayHeaderValue', 'value')]
 validFieldTags = vanillaFieldTags + [x[0] for x in headerFieldTags]
+memberTags = frozenset('$' + x for x in validFieldTags)
+
+
+## Lookups for a Type element, built in a single pass over its children so that block extraction
+## does not need to run XPath queries over the type for every input, output and parameter.
+class TypeIndex:
+
+	def __init__(self, typeElement, resolveMemberType):
+		self.element = typeElement
+		self.name = typeElement.attrib.get('name')
+		self.members = []               # Member elements with a name, in document order
+		self.membersByName = dict()     # name -> first Member with that name (constants, $DEFAULT_*, $INPUT_TYPE_*, $OUTPUT_TYPE_*)
+		self.actionsByName = dict()     # name -> Action elements with that name, in document order
+		self.dollarFields = []          # (tag name, Description element or None) of the type's @$tags, in document order
+		self.tagDescriptions = dict()   # tag name -> Description elements of the type's @$tags
+		self._memberTags = dict()       # Member -> (tag name -> first Description element)
+		self._memberTypes = dict()      # Member -> (get_member_type result, error)
+		self._resolveMemberType = resolveMemberType
+		for child in typeElement:
+			name = child.attrib.get('name')
+			if child.tag == 'Member':
+				if name is None: continue
+				self.members.append(child)
+				self.membersByName.setdefault(name, child)
+			elif child.tag == 'Action':
+				if name is None: continue
+				self.actionsByName.setdefault(name, []).append(child)
+			elif child.tag == 'DollarFields':
+				for dollarField in child.iterfind('DollarField'):
+					description = dollarField.find('Description')
+					self.dollarFields.append((dollarField.attrib.get('name'), description))
+					if description is not None:
+						self.tagDescriptions.setdefault(dollarField.attrib.get('name'), []).append(description)
+
+	## Return the first Description of the @$tag on the type, or None
+	def tag(self, tagName):
+		descriptions = self.tagDescriptions.get(tagName)
+		return descriptions[0] if descriptions else None
+
+	## Return the first Description of the @$tag on a member, or None
+	def memberTag(self, member, tagName):
+		tags = self._memberTags.get(member)
+		if tags is None:
+			tags = dict()
+			for dollarField in member.iterfind(dollarFieldsXPath):
+				description = dollarField.find('Description')
+				if description is not None:
+					tags.setdefault(dollarField.attrib.get('name'), description)
+			self._memberTags[member] = tags
+		return tags.get(tagName)
+
+	## Return the value of a constant member such as $DEFAULT_<name>, or None
+	def constantValue(self, name):
+		member = self.membersByName.get(name)
+		if member is not None:
+			strValue = member.attrib.get('typeValue', '')
+			return json.loads(strValue)  # JSON is close enough
+		return None
 
+	## Memoized BlockGenerator.get_member_type
+	def memberType(self, member):
+		if member not in self._memberTypes:
+			try:
+				self._memberTypes[member] = (self._resolveMemberType(member), None)
+			except (KeyError, RuntimeError) as err:
+				self._memberTypes[member] = (None, err)
+		memberType, err = self._memberTypes[member]
+		if err is not None:
+			raise err
+		return memberType
+
+
+## Return the longest of the enum keys which is a prefix of value, or None if there is none.
+## Keys are parent parameter keys ending in '_' (see BlockGenerator._getKeyForEnumMapping), so only the prefixes of value
+## ending in '_' are looked up, longest first. Let's say, an enum val named 'foo_bar_baz' is up for grabbing, and there
+## exists two parent parameters named 'foo' and 'foo_bar' of matching type, then 'foo_bar' is the clear winner.
+def _longestPrefixKey(enumKeys, value):
+	end = value.rfind('_')
+	while end != -1:
+		prefix = value[:end + 1]
+		if prefix in enumKeys:
+			return prefix
+		end = value.rfind('_', 0, end)
+	return None
 
 class BlockGenerator:
 	## Parse the Description field from XML into name, description and extended documentation
@@ -268,12 +355,8 @@ class BlockGenerator:
 		return name, description, extendDescription
 
 	# Get default value from member type if any
-	def _getDefaultValue(self, typeElement, defaultFieldName):
-		member = typeElement.find(defaultValueXPath.format(defaultFieldName))
-		if member is not None:
-			strValue = member.attrib.get('typeValue', '')
-			return json.loads(strValue)  # JSON is close enough
-		return None
+	def _getDefaultValue(self, typeIndex, defaultFieldName):
+		return typeIndex.constantValue(defaultFieldName)
 
 	def _isThisTypeSupported(self, elementType):
 		if elementType == 'integer' \
@@ -286,9 +369,9 @@ class BlockGenerator:
 			return False
 
 	# Can be used to create unique hashcode as type and name together can't be duplicated within a particular scope
-	def _getTypeUnderscoreName(self, member):
+	def _getTypeUnderscoreName(self, member, typeIndex):
 		try:
-			parameterType, _, _ = self.get_member_type(member)
+			parameterType, _, _ = typeIndex.memberType(member)
 			if parameterType is None:  # unlikely to not have a type
 				# print('Error getting type or name of the parameter')
 				return "" + '_' + member.attrib.get('name').strip('\t ')
@@ -296,16 +379,17 @@ class BlockGenerator:
 		except (KeyError, RuntimeError) as err:
 			raise Exception('Error getting type or name of the parameter: %s' %err)
 
-	def _getKeyForEnumMapping(self, member):
+	def _getKeyForEnumMapping(self, member, typeIndex):
 		# PAM-28925; since enum format is parentParameterName_* , enum values can be matched against these keys.
-		return self._getTypeUnderscoreName(member) + '_'
+		return self._getTypeUnderscoreName(member, typeIndex) + '_'
 
 	##  Parse XML Type Element and generate list of Input Objects
-	def _createInputElement(self, typeElement):
+	def _createInputElement(self, typeIndex):
 		inputList = []
+		processActions = typeIndex.actionsByName.get('$process', [])
 		# fetch inputName parameters first
 		inputNameMap = dict()
-		for descriptionElement in typeElement.iterfind(inputNameIdentifierXPath):
+		for descriptionElement in (d for action in processActions for d in action.iterfind(inputNameIdentifierXPath)):
 			if descriptionElement.text is None or descriptionElement.text.strip() == '':
 				continue
 			descriptionText = descriptionElement.text.strip()
@@ -316,7 +400,7 @@ class BlockGenerator:
 				inputNameMap[descriptionText] = ''
 
 		count = 0
-		for parameter in typeElement.iterfind(inputIdentifierXPath):
+		for parameter in (p for action in processActions for p in action.iterfind(inputIdentifierXPath)):
 			if 'name' in parameter.attrib and (len(parameter.attrib['name'].strip()) > 7) and parameter.attrib[
 				'name'].startswith('$input_', 0, 7):
 				try:
@@ -328,7 +412,7 @@ class BlockGenerator:
 					else:
 						typePassed = parameter.attrib['type']
 
-					defaultValue = self._getDefaultValue(typeElement, '$INPUT_TYPE_' + inputId)
+					defaultValue = self._getDefaultValue(typeIndex, '$INPUT_TYPE_' + inputId)
 					# Override Type value is a default type is provided
 					if defaultValue is not None:
 						typePassed = defaultValue
@@ -357,10 +441,10 @@ class BlockGenerator:
 		return inputList
 
 	## Parse XML type element and generate list of Output Objects
-	def _createOutputElement(self, typeElement):
+	def _createOutputElement(self, typeIndex):
 		outputList = []
-		for outputMember in typeElement.iterfind(outputIdentifierXPath):
-			if 'name' in outputMember.attrib and (len(outputMember.attrib['name'].strip()) > 11) and \
+		for outputMember in typeIndex.members:
+			if outputMember.attrib.get('type') == 'action' and (len(outputMember.attrib['name'].strip()) > 11) and \
 					outputMember.attrib['name'].startswith('$setOutput_', 0, 11):
 				try:
 					outputEvent = InputOutputHolder()
@@ -378,7 +462,7 @@ class BlockGenerator:
 					else:
 						typePassed = outputParameterElements[1].attrib['type']
 
-					defaultValue = self._getDefaultValue(typeElement, '$OUTPUT_TYPE_' + outputId.strip())
+					defaultValue = self._getDefaultValue(typeIndex, '$OUTPUT_TYPE_' + outputId.strip())
 					outputEvent.setType(defaultValue if (defaultValue is not None) else typePassed)
 					descriptionAll = outputMember.find('Description')
 					outputEvent.setName(outputMember.attrib['name'][11:])
@@ -422,151 +506,151 @@ class BlockGenerator:
 			member_type = member.attrib.get('type').strip()
 		return member_type, is_optional, (self._isThisTypeSupported(member_type))
 
+	# Return the (package name, type name) key of the parameters type of a block, or None if it has no parameters member
+	def _parametersKey(self, typeIndex):
+		parameterNameSearch = typeIndex.name.strip() + '_$Parameters'
+		parameterMember = next((m for m in typeIndex.members if m.attrib.get('type') == parameterNameSearch), None)
+		if parameterMember is None:
+			return None
+		# Fetch the fully qualified name of the parameter from the Block Field Name
+		return parameterMember.attrib.get('package', ''), parameterNameSearch
+
 	# Create Parameter List
-	def _createParameterList(self, typeElement, xmlRootElement):
+	def _createParameterList(self, typeIndex, parameterTypes):
+		key = self._parametersKey(typeIndex)
+		if key is None:
+			return []
+		# Look up the Event of type 'parameterNameSearch' under package 'packageName'
+		parameterTypeIndex = parameterTypes.get(key)
+		if parameterTypeIndex is None:
+			print('Parameter Element not found in XML. Parameter Type = {0}.{1}'.format(*key))
+			return []
+		return self._createParameterListFromType(parameterTypeIndex)
+
+	# Create Parameter List from an indexed parameters type
+	def _createParameterListFromType(self, parameterTypeIndex):
 		parameterList = []
-		parameterNameSearch = typeElement.attrib.get('name').strip() + '_$Parameters'
-		parameterMember = typeElement.find('./Member[@type=\'' + parameterNameSearch + '\']')
-		# Fetch the fully qualified name of the parameter from the Block Field Name
-		if parameterMember is not None:
-			packageName = parameterMember.attrib.get('package', '')
-			# Search the XML Tree for any Event of type 'parameterNameSearch' under package 'packageName'
-			parameterTypeElement = xmlRootElement.find(
-				'./Package[@name=\'' + packageName + '\']/Type[@category=\'Event\'][@name=\'' + parameterNameSearch + '\']')
+		memberToEnumVals = self._createEnumeratedValues(parameterTypeIndex)
 
-			if parameterTypeElement is None:
-				print('Parameter Element not found in XML. Parameter Type = {0}.{1}'.format(packageName,
-				                                                                                        parameterNameSearch))
-				return parameterList
+		for member in parameterTypeIndex.members:
+			try:
+				parameter_type, is_optional_type, is_supported_type = parameterTypeIndex.memberType(member)
+
+				# exclude the constant/non-supported-type parameter
+				if 'constant' not in member.attrib \
+						and is_supported_type:
+					parameterId = member.attrib.get('name').strip('\t ')
+					parameterObject = Parameter().setParameterId(parameterId)
+
+					for extraTag in vanillaFieldTags:
+						tag = parameterTypeIndex.memberTag(member, '$' + extraTag)
+						if tag is not None and tag.text is not None:
+							parameterObject.set(extraTag, tag.text.strip())
+					for extraTag, name in headerFieldTags:
+						tag = parameterTypeIndex.memberTag(member, '$' + extraTag)
+						if tag is not None and tag.text is not None:
+							parameterObject.setHeader(name, tag.text.strip())
+
+					# check if parameter has default value
+					parameterObject.setDefaultValue(
+						self._getDefaultValue(parameterTypeIndex, '$DEFAULT_' + member.attrib.get('name')))
+
+					if is_optional_type: parameterObject.setOptional(True)
+					parameterObject.setType(parameter_type)
+					parameterObject.setName(parameterId)
+
+					# get description
+					descriptionAll = member.find('Description')
+					if descriptionAll is not None:
+						(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
+						parameterObject.setDescription(descriptionField).setExtendDocumentation(extendDocsField)
+						# Override Name field with name provided in description
+						if nameField is not None and nameField != '':
+							parameterObject.setName(nameField)
 
-			memberToEnumVals = self._createEnumeratedValues(parameterTypeElement)
+					# populate the enum list for each applicable member.
+					keyForEnumMapping = self._getKeyForEnumMapping(member, parameterTypeIndex)
+					if keyForEnumMapping in memberToEnumVals and memberToEnumVals[keyForEnumMapping]:
+						parameterObject.setEnumValuesJsonList(memberToEnumVals[keyForEnumMapping])
 
-			for member in parameterTypeElement.iterfind('./Member[@name]'):
-				try:
-					parameter_type, is_optional_type, is_supported_type = self.get_member_type(member)
-
-					# exclude the constant/non-supported-type parameter
-					if 'constant' not in member.attrib \
-							and is_supported_type:
-						parameterId = member.attrib.get('name').strip('\t ')
-						parameterObject = Parameter().setParameterId(parameterId)
-
-						for extraTag in vanillaFieldTags:
-							tag = member.find(genericTagXPath % extraTag)
-							if tag is not None and tag.text is not None:
-								parameterObject.set(extraTag, tag.text.strip())
-						for extraTag, name in headerFieldTags:
-							tag = member.find(genericTagXPath % extraTag)
-							if tag is not None and tag.text is not None:
-								parameterObject.setHeader(name, tag.text.strip())
-
-						# check if parameter has default value
-						parameterObject.setDefaultValue(
-							self._getDefaultValue(parameterTypeElement, '$DEFAULT_' + member.attrib.get('name')))
-
-						if is_optional_type: parameterObject.setOptional(True)
-						parameterObject.setType(parameter_type)
-						parameterObject.setName(parameterId)
-
-						# get description
-						descriptionAll = member.find('Description')
-						if descriptionAll is not None:
-							(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
-							parameterObject.setDescription(descriptionField).setExtendDocumentation(extendDocsField)
-							# Override Name field with name provided in description
-							if nameField is not None and nameField != '':
-								parameterObject.setName(nameField)
-
-						# populate the enum list for each applicable member.
-						keyForEnumMapping = self._getKeyForEnumMapping(member)
-						if keyForEnumMapping in memberToEnumVals and memberToEnumVals[keyForEnumMapping]:
-							parameterObject.setEnumValuesJsonList(memberToEnumVals[keyForEnumMapping])
-
-						parameterList.append(parameterObject.getUnderlyingDataMap())
-				except (KeyError, RuntimeError) as err:
-					print('Error parsing parameter Elements: %s' %err)
+					parameterList.append(parameterObject.getUnderlyingDataMap())
+			except (KeyError, RuntimeError) as err:
+				print('Error parsing parameter Elements: %s' %err)
 		return parameterList
 
 	# Finds and creates enum values, maps them to correct parameter
-	def _createEnumeratedValues(self, parameterTypeElement):
+	def _createEnumeratedValues(self, parameterTypeIndex):
 
 		# for string of parent parameter to list of enumValues
 		memberToEnumVals = dict()
+		constantMembers = []
 
-		# first capture non-constant members into dict as keys.
-		for member in parameterTypeElement.iterfind('./Member[@name]'):
+		# capture non-constant members into dict as keys, and collect the constant members to match against them.
+		for member in parameterTypeIndex.members:
 			try:
-				parameter_type, _, is_supported_type = self.get_member_type(member)
-				if 'constant' not in member.attrib \
-						and is_supported_type:
-					key = self._getKeyForEnumMapping(member)
+				parameter_type, _, is_supported_type = parameterTypeIndex.memberType(member)
+				if not is_supported_type:
+					continue
+				if 'constant' not in member.attrib:
+					key = self._getKeyForEnumMapping(member, parameterTypeIndex)
 					memberToEnumVals[key] = []  # populate this list while processing constant members
+				else:
+					constantMembers.append(member)
 
 			except (KeyError, RuntimeError) as err:
 				raise Exception('Error parsing parameter Elements: %s' %err)
 
-		keyList = list(memberToEnumVals.keys())
-		# Algo in short: Reverse the list to get the longest matching prefix.
-		# Let's say, an enum val named 'foobarbar' is up for grabbing, and there exists two
-		# parent parameter named 'foo' and 'foobar' of matching type, then in that case
-		# the later one i.e. 'foobar' should be the clear winner in grabbing the enum val.
-		keyList.sort(reverse=True)
-
 		# now capture matching constant members into dict as corresponding values.
-		for member in parameterTypeElement.iterfind('./Member[@name]'):
+		for member in constantMembers:
 			try:
-				parameter_type, _, is_supported_type = self.get_member_type(member)
-				if 'constant' in member.attrib \
-						and is_supported_type:
+				constVal = self._getTypeUnderscoreName(member, parameterTypeIndex)
+				parentMember = _longestPrefixKey(memberToEnumVals, constVal)
+				if parentMember is None:
+					continue
+				enumId = constVal[len(parentMember):]  # trim out parent-name from the parent-name-prefixed-enums
+				enumVal = EnumeratedValues().setId(enumId)  # create the enum value
+
+				descriptionAll = member.find('Description')
+				if descriptionAll is not None:
+					(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
+					enumVal.setName(nameField)  # nameField is treated as name in case of enums
+					if descriptionField: enumVal.setDescription(descriptionField)  # used for tooltip
+				else:
+					enumVal.setName(enumId)
+					print('No apamadoc found for the name of enum : %s' % member.attrib.get('name').strip('\t '))
 
-					constVal = self._getTypeUnderscoreName(member)
-					for parentMember in keyList:
-						if constVal.startswith(parentMember):
-							enumId = constVal[
-							         len(parentMember):]  # trim out parent-name from the parent-name-prefixed-enums
-							enumVal = EnumeratedValues().setId(enumId)  # create the enum value
-
-							descriptionAll = member.find('Description')
-							if descriptionAll is not None:
-								(nameField, descriptionField, extendDocsField) = self._parseDescription(descriptionAll)
-								enumVal.setName(nameField)  # nameField is treated as name in case of enums
-								if descriptionField: enumVal.setDescription(descriptionField)  # used for tooltip
-							else:
-								enumVal.setName(enumId)
-								print('No apamadoc found for the name of enum : %s' % member.attrib.get('name').strip('\t '))
-
-							enumVal.setValue(member.attrib.get('typeValue').strip('" '))
-							memberToEnumVals[parentMember].append(
-								enumVal.getUnderlyingDataMap())  # chain it to corresponding list
-							break
+				enumVal.setValue(member.attrib.get('typeValue').strip('" '))
+				memberToEnumVals[parentMember].append(
+					enumVal.getUnderlyingDataMap())  # chain it to corresponding list
 			except (KeyError, RuntimeError) as err:
 				print('Error parsing parameter Elements: %s' %err)
 
 		return memberToEnumVals
 
-	## create Block object from the xml element passed
-	def _createBlock(self, blockId, typeElement, xmlRootElement):
+	## create Block object from the xml element passed, calling createParameterList for the list of its parameters
+	def _createBlock(self, blockId, typeIndex, createParameterList):
 
+		typeElement = typeIndex.element
 		# set Block Id
 		block = Block().setBlockId(blockId)
 		# set Block Group
-		blockCategory = typeElement.find(blockIdentifierCategoryXPath + '/Description')
+		blockCategory = typeIndex.tag('$blockCategory')
 		if blockCategory is not None and blockCategory.text is not None:
 			block.setBlockCategory(blockCategory.text.strip())
 		# set Block Type
-		blockType = typeElement.find(blockTypeIdentifierTypeXPath)
+		blockType = typeIndex.tag('$blockType')
 		if blockType is not None and blockType.text is not None:
 			block.setBlockType(blockType.text.strip())
 		# set Derived Name for the block
-		derivedName = typeElement.find(blockTypeIdentifierDerivedNameXPath)
+		derivedName = typeIndex.tag('$derivedName')
 		if derivedName is not None and derivedName.text is not None:
 			block.setBlockDerivedName(derivedName.text.strip())
 		# set titleIsDerived Name for the block
-		titleIsDerived = typeElement.find(blockTypeIdentifierTitleIsDerivedXPath)
+		titleIsDerived = typeIndex.tag('$titleIsDerived')
 		if titleIsDerived is not None and titleIsDerived.text is not 'false':
 			block.setTitleIsDerived(titleIsDerived.text.strip())
 		# set block to replace.
-		replacesBlockList = typeElement.findall(blockReplacesIdentifierXPath)
+		replacesBlockList = typeIndex.tagDescriptions.get('$replacesBlock', [])
 		for replacesBlock in replacesBlockList:
 			if replacesBlock is not None and replacesBlock.text is not None:
 				block.setBlockReplacementList(replacesBlock.text.strip())
@@ -577,38 +661,147 @@ class BlockGenerator:
 			block.setBlockName(nameField).setDescription(
 				descriptionField if descriptionField is not None else '').setExtendDocs(extendDocsField)
 		# set Input Event List
-		block.setInputEventJsonList(self._createInputElement(typeElement))
+		block.setInputEventJsonList(self._createInputElement(typeIndex))
 		# set Output Events List
-		block.setOutputEventJsonList(self._createOutputElement(typeElement))
+		block.setOutputEventJsonList(self._createOutputElement(typeIndex))
 		# set Parameter List
-		block.setParameterJsonList(self._createParameterList(typeElement, xmlRootElement))
+		block.setParameterJsonList(createParameterList())
 
 		return block
 
 	## Parse input xmlRootElement and return map of blockId and Block object
 	def getAllValidBlockElements(self, xmlRootElement):
-		self.validateTags(xmlRootElement)
-		blockList = []
+		parameterTypes = dict()
+		blockTypes = []
+		errors = []
 		for package in xmlRootElement.findall(packageXPath):
-			# search all Events which has 'apama.analytics.BaseBlock $base' member
-			eventTypeList = package.findall(blockIdentifierXPath)
-			eventTypeList.extend(package.findall(blockIdentifierXPathAlternate))
+			blockTypes.append((package.attrib['name'], [], []))
+			for element in package.findall('./Type'):
+				self._visitType(element, blockTypes[-1], parameterTypes, errors)
+		self._raiseErrors(errors)
+		return self._createBlockList([(name, primary + alternate) for (name, primary, alternate) in blockTypes], parameterTypes)
+
+	## Visit a Type element once, validating its tags and recording it if it is a block or parameter type.
+	## blockTypes is the (package name, blocks with BlockBase member, blocks with qualified BlockBase member) entry
+	## for its package. Validation errors are appended to errors. Returns True if the type was recorded.
+	def _visitType(self, element, blockTypes, parameterTypes, errors):
+		typeIndex = TypeIndex(element, self.get_member_type)
+		errors.extend(self._typeTagErrors(typeIndex))
+		if element.attrib.get('category') != 'Event':
+			return False
+		# search all Events which has 'apama.analytics.BaseBlock $base' member
+		baseTypes = [(m.attrib.get('type'), m.attrib.get('package')) for m in typeIndex.members if m.attrib['name'] == '$base']
+		if ('BlockBase', 'apama.analyticsbuilder') in baseTypes:
+			blockTypes[1].append(typeIndex)
+		elif any(t == 'apama.analyticsbuilder.BlockBase' for (t, _) in baseTypes):
+			blockTypes[2].append(typeIndex)
+		elif typeIndex.name is not None and typeIndex.name.endswith('_$Parameters'):
+			parameterTypes.setdefault((blockTypes[0], typeIndex.name), typeIndex)
+		else:
+			return False
+		return True
 
-			for element in eventTypeList:
-				# check if Event type contains DollarField blockCategory
-				if element.find(blockIdentifierCategoryXPath) is not None:
+	## Create the block list from (package name, block TypeIndexes) pairs, looking up parameter types in parameterTypes
+	def _createBlockList(self, blockTypes, parameterTypes):
+		blockList = []
+		for packageName, typeIndexList in blockTypes:
+			for typeIndex in typeIndexList:
+				block = self._createBlockData(packageName, typeIndex, lambda: self._createParameterList(typeIndex, parameterTypes))
+				if block is not None:
+					blockList.append(block)
+		return blockList
 
-					blockId = package.attrib['name'].strip() + '.' + element.attrib['name'].strip()
+	## Return the data of the block of an indexed block type, or None if it is not a valid block.
+	## createParameterList is called for the list of its parameters.
+	def _createBlockData(self, packageName, typeIndex, createParameterList):
+		element = typeIndex.element
+		# check if Event type contains DollarField blockCategory
+		if any(tagName == '$blockCategory' for (tagName, _) in typeIndex.dollarFields):
 
-					blockObj = self._createBlock(blockId, element, xmlRootElement)
-					if blockObj == None:
-						print('Error extracting block for event %s' % blockId)
-						continue
-					blockList.append(blockObj.getUnderlyingDataMap())
+			blockId = packageName.strip() + '.' + element.attrib['name'].strip()
+
+			blockObj = self._createBlock(blockId, typeIndex, createParameterList)
+			if blockObj == None:
+				print('Error extracting block for event %s' % blockId)
+				return None
+			return blockObj.getUnderlyingDataMap()
+		else:
+			print('Valid Analytics Builder Block must have $blockCategory tag in apamadocs. Event Name = %s' %
+				element.attrib['name'])
+			return None
+
+	## Stream the structure.xml file and return the list of blocks, in the same order as getAllValidBlockElements.
+	## Each Package/Type is read, validated and indexed once. A block is created as soon as both its type and its
+	## parameters type have been read, and its elements are then dropped, so only the types which are still waiting
+	## for the other are kept in memory.
+	def getAllValidBlockElementsFromFile(self, xmlPath):
+		blockSlots = []  # (package name, blocks with BlockBase member, blocks with qualified BlockBase member), each block in a one-item list
+		waiting = dict()  # parameters type key -> [(slot, package name, block TypeIndex)] read before their parameters type
+		parameterTypes = dict()  # parameters type key -> TypeIndex, read before any of its blocks
+		parameterLists = dict()  # parameters type key -> [parameter list, whether a block has it]
+		errors = []
+		depth = 0
+		root = package = None
+		try:
+			for event, element in ElementTree.iterparse(xmlPath, events=('start', 'end')):
+				if event == 'start':
+					depth += 1
+					if depth == 1:
+						root = element
+					elif depth == 2 and element.tag == 'Package':
+						package = element
+						blockSlots.append((element.attrib['name'], [], []))
+					continue
+				depth -= 1
+				if depth == 2 and package is not None and element.tag == 'Type':
+					package.remove(element)
+					self._streamType(element, blockSlots[-1], waiting, parameterTypes, parameterLists, errors)
+				elif depth == 1 and element is package:
+					root.remove(element)
+					package = None
+		except (ElementTree.ParseError, OSError):
+			raise RuntimeError(sys.exc_info()[1])
+		self._raiseErrors(errors)
+		# blocks whose parameters type was never read
+		for blocks in waiting.values():
+			for slot, packageName, typeIndex in blocks:
+				slot.append(self._createBlockData(packageName, typeIndex, lambda: self._createParameterList(typeIndex, {})))
+		return [slot[0] for (_, primary, alternate) in blockSlots for slot in primary + alternate if slot[0] is not None]
+
+	## Visit a streamed Type element, creating the blocks that it completes and keeping it only if it is waiting for another type
+	def _streamType(self, element, blockSlots, waiting, parameterTypes, parameterLists, errors):
+		packageName = blockSlots[0]
+		visited = (packageName, [], [])
+		visitedParameterTypes = dict()
+		self._visitType(element, visited, visitedParameterTypes, errors)
+		for key, parameterTypeIndex in visitedParameterTypes.items():
+			if key in parameterTypes or key in parameterLists:
+				continue  # the first type of a name is used, as in getAllValidBlockElements
+			if key in waiting:
+				parameterLists[key] = [self._createParameterListFromType(parameterTypeIndex), False]
+				for slot, blockPackageName, typeIndex in waiting.pop(key):
+					slot.append(self._createBlockData(blockPackageName, typeIndex, lambda: self._takeParameterList(parameterLists[key])))
+			else:
+				parameterTypes[key] = parameterTypeIndex
+		for slots, typeIndexList in zip(blockSlots[1:], visited[1:]):
+			for typeIndex in typeIndexList:
+				slot = []
+				slots.append(slot)
+				key = self._parametersKey(typeIndex)
+				if key is None:
+					slot.append(self._createBlockData(packageName, typeIndex, list))
+				elif key in parameterTypes or key in parameterLists:
+					if key not in parameterLists:
+						parameterLists[key] = [self._createParameterListFromType(parameterTypes.pop(key)), False]
+					slot.append(self._createBlockData(packageName, typeIndex, lambda: self._takeParameterList(parameterLists[key])))
 				else:
-					print('Valid Analytics Builder Block must have $blockCategory tag in apamadocs. Event Name = %s' %
-						element.attrib['name'])
-		return blockList
+					waiting.setdefault(key, []).append((slot, packageName, typeIndex))
+
+	## Return the parameter list of a parameters type, copying it if another block already has it
+	def _takeParameterList(self, entry):
+		parameterList, taken = entry
+		entry[1] = True
+		return copy.deepcopy(parameterList) if taken else parameterList
 
 	## Parse input XML ElementTree and return the root element
 	def getRootElement(self, xmlPath):
@@ -620,70 +813,58 @@ class BlockGenerator:
 
 	## Validate all the @$tags for their valid names and locations
 	def validateTags(self, xmlRootElement):
-		parentList = xmlRootElement.findall(typeFieldsXPath)
-		for parent in parentList:
-			tagsOnEventList = parent.findall(dollarFieldsXPath)
-			validator = ValidateBlockDollarFields()
-			for dollarTag in tagsOnEventList:
-				tagName = dollarTag.attrib['name'].strip()
-				if tagName not in validator.fieldWithMultipleOccurances and tagName in validator.data and \
-						validator.data[tagName] == True:
-					self.raiseError('Multiple tags %s are present in the block' % tagName)
-				if tagName in validator.data:
-					validator.data[tagName] = True
-				description = None
-				if dollarTag.find('Description') is not None and dollarTag.find('Description').text is not None:
-					description = dollarTag.find('Description').text.strip()
-
-				self.validateTag(parent, None, tagName, description)
-
-			actionTags = parent.findall("./Action")
-			for actionTag in actionTags:
-				tagsOnActionList = actionTag.findall(dollarFieldsXPath)
-				for dollarTag in tagsOnActionList:
-					tagName = dollarTag.attrib['name'].strip()
-					description = None
-					if dollarTag.find('Description') is not None and dollarTag.find('Description').text is not None:
-						description = dollarTag.find('Description').text.strip()
-
-					self.validateTag(actionTag, parent, tagName, description)
-
-			memberTags = parent.findall("./Member")
-			for memberTag in memberTags:
-				tagsOnMemberList = memberTag.findall(dollarFieldsXPath)
-				for dollarTag in tagsOnMemberList:
-					tagName = dollarTag.attrib['name'].strip()
-					description = None
-					if dollarTag.find('Description') is not None and dollarTag.find('Description').text is not None:
-						description = dollarTag.find('Description').text.strip()
-
-					self.validateTag(memberTag, parent, tagName, description)
-
-	def validateCategoryOrTypeName(self, parentElement, grandParentElement, tagName, description):
-		if 'category' not in parentElement.attrib or not parentElement.attrib[
-			                                                 'category'] == 'Event' or parentElement.find(
-			'./Member[@name=\"$base\"]') is None:
-			parentName = self.getElementName(parentElement)
-			grandParentName = self.getElementName(grandParentElement)
-			errorMessage = self.createErrorMessage(parentName, grandParentName, tagName,
-			                                       description) + ' This is only valid on a block event which has a member \'$base\'.'
-			self.raiseError(errorMessage)
-
-	def validateActionName(self, actionElement, eventElement, tagName, description):
-		if 'name' not in actionElement.attrib or not actionElement.attrib['name'] == '$process':
-			parentName = self.getElementName(actionElement)
-			grandParentName = self.getElementName(eventElement)
-			errorMessage = self.createErrorMessage(parentName, grandParentName, tagName,
-			                                       description) + ' This is only valid on a $process action.'
-			self.raiseError(errorMessage)
-
-	def validateMemberTagName(self, memberElement, eventElement, tagName, description):
-		if not memberElement.tag == 'Member':
-			parentName = self.getElementName(memberElement)
-			grandParentName = self.getElementName(eventElement)
-			errorMessage = self.createErrorMessage(parentName, grandParentName, tagName,
-			                                       description) + ' This is only valid on an event field.'
-			self.raiseError(errorMessage)
+		errors = []
+		for parent in xmlRootElement.findall(typeFieldsXPath):
+			errors.extend(self._typeTagErrors(TypeIndex(parent, self.get_member_type)))
+		self._raiseErrors(errors)
+
+	## Validate all the @$tags on a Type element and its actions and members
+	def validateTypeTags(self, parent):
+		self._raiseErrors(self._typeTagErrors(TypeIndex(parent, self.get_member_type)))
+
+	## Return the list of errors for the @$tags on an indexed Type element and its actions and members
+	def _typeTagErrors(self, typeIndex):
+		errors = []
+		parent = typeIndex.element
+		isBlockEvent = parent.attrib.get('category') == 'Event' and '$base' in typeIndex.membersByName
+		seenTags = set()
+		for (tagName, description) in typeIndex.dollarFields:
+			tagName = tagName.strip()
+			if tagName in singleBlockTags and tagName in seenTags:
+				errors.append('Multiple tags %s are present in the block' % tagName)
+			seenTags.add(tagName)
+			error = self._tagError(parent, None, tagName, description, isBlockEvent)
+			if error is not None: errors.append(error)
+
+		for child in parent:
+			if child.tag == 'Action' or child.tag == 'Member':
+				for dollarTag in child.iterfind(dollarFieldsXPath):
+					error = self._tagError(child, parent, dollarTag.attrib['name'].strip(), dollarTag.find('Description'), isBlockEvent)
+					if error is not None: errors.append(error)
+		return errors
+
+	## Return the error for a @$tag on tagParent, or None if the tag is valid there
+	def _tagError(self, tagParent, tagGrandParent, tagName, descriptionElement, isBlockEvent):
+		if tagName in blockTags:
+			if tagGrandParent is None and isBlockEvent: return None
+			suffix = ' This is only valid on a block event which has a member \'$base\'.'
+		elif tagName == '$inputName':
+			if tagParent.attrib.get('name') == '$process': return None
+			suffix = ' This is only valid on a $process action.'
+		elif tagName in memberTags:
+			if tagParent.tag == 'Member': return None
+			suffix = ' This is only valid on an event field.'
+		else:
+			suffix = ''
+		description = None
+		if descriptionElement is not None and descriptionElement.text is not None:
+			description = descriptionElement.text.strip()
+		return self.createErrorMessage(self.getElementName(tagParent), self.getElementName(tagGrandParent), tagName, description) + suffix
+
+	## Raise a single error listing all of the validation errors, if there are any
+	def _raiseErrors(self, errors):
+		if errors:
+			raise RuntimeError('\n'.join('Invalid tag present in the monitor file. Error = %s' % e for e in errors))
 
 	def raiseError(self, errorMessage):
 		raise RuntimeError('Invalid tag present in the monitor file. Error = %s' % errorMessage)
@@ -709,33 +890,22 @@ class BlockGenerator:
 
 		return errorMessage
 
-	def validateTag(self, tagParent, tagGrandParent, tagName, tagDescription):
-		validator = ValidateBlockDollarFields()
-		if tagName in list(validator.data.keys()) or tagName in validator.fieldWithMultipleOccurances:
-			self.validateCategoryOrTypeName(tagParent, tagGrandParent, tagName, tagDescription)
-		elif tagName == '$inputName':
-			self.validateActionName(tagParent, tagGrandParent, tagName, tagDescription)
-		elif tagName in ['$' + x for x in validFieldTags]:
-			self.validateMemberTagName(tagParent, tagGrandParent, tagName, tagDescription)
-		else:
-			parentName = self.getElementName(tagParent)
-			grandParentName = self.getElementName(tagGrandParent)
-			errorMessage = self.createErrorMessage(parentName, grandParentName, tagName, tagDescription)
-			self.raiseError(errorMessage)
-
-
-
 
 
 
 class ScriptRunner:
-	def __init__(self, apama_home, java_home, outputFile, inputDir, tmpDir, version):
+	def __init__(self, apama_home, java_home, outputFile, inputDir, tmpDir, version, cacheDir=None, native=False, compact=False, manifest=None):
 		self.apamaHome = apama_home
 		self.javaHome = java_home
-		self.outputFile = os.path.abspath(outputFile)
-		self.inputDir = os.path.abspath(inputDir)
-		self.tmpDir = os.path.abspath(tmpDir)
+		self.outputFile = os.path.abspath(outputFile) if outputFile else None
+		self.inputDir = os.path.abspath(inputDir) if inputDir is not None else None
+		self.tmpDir = os.path.abspath(tmpDir) if tmpDir is not None else None
 		self.scriptVersion = version
+		self.cacheDir = cacheDir
+		self.native = native
+		self.compact = compact
+		self.manifest = manifest
+		self.metadata = None
 
 
 	nestedProperties = ['inputs', 'outputs', 'parameters']
@@ -749,75 +919,101 @@ class ScriptRunner:
 	ENUM_VAL='enumeratedValues'
 	ENUM = 'enums'
 
-	def _mangleBraces(self, str):
-		ret=''
-		for c in str:
-			if c=='{' or c=='}':
-				ret=ret+'{{'+c+'}}'
-			else:
-				ret=ret+c
-		return ret
+	BRACES_TRANSLATION = str.maketrans({'{': '{{{}}', '}': '{{}}}'})
 
-	def _extractProperty(self, object, message_id, uniqueIdentifier, simpleProperties):
+	def _mangleBraces(self, str):
+		return str.translate(self.BRACES_TRANSLATION)
 
-		"""Extracts the simple properties from the object."""
-		results={}
-		for obj in object:
+	def _addMessages(self, messages, objects, message_id):
+		"""Adds the messages for the simple properties of the objects, and their enumerated values and display headers."""
+		uniqueIdentifier = self.uniqueIdentifiers[1]
+		for obj in objects:
 			if uniqueIdentifier not in obj:
 				continue
 			obj_id = message_id + self.SEP_UNDERSCORE + obj[uniqueIdentifier]
-			for property in simpleProperties:
+			for property in self.simpleProperties:
 				if property in obj:
-					prop_val = obj[property]				
-					results.update({obj_id + self.SEP_UNDERSCORE + property:self._mangleBraces(prop_val)})
+					messages[obj_id + self.SEP_UNDERSCORE + property] = obj[property].translate(self.BRACES_TRANSLATION)
 			if self.ENUM_VAL in obj:
-				res=self._extractProperty(obj[self.ENUM_VAL], message_id+ self.SEP_UNDERSCORE+ obj[uniqueIdentifier]+ self.SEP_UNDERSCORE + self.ENUM, uniqueIdentifier, simpleProperties )
-				results.update(res)
+				self._addMessages(messages, obj[self.ENUM_VAL], obj_id + self.SEP_UNDERSCORE + self.ENUM)
 			if self.DISPLAY_HEADER in obj:
 				dispobj = obj[self.DISPLAY_HEADER]
 				for p in self.DISPLAY_HEADER_KEYS:
 					if p in dispobj:
-						results.update({obj_id + self.SEP_UNDERSCORE + self.DISPLAY_HEADER + self.SEP_UNDERSCORE + p: self._mangleBraces(dispobj[p])})
-		return results
+						messages[obj_id + self.SEP_UNDERSCORE + self.DISPLAY_HEADER + self.SEP_UNDERSCORE + p] = dispobj[p].translate(self.BRACES_TRANSLATION)
+
+	def _extractMessages(self, blockList):
+		"""Extracts the messages for all the blocks in a single pass over their metadata."""
+		messages = {}
+		for block in blockList:
+			block_id = self.BLOCK_PREFIX + self.SEP_UNDERSCORE + block[self.uniqueIdentifiers[1]]
+			for property in self.simpleProperties:
+				if property in block:
+					messages[block_id + self.SEP_UNDERSCORE + property] = block[property].translate(self.BRACES_TRANSLATION)
+			for property in self.nestedProperties:
+				self._addMessages(messages, block[property], block_id + self.SEP_UNDERSCORE + property)
+		return messages
 
 	def _generateJSONoutput(self, structureXMLPath):
 		blockGeneratorLogic = BlockGenerator()
+		with profiler.phase('extract blocks'):
+			blockList = blockGeneratorLogic.getAllValidBlockElementsFromFile(structureXMLPath)
+		return self._writeJSONoutput(blockList)
+
+	## Return the mon files of the input directory, walking it only if no manifest was provided
+	def _monFiles(self):
+		if self.manifest is None:
+			self.manifest = inputManifest.InputManifest.scan(self.inputDir)
+		return self.manifest.mons
+
+	## Parse the mon files directly, without running apamadoc, and return the list of blocks
+	def _generateNativeBlockList(self):
+		monFiles = sorted(self._monFiles(), key=lambda f: str(f.path))
+		blockGeneratorLogic = BlockGenerator()
+		with profiler.phase('parse mon files'):
+			structure = eplDocParser.generate_structure(monFiles)
+		with profiler.phase('extract blocks'):
+			return blockGeneratorLogic.getAllValidBlockElements(structure)
+
+	def _writeJSONoutput(self, blockList):
 		metaDataHolder = MetaDataHolder()
 		metaDataHolder.setVersion(self.scriptVersion)
-		root = blockGeneratorLogic.getRootElement(structureXMLPath)
-		if root is None:
-			raise Exception('Cannot generate block metadata because of empty structure.xml file: %s', structureXMLPath)
-		blockList = blockGeneratorLogic.getAllValidBlockElements(root)
 		metaDataHolder.setBlockList(blockList)
+		self.metadata = metaDataHolder.data
 
-		with open(self.outputFile, 'w') as file:
-			metaDataHolder.writeJsonToFile(file)
-		messages={}
-		for block in blockList:
-			block_id =  self.BLOCK_PREFIX + self.SEP_UNDERSCORE + block[self.uniqueIdentifiers[1]]
-			for property in self.simpleProperties:
-				if property in block:
-					prop_val = block[property]
-					messages.update({block_id + self.SEP_UNDERSCORE + property : self._mangleBraces(prop_val)})
-			
-			for property in self.nestedProperties:
-				r = self._extractProperty(block[property], block_id + self.SEP_UNDERSCORE + property, self.uniqueIdentifiers[1], self.simpleProperties)
-				messages.update(r)
-
-		return (messages, blockList)
+		if self.outputFile:
+			with profiler.phase('write JSON'):
+				os.makedirs(os.path.dirname(self.outputFile), exist_ok=True)
+				with open(self.outputFile, 'w') as file:
+					metaDataHolder.writeJsonToFile(file, self.compact)
+		with profiler.phase('extract messages'):
+			return (self._extractMessages(blockList), blockList)
 
 	#Generate Apama Docs for each Catalog list and parse the structure.xml to create Block JSON file
-	def _generateApamaDocs(self):
+	def _generateApamaDocs(self, inputDir=None, apamaDocOutput=None):
 		"""
 		Generate Apama Doc for all the monitors in the specified directory.
+		:param inputDir: The directory containing the monitors, defaults to the input directory.
+		:param apamaDocOutput: The directory for the generated Apama Doc, defaults to apamadoc in the temporary directory.
 		:return: Path to the generated structure.xml
 		"""
+		inputDir = inputDir or self.inputDir
 		apamaDocErrLog = os.path.join(self.tmpDir, 'apamadoc_err.log')
 		apamaDocOutLog = os.path.join(self.tmpDir, 'apamadoc_out.log')
 		
-		apamaDocOutput = os.path.join(self.tmpDir, 'apamadoc')
+		apamaDocOutput = apamaDocOutput or os.path.join(self.tmpDir, 'apamadoc')
 		if not os.path.exists(apamaDocOutput):
 			os.makedirs(apamaDocOutput)
+
+		# Use the apamadoc worker if one has been started, to avoid starting a JVM for every build
+		result = apamadocWorker.generate(self.apamaHome, apamaDocOutput, inputDir, apamaDocOutLog, apamaDocErrLog, self.cacheDir)
+		if result is not None:
+			if not result:
+				print('Error while generating Apama Doc from %s. Please check %s file for more details' %
+					(inputDir, os.path.abspath(apamaDocErrLog)))
+				raise CalledProcessError(1, 'apamadoc worker')
+			return os.path.join(apamaDocOutput, 'structure.xml')
+
 		cmd = [
 			os.path.join(self.javaHome, 'bin', 'java'),
 			'-DAPAMA_HOME=' + self.apamaHome,
@@ -825,7 +1021,7 @@ class ScriptRunner:
 			'-jar',
 			os.path.join(self.apamaHome, 'lib', 'ap-generate-apamadoc.jar'),
 			apamaDocOutput,
-			self.inputDir,
+			inputDir,
 		]
 
 		with open(apamaDocErrLog, 'w+') as errFile:
@@ -834,45 +1030,135 @@ class ScriptRunner:
 					subprocess.check_call(cmd, stderr=errFile, stdout=outFile)
 				except CalledProcessError as err:
 					print('Error while generating Apama Doc from %s. Please check %s file for more details' %
-						(self.inputDir, os.path.abspath(apamaDocErrLog)))
+						(inputDir, os.path.abspath(apamaDocErrLog)))
 					raise err
 		return os.path.join(apamaDocOutput, 'structure.xml')
 
 	
 	#validate Catalog path and calls _generateApamaDocs to generate Apamadocs and then Metadata json
 	def generateBlockMetaData(self):
-		if not list(glob.glob(self.inputDir + '/**/*.mon', recursive=True)): return
-		structureXml = self._generateApamaDocs()
+		with profiler.phase('find mon files'):
+			if not self._monFiles(): return
+		if self.native:
+			(msgs, blocks)=self._writeJSONoutput(self._generateNativeBlockList())
+			return (self.outputFile, msgs)
+		with profiler.phase('apamadoc'):
+			if self.cacheDir:
+				cache = apamadocCache.ApamaDocCache(self.cacheDir, self.scriptVersion)
+				structureXml = str(cache.generate(self.inputDir, self.tmpDir, self._generateApamaDocs, self.manifest))
+			elif self.manifest.filtered:
+				# apamadoc reads the whole directory, so give it only the included mon files
+				stagingDir = self.manifest.stage(self.manifest.mons, os.path.join(self.tmpDir, 'apamadoc_input'))
+				structureXml = self._generateApamaDocs(str(stagingDir))
+			else:
+				structureXml = self._generateApamaDocs()
 		if os.path.isfile(structureXml):
 			(msgs, blocks)=self._generateJSONoutput(structureXml)
 		else:
 			raise Exception('Cannot generate block metadata because %s file was not generated', structureXml)
 		return (self.outputFile, msgs)
 
+	def checkNativeMetaData(self):
+		"""
+		Compare the metadata written by generateBlockMetaData with the metadata from the native extractor.
+		:return: List of differences, empty if the native extractor produced identical metadata.
+		"""
+		with open(self.outputFile, encoding=self.ENCODING) as f:
+			expected = json.load(f).get('analytics', [])
+		actual = json.loads(json.dumps(self._generateNativeBlockList()))
+		return diff_block_lists(expected, actual)
+
+def _diffValues(path, expected, actual, differences):
+	if isinstance(expected, dict) and isinstance(actual, dict):
+		for key in list(expected) + [k for k in actual if k not in expected]:
+			_diffValues(f'{path}.{key}', expected.get(key), actual.get(key), differences)
+	elif isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+		for i, (e, a) in enumerate(zip(expected, actual)):
+			_diffValues(f'{path}[{i}]', e, a, differences)
+	elif expected != actual:
+		differences.append(f'{path}: apamadoc={json.dumps(expected)} native={json.dumps(actual)}')
+
+def diff_block_lists(expected, actual):
+	"""
+	Compare two lists of block metadata, matching blocks by id.
+	:param expected: The blocks extracted from apamadoc.
+	:param actual: The blocks extracted by the native extractor.
+	:return: List of differences, each naming the block and the path of the field.
+	"""
+	expectedById = {b.get('id'): b for b in expected}
+	actualById = {b.get('id'): b for b in actual}
+	differences = []
+	for blockId in list(expectedById) + [i for i in actualById if i not in expectedById]:
+		if blockId not in actualById:
+			differences.append(f'{blockId}: missing from native metadata')
+		elif blockId not in expectedById:
+			differences.append(f'{blockId}: missing from apamadoc metadata')
+		else:
+			_diffValues(blockId, expectedById[blockId], actualById[blockId], differences)
+	return differences
+
 class STDOUTFilter(logging.Filter):
 	def filter(self, record):
 		return record.levelno == logging.INFO
 
 def add_arguments(parser):
-	parser.add_argument('--input', metavar='DIR', type=str, required=True, help='the input directory containing blocks')
-	parser.add_argument('--output', metavar='JSON_FILE', type=str, required=True, help='the output JSON file containing the metadata for blocks')
-
-def run_metadata_generator(input, output, tmpDir, printMsg=False):
+	parser.add_argument('--input', metavar='DIR', type=str, action='append', required=False, help='the input directory containing blocks (repeat with --output to build several catalogs)')
+	parser.add_argument('--output', metavar='JSON_FILE', type=str, action='append', required=False, help='the output JSON file containing the metadata for blocks, one for each --input')
+	parser.add_argument('--manifest', metavar='JSON_FILE', type=str, required=False, help='a JSON file listing catalogs to build, as a list of objects with "input" and "output" keys')
+	parser.add_argument('--jobs', metavar='N', type=int, required=False, help='the number of catalogs to build concurrently when building several catalogs (defaults to the number of CPUs)')
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help=f'the directory to cache apamadoc output in between builds (defaults to the {apamadocCache.CACHE_DIR_ENV} environment variable)')
+	parser.add_argument('--native', action='store_true', default=False, required=False, help='extract the metadata by parsing the mon files directly, without running apamadoc in a JVM')
+	parser.add_argument('--compact', action='store_true', default=False, required=False, help='write the metadata without indentation or whitespace, for machine consumption')
+	parser.add_argument('--checkNative', action='store_true', default=False, required=False, help='generate the metadata with apamadoc and report any differences from the native extractor')
+	add_pattern_arguments(parser)
+
+def add_pattern_arguments(parser):
+	parser.add_argument('--include', metavar='PATTERN', type=str, action='append', required=False, help='only include the input files whose path relative to the input directory matches this glob pattern, such as "blocks/*" (may be repeated)')
+	parser.add_argument('--exclude', metavar='PATTERN', type=str, action='append', required=False, help='exclude the input files and directories whose path relative to the input directory matches this glob pattern, such as "tests" or "*_test.mon" (may be repeated)')
+
+def _script_runner(input, output, tmpDir, cacheDir, native, checkNative, compact, manifest, include, exclude):
+	"""Return the ScriptRunner for the input directory, walking it if no manifest is provided."""
 	apama_home = os.getenv('APAMA_HOME', None)
-	# assumes we're running with apama_env sourced
-	java_home = os.environ['APAMA_JRE']
-	java_home = os.path.join(java_home, '..')
-
-	inputDir = os.path.abspath(os.path.normpath(input))
-	if not os.path.isdir(inputDir): raise Exception('The input directory does not exist: %s' % inputDir)
-
-	output = os.path.normpath(output)
-	if not output.endswith('.json'):
-		output += '.json'
-
-	scriptRunner = ScriptRunner(apama_home, java_home, output,
-	                            inputDir, tmpDir, version)
+	java_home = None
+	if checkNative or not native:
+		# assumes we're running with apama_env sourced
+		java_home = os.environ['APAMA_JRE']
+		java_home = os.path.join(java_home, '..')
+
+	inputDir = None
+	if input is not None:
+		inputDir = os.path.abspath(os.path.normpath(input))
+		if not os.path.isdir(inputDir): raise Exception('The input directory does not exist: %s' % inputDir)
+	if manifest is None:
+		with profiler.phase('find files'):
+			manifest = inputManifest.InputManifest.scan(inputDir, include, exclude)
+
+	if output:
+		output = os.path.normpath(output)
+		if not output.endswith('.json'):
+			output += '.json'
+
+	return ScriptRunner(apama_home, java_home, output,
+	                    inputDir, tmpDir, version, apamadocCache.default_cache_dir(cacheDir), native and not checkNative, compact, manifest)
+
+def run_metadata_generator(input, output, tmpDir, printMsg=False, cacheDir=None, native=False, checkNative=False, compact=False, manifest=None, include=None, exclude=None):
+	"""
+	Generate the block metadata of the mon files in a directory.
+	:param manifest: The InputManifest of the input directory, from a walk of the directory by the caller.
+	:param include: Patterns of the input files to include, if no manifest is provided.
+	:param exclude: Patterns of the input files and directories to exclude, if no manifest is provided.
+	:return: Tuple of the output file and the messages of the blocks, or None if there are no mon files.
+	"""
+	scriptRunner = _script_runner(input, output, tmpDir, cacheDir, native, checkNative, compact, manifest, include, exclude)
 	f = scriptRunner.generateBlockMetaData()
+	if checkNative and f:
+		differences = scriptRunner.checkNativeMetaData()
+		for d in differences:
+			print(d)
+		if differences:
+			raise Exception(f'Native metadata extraction differs from apamadoc in {len(differences)} field(s)')
+		if printMsg:
+			print('Native metadata extraction matches apamadoc')
 	if printMsg:
 		if f[0]:
 			print(f'Created {f[0]}')
@@ -880,9 +1166,102 @@ def run_metadata_generator(input, output, tmpDir, printMsg=False):
 			print('No blocks found')
 	return f
 
+def generate_metadata(input, tmpDir, cacheDir=None, native=False, manifest=None, output=None):
+	"""
+	Generate the block metadata of the mon files in a directory, without writing it to a file unless requested.
+	:param manifest: The InputManifest of the input directory, from a walk of the directory by the caller.
+	:param output: The JSON file to also write the metadata to, if any.
+	:return: Tuple of the metadata, as a dictionary with the version and the list of blocks, and the messages of the blocks, or None if there are no mon files.
+	"""
+	scriptRunner = _script_runner(input, output, tmpDir, cacheDir, native, False, False, manifest, None, None)
+	f = scriptRunner.generateBlockMetaData()
+	if not f: return None
+	return (scriptRunner.metadata, f[1])
+
+
+def read_manifest(manifest):
+	"""
+	Read a manifest of catalogs to build.
+	:param manifest: JSON file containing a list of objects with "input" and "output" keys. Relative paths are relative to the directory of the manifest.
+	:return: List of (input, output) pairs.
+	"""
+	baseDir = os.path.dirname(os.path.abspath(manifest))
+	with open(manifest, encoding='utf8') as f:
+		entries = json.load(f)
+	if not isinstance(entries, list): raise Exception('The manifest must contain a list of catalogs: %s' % manifest)
+	catalogs = []
+	for entry in entries:
+		if not isinstance(entry, dict) or 'input' not in entry or 'output' not in entry:
+			raise Exception('Each catalog in the manifest must have "input" and "output" keys: %s' % json.dumps(entry))
+		catalogs.append((os.path.join(baseDir, entry['input']), os.path.join(baseDir, entry['output'])))
+	return catalogs
+
+def _run_catalog(name, input, output, tmpDir, cacheDir, native, checkNative, compact, include, exclude, profile):
+	"""
+	Build the metadata for one catalog of a batch.
+	:param name: The name of the catalog in the profile.
+	:param profile: Profile the build, to merge its phases into the profile of the batch.
+	:return: Tuple of the output file, the error if any, and the profile report if profiled.
+	"""
+	with profiler.profile(name, collect=profile) as p:
+		try:
+			f = run_metadata_generator(input, output, tmpDir, cacheDir=cacheDir, native=native, checkNative=checkNative, compact=compact, include=include, exclude=exclude)
+			result = (f[0] if f else None, None)
+		except Exception as e:
+			result = (None, str(e) or type(e).__name__)
+	return result + (p.report() if p else None,)
+
+def run_batch(catalogs, tmpDir, printMsg=False, cacheDir=None, native=False, checkNative=False, compact=False, jobs=None, include=None, exclude=None):
+	"""
+	Build the metadata for several catalogs concurrently, in a pool of processes. If a profile is active, the phases
+	of each catalog are added to it as 'catalog <n>', numbered from 0 in the order of catalogs.
+	:param catalogs: List of (input directory, output JSON file) pairs.
+	:param tmpDir: The temporary directory. Each catalog uses a separate directory inside it.
+	:param printMsg: Print the result of each catalog.
+	:param jobs: The number of catalogs to build concurrently, defaults to the number of CPUs.
+	:return: List of (input directory, output file or None if no blocks were found, error or None) for each catalog.
+	"""
+	with ProcessPoolExecutor(max_workers=jobs) as pool:
+		futures = [pool.submit(_run_catalog, 'catalog %d' % i, input, output, os.path.join(tmpDir, 'catalog_%d' % i), cacheDir, native, checkNative, compact, include, exclude, profiler.active())
+		           for i, (input, output) in enumerate(catalogs)]
+		results = []
+		for (input, _), future in zip(catalogs, futures):
+			(outputFile, error, report) = future.result()
+			profiler.merge(report)
+			results.append((input, outputFile, error))
+
+	failures = [r for r in results if r[2] is not None]
+	if printMsg:
+		for (input, outputFile, error) in results:
+			if error is not None:
+				print(f'FAILED  {input}: {error}')
+			elif outputFile:
+				print(f'OK      {input}: created {outputFile}')
+			else:
+				print(f'OK      {input}: no blocks found')
+		print(f'Built metadata for {len(results) - len(failures)} of {len(results)} catalogs')
+	if failures:
+		raise Exception(f'Failed to build metadata for {len(failures)} of {len(results)} catalogs')
+	return results
 
 def run(args):
-	return run_metadata_generator(args.input, args.output, args.tmpDir, printMsg=True)
+	inputs = args.input or []
+	outputs = args.output or []
+	if len(inputs) != len(outputs):
+		raise Exception('Each --input argument must have a matching --output argument')
+	catalogs = list(zip(inputs, outputs))
+	if args.manifest:
+		catalogs = read_manifest(args.manifest) + catalogs
+	if not catalogs:
+		raise Exception('Either the --input and --output arguments, or the --manifest argument, must be specified')
+
+	if len(catalogs) == 1 and not args.manifest:
+		return run_metadata_generator(args.input[0], args.output[0], args.tmpDir, printMsg=True, cacheDir=args.cacheDir,
+		                              native=args.native, checkNative=args.checkNative, compact=args.compact,
+		                              include=args.include, exclude=args.exclude)
+	return run_batch(catalogs, args.tmpDir, printMsg=True, cacheDir=args.cacheDir,
+	                 native=args.native, checkNative=args.checkNative, compact=args.compact, jobs=args.jobs,
+	                 include=args.include, exclude=args.exclude)
 
 ## Main method
 if __name__ == '__main__':
@@ -2,14 +2,21 @@
 
 # $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
 # Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
-import shutil, json, os, subprocess, urllib
-import blockMetadataGenerator
+import shutil, json, os, subprocess, threading, urllib, hashlib, zipfile, io, tempfile, contextlib
+import apamadocCache, blockMetadataGenerator, eplDocParser, fileWatcher, inputManifest, profiler
 from pathlib import Path
 import ssl, urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
 ENCODING = 'UTF8'
 BLOCK_METADATA_EVENT = 'apama.analyticsbuilder.BlockMetadata'
 BLOCK_MESSAGES_EVENT = 'apama.analyticsbuilder.BlockMessages'
+STAGING_MANIFEST = 'staging-manifest.json'
+EXTENSION_MANIFEST = 'extension-manifest.json'  # Manifest of the digests of the files in the extension zip.
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)  # Timestamp of every file in the extension zip, so that identical inputs give identical zips.
+CDP_CACHE_DIR = 'cdp'  # Directory of the cache directory containing CDP files, keyed by the hashes of their mon files.
+SHARD_SEPARATOR = '#'  # Separates the extension name from the shard number in the name of sharded events.
+DEFAULT_LANGUAGE = inputManifest.DEFAULT_LANGUAGE  # The language of the block metadata.
 PAS_EXT_TYPE = 'pas_extension'  # Type of the ManagedObject containing information about extension zip.
 PAS_EXT_ID_FIELD = 'pas_extension_binary_id' # The field of the ManagedObject with id of the extension zip binary object.
 
@@ -17,10 +24,23 @@ def add_arguments(parser):
 	""" Add parser arguments. """
 	parser.add_argument('--input', metavar='DIR', type=str, required=False, help='the input directory containing extension files - required when not deleting an extension')
 	parser.add_argument('--cdp', action='store_true', default=False, required=False, help='package all EPL files into a single CDP file')
+	parser.add_argument('--cdpPerPackage', action='store_true', default=False, required=False, help='with --cdp, package the EPL files of each EPL package into a separate CDP file')
+	parser.add_argument('--listCdpInputs', action='store_true', default=False, required=False, help='with --cdp, list the input EPL files that each CDP file was packaged from')
 	parser.add_argument('--priority', metavar='N', type=int, required=False, help='the priority of the extension')
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help='the directory to cache build output in between builds (defaults to the ANALYTICS_BUILDER_CACHE_DIR environment variable)')
+	parser.add_argument('--maxEventSize', metavar='BYTES', type=int, required=False, help='split the block metadata and messages into several events, each with at most this many bytes of JSON (unless a single block or message is larger)')
+	parser.add_argument('--incremental', action='store_true', default=False, required=False, help='keep the staging directory in --tmpDir between builds, and only update the files, metadata and messages whose inputs have changed (requires --tmpDir)')
+	parser.add_argument('--native', action='store_true', default=False, required=False, help='extract the block metadata by parsing the mon files directly, without running apamadoc in a JVM')
+	parser.add_argument('--stripDocs', action='store_true', default=False, required=False, help='package the mon files without their comments, including the doc comments the block metadata is generated from, and redundant whitespace, so they are quicker to inject (the stripped files are checked with engine_package)')
+	parser.add_argument('--watch', action='store_true', default=False, required=False, help='keep watching the input directory, and incrementally rebuild the extension (and upload it, if it has changed) whenever the files change')
+	parser.add_argument('--debounce', metavar='SECONDS', type=float, default=fileWatcher.DEFAULT_DEBOUNCE, required=False, help=f'with --watch, the number of seconds without further changes to wait for before rebuilding (defaults to {fileWatcher.DEFAULT_DEBOUNCE})')
+	parser.add_argument('--poll', action='store_true', default=False, required=False, help='with --watch, poll the input directory for changes instead of using inotify, such as for network file systems')
+	blockMetadataGenerator.add_pattern_arguments(parser)
+	parser.add_argument('--compression', metavar='LEVEL', type=int, choices=range(0, 10), required=False, help='the compression level of the extension zip, from 0 (store the files without compressing them, which is fastest for local testing) to 9 (defaults to 6)')
 
 	local = parser.add_argument_group('local save (requires at least the following arguments: --input, and --output)')
 	local.add_argument('--output', metavar='ZIP_FILE', type=str, required=False, help='the output zip file (requires the --input argument)')
+	parser.add_argument('--metadataOutput', metavar='JSON_FILE', type=str, required=False, help='also write the block metadata to this JSON file, such as for debugging (by default it is only kept in memory)')
 
 	remote = parser.add_argument_group('remote upload or delete (requires at least the following arguments: --cumulocity_url, --username, --password, and --name)')
 	remote.add_argument('--cumulocity_url', metavar='URL', help='the base Cumulocity URL')
@@ -43,40 +63,168 @@ def write_evt_file(ext_files_dir, name, event):
 	with open(events_dir / name, mode='w+', encoding='UTF8') as f:
 		return f.writelines([event])
 
+def embeddable_json(value, sort_keys=False):
+	"""Return the compact JSON of a value as a string literal which could be included in an event string."""
+	return json.dumps(json.dumps(value, sort_keys=sort_keys, separators=(',', ':')))
+
 def embeddable_json_str(json_str):
 	"""Return JSON string which could be included in a string literal of an event string."""
-	s = json.dumps(json.loads(json_str, encoding=ENCODING), separators=(',', ':'))
-	return json.dumps(s)
+	return embeddable_json(json.loads(json_str))
+
+def shard_name(name, index, count):
+	"""Return the name for a shard of an event, which is unchanged if there is only one shard."""
+	return name if count == 1 else f'{name}{SHARD_SEPARATOR}{index + 1}'
+
+def split_into_shards(items, max_size, size_of):
+	"""
+	Split items into consecutive shards whose total size is at most max_size.
+	:param items: The items to split.
+	:param max_size: The maximum size of a shard, or None to not split the items. An item larger than this is in a shard on its own.
+	:param size_of: Function returning the size of an item.
+	:return: List of lists of items.
+	"""
+	shards = [[]]
+	size = 0
+	for item in items:
+		item_size = size_of(item) if max_size else 0
+		if max_size and shards[-1] and size + item_size > max_size:
+			shards.append([])
+			size = 0
+		shards[-1].append(item)
+		size += item_size
+	return shards
+
+def metadata_events(name, metadata, max_event_size=None):
+	"""
+	Return the BlockMetadata event strings for the block metadata, with the keys sorted as in the generated JSON file.
+	:param name: Extension name.
+	:param metadata: The block metadata, either as generated by blockMetadataGenerator.generate_metadata or as a JSON string.
+	:param max_event_size: Split the blocks into events with at most this many bytes of JSON.
+	:return: List of event strings.
+	"""
+	if isinstance(metadata, str):
+		metadata = json.loads(metadata)
+	shards = split_into_shards(metadata.get('analytics', []), max_event_size, lambda block: len(json.dumps(block, separators=(',', ':'))) + 1)
+	events = []
+	for i, blocks in enumerate(shards):
+		shard = dict(metadata)
+		shard['analytics'] = blocks
+		events.append(f'{BLOCK_METADATA_EVENT}("{shard_name(name, i, len(shards))}", "EN", {embeddable_json(shard, sort_keys=True)})')
+	return events
+
+def messages_events(name, messages, max_event_size=None, language=DEFAULT_LANGUAGE):
+	"""
+	Return the BlockMessages event strings for the messages.
+	:param name: Extension name.
+	:param messages: Dictionary of message identifier to message.
+	:param max_event_size: Split the messages into events with at most this many bytes of JSON.
+	:param language: The language of the messages.
+	:return: List of event strings.
+	"""
+	shards = split_into_shards(messages.items(), max_event_size, lambda item: len(json.dumps(dict([item]), separators=(',', ':'))))
+	return [f'{BLOCK_MESSAGES_EVENT}("{shard_name(name, i, len(shards))}", {json.dumps(language)}, {embeddable_json(dict(items))})'
+	        for i, items in enumerate(shards)]
+
+def messages_evt_name(name, language=DEFAULT_LANGUAGE):
+	"""Return the name of the evt file for the messages of a language, which is <name>_messages.evt for the default language."""
+	return f'{name}_messages.evt' if language == DEFAULT_LANGUAGE else f'{name}_messages_{language}.evt'
+
+def _read_message_file(f):
+	"""Read a messages file, returning a pair of the dictionary of messages, or None if it is not valid, and the reason it is not valid."""
+	try:
+		data = json.loads(f.read_text(encoding=ENCODING))
+	except:
+		return (None, f'Skipping invalid JSON file: {str(f)}')
+	if not isinstance(data, dict):
+		return (None, f'Skipping JSON file with invalid messages format: {str(f)}')
+	return (data, None)
+
+def read_message_files(input, manifest=None):
+	"""
+	Read the messages files of all languages concurrently, skipping any that are not valid.
+	:param input: The input directory containing the messages files.
+	:param manifest: The InputManifest of the input directory, which is walked if not provided.
+	:return: List of pairs of file and dictionary of messages.
+	"""
+	msg_files = (manifest or inputManifest.InputManifest.scan(input)).messages
+	with ThreadPoolExecutor(max_workers=max(1, min(8, len(msg_files)))) as pool:
+		contents = list(pool.map(_read_message_file, msg_files))
+	result = []
+	for f, (data, error) in zip(msg_files, contents):
+		if error:
+			print(error)
+		else:
+			result.append((f, data))
+	return result
 
-def gen_messages_evt_file(name, input, ext_files_dir, messages_from_metadata):
+def collate_messages(input, messages_from_metadata, manifest=None, message_files=None):
+	"""
+	Collate the messages from the block metadata with the messages of the messages.json and *-messages.json files.
+	:param input: The input directory containing the messages files.
+	:param messages_from_metadata: The messages extracted from the block metadata.
+	:param manifest: The InputManifest of the input directory, which is walked if not provided.
+	:param message_files: The messages files returned by read_message_files, which are read if not provided.
+	:return: Dictionary of all the messages.
+	"""
+	all_msgs = messages_from_metadata.copy()
+	msg_to_files = {}
+	if message_files is None:
+		message_files = read_message_files(input, manifest)
+	for (f, data) in message_files:
+		for (k, v) in data.items():
+			if k in all_msgs:
+				print(f'Message {k} defined multiple times in "{msg_to_files.get(k, "the block metadata")}" and "{f}".')
+			else:
+				all_msgs[k] = v
+				msg_to_files[k] = f
+	return all_msgs
+
+def _some(keys, count=5):
+	"""Return the first few of some message identifiers, for a report."""
+	keys = sorted(keys)
+	return ', '.join(keys[:count]) + (', ...' if len(keys) > count else '')
+
+def collate_languages(input, messages_from_metadata, manifest=None, message_files=None):
+	"""
+	Collate the messages of each language, which for the default language include the messages from the block metadata.
+	The messages which another language is missing, or which are not in the default language, are reported.
+	:param input: The input directory containing the messages files.
+	:param messages_from_metadata: The messages extracted from the block metadata.
+	:param manifest: The InputManifest of the input directory, which is walked if not provided.
+	:param message_files: The messages files returned by read_message_files, which are read if not provided.
+	:return: Dictionary of language to the dictionary of its messages, with the default language first.
+	"""
+	if message_files is None:
+		message_files = read_message_files(input, manifest)
+	by_language = {}
+	for (f, data) in message_files:
+		by_language.setdefault(inputManifest.messages_language(f.path.name), []).append((f, data))
+	default = collate_messages(input, messages_from_metadata, manifest, by_language.pop(DEFAULT_LANGUAGE, []))
+	languages = {DEFAULT_LANGUAGE: default}
+	for language in sorted(by_language):
+		messages = collate_messages(input, {}, manifest, by_language[language])
+		missing = default.keys() - messages.keys()
+		if missing:
+			print(f'Language {language} is missing {len(missing)} of the {len(default)} {DEFAULT_LANGUAGE} messages: {_some(missing)}')
+		unknown = messages.keys() - default.keys()
+		if unknown:
+			print(f'Language {language} has {len(unknown)} messages which are not {DEFAULT_LANGUAGE} messages: {_some(unknown)}')
+		languages[language] = messages
+	return languages
+
+def gen_messages_evt_file(name, input, ext_files_dir, messages_from_metadata, max_event_size=None, manifest=None):
 	"""
-	Generate evt file containing event string for sending message JSON.
+	Generate the evt file containing the event strings for sending the message JSON of each language.
 	:param name: Extension name.
 	:param input: The input directory containing messages JSON files.
 	:param ext_files_dir: The 'files' directory of the extension.
 	:param messages_from_metadata: Extra messages to include extracted from blocks' metadata.
+	:param max_event_size: Split the messages into events with at most this many bytes of JSON.
+	:param manifest: The InputManifest of the input directory, which is walked if not provided.
 	:return: None
 	"""
-	all_msgs = messages_from_metadata.copy()
-	msg_to_files = {}
-	msg_files = list(input.rglob('messages.json')) + list(input.rglob('*-messages.json'))
-	for f in msg_files:
-		try:
-			data = json.loads(f.read_text(encoding=ENCODING), encoding=ENCODING)
-			if not isinstance(data, dict):
-				print(f'Skipping JSON file with invalid messages format: {str(f)}')
-				continue
-			for (k, v) in data.items():
-				if k in all_msgs:
-					print(f'Message {k} defined multiple times in "{msg_to_files[k]}" and "{f}".')
-				else:
-					all_msgs[k] = v
-					msg_to_files[k] = f
-		except:
-			print(f'Skipping invalid JSON file: {str(f)}')
-
-	write_evt_file(ext_files_dir, f'{name}_messages.evt',
-	               f'{BLOCK_MESSAGES_EVENT}("{name}", "EN", {embeddable_json_str(json.dumps(all_msgs))})')
+	for language, messages in collate_languages(input, messages_from_metadata, manifest).items():
+		write_evt_file(ext_files_dir, messages_evt_name(name, language), '\n'.join(messages_events(name, messages, max_event_size, language)))
 
 
 def createCDP(name, mons, ext_files_dir):
@@ -95,7 +243,112 @@ def createCDP(name, mons, ext_files_dir):
 
 	subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE).check_returncode()
 
-def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=False):
+def strip_mon_files(mons, strip_dir):
+	"""
+	Strip the comments and redundant whitespace from mon files, for packaging once the block metadata has been generated from them.
+	:param mons: The InputFiles of the mon files.
+	:param strip_dir: The directory to write the stripped mon files to, keeping their paths relative to the input directory.
+	:return: The InputFiles of the stripped mon files.
+	"""
+	stripped = inputManifest.InputManifest.from_files({f.rel: eplDocParser.strip_docs(f.read_text(encoding='utf-8-sig')) for f in mons})
+	stripped.stage(stripped.files, strip_dir)
+	return inputManifest.InputManifest.scan(strip_dir).mons
+
+def check_stripped_mon_files(mons, check_dir):
+	"""Check that stripped mon files still compile, by packaging them with engine_package into a CDP file which is not used."""
+	Path(check_dir).mkdir(parents=True, exist_ok=True)
+	try:
+		createCDP('stripped', [f.path for f in mons], check_dir)
+	except subprocess.CalledProcessError as err:
+		raise Exception(f'The stripped mon files do not compile, so build the extension without stripping them: {(err.stderr or b"").decode(errors="replace").strip()}')
+
+def print_stripped(mons, stripped_mons):
+	"""Print the bytes saved by stripping the mon files."""
+	size = sum(f.size for f in mons)
+	saved = size - sum(f.size for f in stripped_mons)
+	print(f'Stripped {len(mons)} mon files from {size} to {size - saved} bytes, saving {saved} bytes ({100 * saved / max(size, 1):.0f}%)')
+
+def cdp_contents(name, mons, per_package=False):
+	"""
+	Decide which mon files are packaged into which CDP files.
+	:param name: The name of the extension.
+	:param mons: The InputFiles of the mon files.
+	:param per_package: Package the mon files of each EPL package into a separate CDP file, named <name>_<package>.cdp.
+	  Mon files in the default package are packaged into <name>.cdp.
+	:return: Dictionary of CDP file name to the InputFiles of the mon files it contains.
+	"""
+	if not per_package:
+		return {f'{name}.cdp': list(mons)}
+	contents = {}
+	for f in mons:
+		package = apamadocCache.declared_types(f.path)[0]
+		contents.setdefault(f'{name}_{package}.cdp' if package else f'{name}.cdp', []).append(f)
+	return contents
+
+def _cdp_key(mons):
+	"""Return the key of a CDP file in the cache, from the Apama installation and the paths and hashes of its mon files."""
+	h = hashlib.sha256(f'{os.path.realpath(os.getenv("APAMA_HOME", ""))}\0{blockMetadataGenerator.version}\n'.encode(ENCODING))
+	for f in mons:
+		h.update(f'{f.rel}\0{f.sha256}\n'.encode(ENCODING))
+	return h.hexdigest()
+
+def _package_cdp(cdp_name, mons, cdp_dir, cacheDir):
+	"""Package one CDP file, copying it from the cache if it has already been packaged from the same mon files. Return whether it was cached."""
+	if not cacheDir:
+		createCDP(cdp_name[:-len('.cdp')], [f.path for f in mons], cdp_dir)
+		return False
+	cache_dir = Path(cacheDir).resolve() / CDP_CACHE_DIR
+	key = _cdp_key(mons)
+	cached = cache_dir / f'{key}.cdp'
+	hit = cached.exists()
+	if not hit:
+		cache_dir.mkdir(parents=True, exist_ok=True)
+		tmp_name = f'{key}.{os.getpid()}.{threading.get_ident()}'
+		createCDP(tmp_name, [f.path for f in mons], cache_dir)
+		os.replace(cache_dir / f'{tmp_name}.cdp', cached)	# atomic, so concurrent builds never see a partial CDP file
+	shutil.copyfile(cached, Path(cdp_dir, cdp_name))
+	return hit
+
+def package_cdps(name, mons, cdp_dir, cacheDir=None, per_package=False):
+	"""
+	Package mon files into CDP files, concurrently if there are several. When there is a cache directory,
+	engine_package is only run for CDP files whose mon files have changed.
+	:param name: The name of the extension.
+	:param mons: The InputFiles of the mon files.
+	:param cdp_dir: The directory to write the CDP files to.
+	:param cacheDir: The cache directory, defaults to the ANALYTICS_BUILDER_CACHE_DIR environment variable.
+	:param per_package: Package the mon files of each EPL package into a separate CDP file.
+	:return: Dictionary of CDP file name to a tuple of the InputFiles it contains and whether it was cached.
+	"""
+	cacheDir = apamadocCache.default_cache_dir(cacheDir)
+	contents = cdp_contents(name, mons, per_package)
+	Path(cdp_dir).mkdir(parents=True, exist_ok=True)
+	cached = run_stages({cdp_name: (lambda cdp_name=cdp_name, files=files: _package_cdp(cdp_name, files, cdp_dir, cacheDir))
+	                     for cdp_name, files in contents.items()})
+	return {cdp_name: (files, cached[cdp_name]) for cdp_name, files in contents.items()}
+
+def print_cdp_inputs(cdps):
+	"""Print the input mon files that each CDP file was packaged from, as returned by package_cdps, rather than reading the CDP files."""
+	for cdp_name, (files, cached) in sorted(cdps.items()):
+		print(f'{cdp_name}{" (cached)" if cached else ""} packaged from:')
+		for f in files:
+			print(f'  {f.rel}')
+
+def _file_state(f, previous):
+	"""Return the size, modification time and hash of a source file, reusing the previous hash if the size and modification time are unchanged."""
+	if previous and previous.get('size') == f.size and previous.get('mtime_ns') == f.mtime_ns:
+		return previous
+	return {'size': f.size, 'mtime_ns': f.mtime_ns, 'sha256': f.sha256}
+
+def _content_digest(states, paths):
+	"""Return a digest of the paths and content hashes of a set of source files."""
+	h = hashlib.sha256()
+	for rel in sorted(paths):
+		h.update(f'{rel}\0{states[rel]["sha256"]}\n'.encode(ENCODING))
+	return h.hexdigest()
+
+def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=False, cacheDir=None, native=False, max_event_size=None, incremental=False, compression=None, include=None, exclude=None,
+                    cdp_per_package=False, list_cdp_inputs=False, metadata_output=None, strip_docs=False, manifest=None):
 	"""
 	Build an extension from specified input directory.
 	:param input: The input directory containing artifacts for the extension.
@@ -104,11 +357,27 @@ def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=Fa
 	:param cdp: Package all monitors into a CDP file.
 	:param priority: The priority of the package.
 	:param printMsg: Print success message with location of the extension zip.
-	:return:
+	:param cacheDir: The directory to cache build output in between builds.
+	:param native: Extract the block metadata without running apamadoc.
+	:param max_event_size: Split the block metadata and messages into events with at most this many bytes of JSON.
+	:param incremental: Reuse the staging directory of a previous build in tmpDir, only updating the files,
+	  metadata and messages whose inputs have changed. Otherwise the files are written straight into the zip file.
+	:param compression: The compression level of the zip file, 0 to store the files without compressing them, or 1 to 9 (defaults to 6).
+	:param include: Patterns of the input files to include, relative to the input directory, defaults to all files.
+	:param exclude: Patterns of the input files and directories to exclude, relative to the input directory.
+	:param cdp_per_package: With cdp, package the monitors of each EPL package into a separate CDP file.
+	:param list_cdp_inputs: With cdp, print the input mon files that each CDP file was packaged from.
+	:param metadata_output: Also write the block metadata to this JSON file. Otherwise the metadata is only kept in memory.
+	:param strip_docs: Package the mon files without their comments and redundant whitespace, checking that they still compile.
+	:param manifest: The InputManifest of the input directory, from a walk of the directory by the caller, which already
+	  applied any include and exclude patterns. Otherwise the input directory is walked.
+	:return: The path of the extension zip file.
 	"""
 	input = Path(input).resolve()
 	output = Path(output).resolve()
 	tmpDir = Path(tmpDir).resolve()
+	if metadata_output:
+		metadata_output = Path(metadata_output).resolve()
 
 	if not input.exists():
 		raise Exception(f'Input directory does not exist: {input.absolute()}')
@@ -116,47 +385,366 @@ def build_extension(input, output, tmpDir, cdp=False, priority=None, printMsg=Fa
 	name = output.name  # catalog name
 	if name.endswith('.zip'):
 		name = name[:-4]
-		output = output.with_name(name)
+	zip_file = output.with_name(name + '.zip')
+
+	# Walk the input directory once, for all the steps of the build
+	if manifest is None:
+		with profiler.phase('find files'):
+			manifest = inputManifest.InputManifest.scan(input, include, exclude)
+
+	stripped_mons = None
+	if strip_docs:
+		with profiler.phase('strip docs'):
+			stripped_mons = strip_mon_files(manifest.mons, tmpDir / f'{name}_stripped')
+
+	if cdp and cdp_per_package:
+		cdp = 'package'
+	if incremental:
+		cdps = _build_staged_extension(manifest, zip_file, tmpDir, name, cdp, priority, cacheDir, native, max_event_size, compression, metadata_output, stripped_mons)
+	else:
+		(cdps, _, _, _) = _build_streamed_extension(manifest, zip_file, tmpDir, name, cdp, priority, cacheDir, native, max_event_size, compression, metadata_output, stripped_mons)
+	if list_cdp_inputs and cdp:
+		if cdps is None:  # unchanged since the last incremental build
+			cdps = {cdp_name: (files, True) for cdp_name, files in cdp_contents(name, stripped_mons or manifest.mons, cdp == 'package').items()}
+		print_cdp_inputs(cdps)
+	if printMsg:
+		if strip_docs:
+			print_stripped(manifest.mons, stripped_mons)
+		print(f'Created {zip_file}')
+	return zip_file
 
-	ext_dir = tmpDir / name             # '/' operator on Path object joins them
-	ext_files_dir = ext_dir / 'files'
-	ext_files_dir.mkdir(parents=True, exist_ok=True)
+class ExtensionBuild(object):
+	"""
+	The result of build_extension_bytes:
+	zip_bytes: The extension zip, or None if it was written to an output stream.
+	digest: The digest of the extension, as recorded in the extension manifest of the zip.
+	blocks: The list of the metadata of each block.
+	messages: Dictionary of language, such as 'EN', to the dictionary of message identifier to message, from the blocks and the messages files.
+	warnings: List of the warnings of the build, such as messages files which are not valid or blocks which could not be extracted.
+	timings: Dictionary of the name of each phase of the build, e.g. 'build extension/metadata', to its wall time in seconds.
+	"""
 
-	# Define priority of the extension if specified
-	if priority is not None:
-		ext_dir.joinpath('priority.txt').write_text(str(priority), encoding=ENCODING)
+	def __init__(self, zip_bytes, digest, blocks, messages, warnings, timings):
+		self.zip_bytes = zip_bytes
+		self.digest = digest
+		self.blocks = blocks
+		self.messages = messages
+		self.warnings = warnings
+		self.timings = timings
+
+# Builds in memory capture the warnings printed to stdout, which is shared by the threads of the process
+_in_memory_build_lock = threading.Lock()
+
+def build_extension_bytes(input, name, output=None, cdp=False, priority=None, cacheDir=None, native=False, max_event_size=None, compression=None, include=None, exclude=None,
+                          cdp_per_package=False, strip_docs=False):
+	"""
+	Build an extension in memory, without an output file, such as to build and upload extensions from a service.
+	A temporary directory is only used to run apamadoc (unless native) and engine_package (with cdp or strip_docs), and
+	in-memory input files are then written to it. Builds in the same process run one at a time, so use
+	several processes to build extensions concurrently.
+	:param input: The input directory, or a dictionary of path relative to the input, using '/' as the separator, to the content of the file as bytes or a string.
+	:param name: The name of the extension.
+	:param output: A seekable binary stream to write the zip to. Otherwise the zip is returned as bytes.
+	:param cdp: Package all monitors into a CDP file.
+	:param priority: The priority of the package.
+	:param cacheDir: The directory to cache build output in between builds.
+	:param native: Extract the block metadata without running apamadoc.
+	:param max_event_size: Split the block metadata and messages into events with at most this many bytes of JSON.
+	:param compression: The compression level of the zip, 0 to store the files without compressing them, or 1 to 9 (defaults to 6).
+	:param include: Patterns of the input files to include, relative to the input directory, defaults to all files.
+	:param exclude: Patterns of the input files and directories to exclude, relative to the input directory.
+	:param cdp_per_package: With cdp, package the monitors of each EPL package into a separate CDP file.
+	:param strip_docs: Package the mon files without their comments and redundant whitespace, checking that they still compile.
+	:return: The ExtensionBuild.
+	"""
+	printed = io.StringIO()
+	with _in_memory_build_lock, profiler.profile('build extension', collect=True) as build_profile:
+		with contextlib.redirect_stdout(printed):
+			with profiler.phase('find files'):
+				if isinstance(input, dict):
+					manifest = inputManifest.InputManifest.from_files(input, include, exclude)
+				else:
+					input = Path(input).resolve()
+					if not input.exists():
+						raise Exception(f'Input directory does not exist: {input}')
+					manifest = inputManifest.InputManifest.scan(input, include, exclude)
+
+			with (tempfile.TemporaryDirectory() if cdp or strip_docs or not native else contextlib.nullcontext()) as tmpDir:
+				tmpDir = tmpDir and Path(tmpDir)
+				if tmpDir and manifest.inputDir is None and (cdp or not native):
+					# apamadoc and engine_package read the files from disk
+					with profiler.phase('write input files'):
+						manifest = inputManifest.InputManifest.scan(manifest.stage(manifest.files, tmpDir / 'input'))
+				stripped_mons = None
+				if strip_docs:
+					with profiler.phase('strip docs'):
+						stripped_mons = strip_mon_files(manifest.mons, tmpDir / 'stripped')
+				stream = output or io.BytesIO()
+				(_, metadata, messages, digest) = _build_streamed_extension(manifest, stream, tmpDir, name, 'package' if cdp and cdp_per_package else cdp,
+				                                                            priority, cacheDir, native, max_event_size, compression, None, stripped_mons)
+	timings = {}
+	for p in build_profile.report()['phases']:
+		timings[p['name']] = timings.get(p['name'], 0) + p['wallSeconds']
+	return ExtensionBuild(None if output else stream.getvalue(), digest, metadata['analytics'] if metadata else [], messages,
+	                      [line for line in printed.getvalue().splitlines() if line], timings)
+
+def open_extension_zip(zip_file, compression=None):
+	"""
+	Open a zip file to write an extension to.
+	:param zip_file: The zip file.
+	:param compression: The compression level, 0 to store the files without compressing them, or 1 to 9 to deflate them (defaults to 6).
+	:return: The ZipFile.
+	"""
+	if compression == 0:
+		return zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_STORED)
+	return zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=compression)
+
+def _write_zip_entry(zf, arcname, data):
+	"""Write a file into a zip, with a fixed timestamp and permissions so that the zip does not depend on the file system."""
+	info = zipfile.ZipInfo(arcname, ZIP_TIMESTAMP)
+	info.create_system = 3  # Unix, whichever platform the zip is built on
+	info.external_attr = 0o100644 << 16  # regular file, rw-r--r--
+	zf.writestr(info, data, compress_type=zf.compression, compresslevel=zf.compresslevel)
+
+def extension_digest(digests):
+	"""Return the digest of an extension from the SHA-256 digests of its files, keyed by their paths in the zip."""
+	h = hashlib.sha256()
+	for arcname in sorted(digests):
+		h.update(f'{arcname}\0{digests[arcname]}\n'.encode(ENCODING))
+	return h.hexdigest()
+
+def write_extension_zip(zip_file, entries, compression=None):
+	"""
+	Write an extension zip, which is byte-identical for identical entries. The entries are written in
+	sorted order with fixed timestamps and permissions, followed by the extension manifest, which lists
+	the SHA-256 digest of each file and a digest of the whole extension.
+	:param zip_file: The zip file, or a seekable binary stream to write the zip to.
+	:param entries: Dictionary of path in the zip to either the Path of a file to copy into the zip, or the content as a string or bytes.
+	:param compression: The compression level, as for open_extension_zip.
+	:return: The digest of the extension.
+	"""
+	digests = {}
+	if isinstance(zip_file, Path):
+		zip_file.parent.mkdir(parents=True, exist_ok=True)
+	with open_extension_zip(zip_file, compression) as zf:
+		for arcname in sorted(entries):
+			content = entries[arcname]
+			if isinstance(content, str):
+				data = content.encode(ENCODING)
+			elif isinstance(content, bytes):
+				data = content
+			else:
+				data = Path(content).read_bytes()
+			_write_zip_entry(zf, arcname, data)
+			digests[arcname] = hashlib.sha256(data).hexdigest()
+		digest = extension_digest(digests)
+		manifest = json.dumps({'digest': digest, 'files': digests}, indent=1, sort_keys=True)
+		_write_zip_entry(zf, EXTENSION_MANIFEST, manifest.encode(ENCODING))
+	return digest
+
+def read_extension_digest(zip_file):
+	"""Return the digest of an extension from the manifest in its zip file, or None if it has no manifest."""
+	with zipfile.ZipFile(zip_file) as zf:
+		try:
+			return json.loads(zf.read(EXTENSION_MANIFEST).decode(ENCODING))['digest']
+		except (KeyError, ValueError):
+			return None
+
+def run_stages(stages):
+	"""
+	Run independent stages of a build concurrently, in a pool of threads. The stages mostly wait for
+	apamadoc, engine_package or the file system, so threads are enough to overlap them.
+	:param stages: Dictionary of stage name to a callable taking no arguments. Each stage is recorded as a profiler phase.
+	:return: Dictionary of stage name to the result of the stage.
+	:raises: The exception of the first stage that failed, once all the stages have finished.
+	"""
+	def phase(name, function):
+		with profiler.phase(name):
+			return function()
+
+	with ThreadPoolExecutor(max_workers=max(1, len(stages))) as pool:
+		futures = {name: pool.submit(profiler.bind(phase), name, function) for name, function in stages.items()}
+	return {name: future.result() for name, future in futures.items()}
+
+def _build_streamed_extension(manifest, zip_file, tmpDir, name, cdp, priority, cacheDir, native, max_event_size, compression, metadata_output, stripped_mons=None):
+	"""
+	Build an extension by writing the input files and the generated files straight into the zip file.
+	The temporary directory is only used to run apamadoc and engine_package, so may be None when building
+	with native metadata extraction and without CDP files.
+	:param stripped_mons: The InputFiles of the stripped mon files, to package instead of the mon files of the input.
+	:return: Tuple of the CDP files, as returned by package_cdps, if packaging into CDP files, the block metadata,
+	  the messages of each language and the digest of the extension.
+	"""
+	input = manifest.inputDir
+	files_to_copy = manifest.evts
+	mons = manifest.mons if stripped_mons is None else stripped_mons
 
-	files_to_copy = list(input.rglob('*.evt'))
+	metadata_tmp_dir = str(tmpDir / 'metadata') if tmpDir else None
+	cdp_dir = tmpDir / 'cdp' if tmpDir else None
 
-	# Create CPD or copy mon files to extension directory while maintaining structure
-	mons = list(input.rglob('*.mon'))
+	# Generate block metadata, create the CPD and read the messages files at the same time
+	stages = {
+		'metadata': lambda: blockMetadataGenerator.generate_metadata(input, metadata_tmp_dir, cacheDir=cacheDir, native=native, manifest=manifest, output=metadata_output and str(metadata_output)),
+		'read messages': lambda: read_message_files(input, manifest),
+	}
 	if cdp:
-		createCDP(name, mons, ext_files_dir)
+		stages['package CDP'] = lambda: package_cdps(name, mons, cdp_dir, cacheDir, per_package=cdp == 'package')
 	else:
+		# add mon files to the zip while maintaining structure
 		files_to_copy.extend(mons)
+		if stripped_mons is not None:
+			stages['check stripped files'] = lambda: check_stripped_mon_files(mons, tmpDir / 'strip_check')
+	results = run_stages(stages)
+	(metadata, messages) = results['metadata'] or (None, {})
+	cdps = results.get('package CDP')
 
-	for p in files_to_copy:
-		target_file = ext_files_dir / p.relative_to(input)
-		target_file.parent.mkdir(parents=True, exist_ok=True)
-		shutil.copy2(p, target_file)
+	generated = {}  # path in the zip -> content
+	if priority is not None:
+		generated['priority.txt'] = str(priority)
+
+	with profiler.phase('write events'):
+		if metadata:
+			generated[f'files/events/{name}_metadata.evt'] = '\n'.join(metadata_events(name, metadata, max_event_size))
+		languages = collate_languages(input, messages, manifest, results['read messages'])
+		for language, msgs in languages.items():
+			generated[f'files/events/{messages_evt_name(name, language)}'] = '\n'.join(messages_events(name, msgs, max_event_size, language))
+
+	with profiler.phase('zip'):
+		entries = {'files/' + f.rel: f.data if f.data is not None else f.path for f in files_to_copy}
+		entries.update((f'files/{cdp_name}', cdp_dir / cdp_name) for cdp_name in cdps or {})
+		entries.update(generated)  # the generated events replace any input files of the same name
+		digest = write_extension_zip(zip_file, entries, compression)
+	return (cdps, metadata, languages, digest)
+
+def _build_staged_extension(manifest, zip_file, tmpDir, name, cdp, priority, cacheDir, native, max_event_size, compression, metadata_output, stripped_mons=None):
+	"""
+	Build an extension by reusing the staging directory of a previous build in tmpDir, only updating the files,
+	metadata and messages whose inputs have changed, then zipping the staging directory.
+	:param stripped_mons: The InputFiles of the stripped mon files, to package instead of the mon files of the input.
+	:return: The CDP files, as returned by package_cdps, if they were packaged by this build.
+	"""
+	input = manifest.inputDir
+	ext_dir = tmpDir / name             # '/' operator on Path object joins them
+	ext_files_dir = ext_dir / 'files'
 
-	# Generate block metadata
-	metadata_tmp_dir = tmpDir / 'metadata'
-	(metadata_json_file, messages) = blockMetadataGenerator.run_metadata_generator(input, str(metadata_tmp_dir / name), str(metadata_tmp_dir))
+	# The staging manifest records the source files and the inputs of the generated files of the last build
+	manifest_file = tmpDir / f'{name}_{STAGING_MANIFEST}'
+	options = {'input': str(input), 'cdp': cdp, 'priority': priority, 'native': native,
+	           'max_event_size': max_event_size, 'version': blockMetadataGenerator.version,
+	           'include': manifest.include, 'exclude': manifest.exclude, 'metadata_output': metadata_output and str(metadata_output),
+	           'strip_docs': stripped_mons is not None}
+	previous = {}
+	if manifest_file.exists():
+		try:
+			previous = json.loads(manifest_file.read_text(encoding=ENCODING))
+		except ValueError:
+			previous = {}
+		if previous.get('options') != options:
+			previous = {}
+		manifest_file.unlink()  # until this build succeeds
+	if not previous and ext_dir.exists():
+		shutil.rmtree(ext_dir)
+	ext_files_dir.mkdir(parents=True, exist_ok=True)
 
-	if metadata_json_file:
-		# Write evt file for metadata events
-		metadata = Path(metadata_json_file).read_text(encoding=ENCODING)
-		write_evt_file(ext_files_dir, f'{name}_metadata.evt', f'{BLOCK_METADATA_EVENT}("{name}", "EN", {embeddable_json_str(metadata)})')
+	# Define priority of the extension if specified
+	if priority is not None:
+		ext_dir.joinpath('priority.txt').write_text(str(priority), encoding=ENCODING)
 
-	# Collate all the messages from the messages.json and *-messages.json
-	gen_messages_evt_file(name, input, ext_files_dir, messages)
+	files_to_copy = manifest.evts
+	mons = manifest.mons
+	msg_files = manifest.messages
+
+	metadata_tmp_dir = tmpDir / 'metadata'
+	metadata_messages_file = metadata_tmp_dir / f'{name}-messages.json'
+	previous_files = previous.get('files', {})
+	files = {}
+	with profiler.phase('check files'):
+		for f in manifest.files:
+			files[f.rel] = _file_state(f, previous_files.get(f.rel))
+	mons_digest = _content_digest(files, [f.rel for f in mons])
+	messages_digest = _content_digest(files, [f.rel for f in msg_files]) + mons_digest
+	mons_changed = mons_digest != previous.get('mons') or not metadata_messages_file.exists() or bool(metadata_output and not metadata_output.exists())
+	messages_changed = messages_digest != previous.get('messages')
+
+	packaged_mons = mons if stripped_mons is None else stripped_mons
+	if not cdp:
+		# copy mon files to extension directory while maintaining structure
+		files_to_copy.extend(packaged_mons)
+	staged = [f.rel for f in files_to_copy]
+
+	def copy_files():
+		for f in files_to_copy:
+			target_file = ext_files_dir / f.rel
+			if target_file.exists() and files[f.rel]['sha256'] == previous_files.get(f.rel, {}).get('sha256'):
+				continue
+			target_file.parent.mkdir(parents=True, exist_ok=True)
+			shutil.copy2(f.path, target_file)
+		for rel in set(previous.get('staged', [])).difference(staged):
+			target_file = ext_files_dir / rel
+			if target_file.exists():
+				target_file.unlink()
+
+	# Generate block metadata, create the CPD, copy the files and read the messages files at the same time
+	stages = {'copy files': copy_files}
+	if cdp and mons_changed:
+		stages['package CDP'] = lambda: package_cdps(name, packaged_mons, ext_files_dir, cacheDir, per_package=cdp == 'package')
+	if stripped_mons is not None and not cdp and mons_changed:
+		stages['check stripped files'] = lambda: check_stripped_mon_files(stripped_mons, tmpDir / 'strip_check')
+	if mons_changed:
+		stages['metadata'] = lambda: blockMetadataGenerator.generate_metadata(input, str(metadata_tmp_dir), cacheDir=cacheDir, native=native, manifest=manifest, output=metadata_output and str(metadata_output))
+	if messages_changed:
+		stages['read messages'] = lambda: read_message_files(input, manifest)
+	results = run_stages(stages)
+
+	if mons_changed:
+		(metadata, messages) = results['metadata'] or (None, {})
+		metadata_tmp_dir.mkdir(parents=True, exist_ok=True)
+		metadata_messages_file.write_text(json.dumps(messages), encoding=ENCODING)
+	else:
+		messages = json.loads(metadata_messages_file.read_text(encoding=ENCODING))
+
+	# Remove the CDP files of packages which no longer have any monitors
+	cdps = results.get('package CDP')
+	cdp_names = sorted(cdps) if cdps is not None else previous.get('cdps', [])
+	for cdp_name in set(previous.get('cdps', [])).difference(cdp_names):
+		target_file = ext_files_dir / cdp_name
+		if target_file.exists():
+			target_file.unlink()
+
+	with profiler.phase('write events'):
+		if mons_changed and metadata:
+			# Write evt file for metadata events
+			write_evt_file(ext_files_dir, f'{name}_metadata.evt', '\n'.join(metadata_events(name, metadata, max_event_size)))
+		elif mons_changed:
+			# Remove the metadata events of the previous build if there are no longer any blocks
+			target_file = ext_files_dir / 'events' / f'{name}_metadata.evt'
+			if target_file.exists():
+				target_file.unlink()
+
+		# Collate the messages of each language from the messages.json and *-messages.json files
+		languages = previous.get('languages', [DEFAULT_LANGUAGE])
+		if messages_changed:
+			collated = collate_languages(input, messages, manifest, results['read messages'])
+			for language, msgs in collated.items():
+				write_evt_file(ext_files_dir, messages_evt_name(name, language), '\n'.join(messages_events(name, msgs, max_event_size, language)))
+			for language in set(languages).difference(collated):
+				target_file = ext_files_dir / 'events' / messages_evt_name(name, language)
+				if target_file.exists():
+					target_file.unlink()
+			languages = list(collated)
 
 	# Create zip of extension
-	shutil.make_archive(output, format='zip', root_dir=ext_dir)
-	if printMsg:
-		print(f'Created {output}.zip')
-	return output.absolute().with_suffix('.zip')
+	with profiler.phase('zip'):
+		entries = {}
+		for root, _, filenames in os.walk(ext_dir):
+			for f in filenames:
+				path = Path(root, f)
+				entries[path.relative_to(ext_dir).as_posix()] = path
+		write_extension_zip(zip_file, entries, compression)
+
+	manifest = {'options': options, 'files': files, 'staged': staged, 'cdps': cdp_names, 'mons': mons_digest, 'messages': messages_digest, 'languages': languages}
+	manifest_file.write_text(json.dumps(manifest), encoding=ENCODING)
+	return cdps
 
 class C8yConnection(object):
 	"""
@@ -335,6 +923,58 @@ def upload_or_delete_extension(extension_zip, url, username, password, name, del
 			raise Exception(f'Failed to restart Apama-ctrl: {ex}')
 
 
+def zip_content_digest(zip_file):
+	"""Return a digest of the names and contents of the files in a zip file, which ignores their timestamps."""
+	digest = read_extension_digest(zip_file)
+	if digest:
+		return digest
+	h = hashlib.sha256()
+	with zipfile.ZipFile(zip_file) as zf:
+		for info in sorted(zf.infolist(), key=lambda i: i.filename):
+			h.update(f'{info.filename}\0{info.file_size}\0{info.CRC}\n'.encode(ENCODING))
+	return h.hexdigest()
+
+def _build(args, zip_path, incremental):
+	return build_extension(args.input, zip_path, args.tmpDir, args.cdp, args.priority, printMsg=bool(args.output), cacheDir=args.cacheDir, native=args.native, max_event_size=args.maxEventSize, incremental=incremental, compression=args.compression, include=args.include, exclude=args.exclude,
+	                       cdp_per_package=args.cdpPerPackage, list_cdp_inputs=args.listCdpInputs, metadata_output=args.metadataOutput, strip_docs=args.stripDocs)
+
+def _copy_to_output(args, zip_path):
+	if args.output:
+		output = args.output + ('' if args.output.endswith('.zip') else '.zip')
+		shutil.copy2(zip_path, output)
+
+def watch(args, zip_path, is_remote):
+	"""
+	Rebuild the extension incrementally whenever the files of the input directory change, until interrupted.
+	If uploading, the extension is only uploaded again if the content of the zip file has changed.
+	"""
+	watcher = fileWatcher.create_watcher(args.input, args.include, args.exclude, poll=args.poll)
+	print(f'Watching {args.input} for changes using {watcher.kind}, press Ctrl+C to stop')
+	uploaded = None
+	try:
+		while True:
+			try:
+				built = _build(args, zip_path, incremental=True)
+				if is_remote:
+					_copy_to_output(args, built)
+					digest = zip_content_digest(built)
+					if digest == uploaded:
+						print('Extension content is unchanged, so not uploading it')
+					else:
+						with profiler.phase('upload'):
+							upload_or_delete_extension(built, args.cumulocity_url, args.username, args.password, args.name,
+							                           False, args.restart, printMsg=True)
+						uploaded = digest
+			except Exception as e:
+				# keep watching, so the next change can fix the problem
+				print(f'Build failed: {e}')
+			fileWatcher.wait_for_change(watcher, args.debounce)
+			print('Files changed, rebuilding')
+	except KeyboardInterrupt:
+		print('Stopped watching')
+	finally:
+		watcher.close()
+
 def run(args):
 	# Support remote operations and whether they are mandatory.
 	remote = {'cumulocity_url':True, 'username':True, 'password':True, 'name':True, 'delete':False, 'restart':False}
@@ -361,11 +1001,15 @@ def run(args):
 
 
 	zip_path = Path(args.tmpDir, args.name).with_suffix('.zip') if is_remote else args.output # Use the <name>.zip for the zip name which gets uploaded.
+	if args.watch:
+		if args.delete:
+			raise Exception(f'Argument --watch cannot be used when deleting an extension')
+		return watch(args, zip_path, is_remote)
 	if not args.delete:
-		zip_path = build_extension(args.input, zip_path, args.tmpDir, args.cdp, args.priority, printMsg=bool(args.output))
+		zip_path = _build(args, zip_path, args.incremental)
 	if is_remote:
-		if args.output and not args.delete:
-			output = args.output + ('' if args.output.endswith('.zip') else '.zip')
-			shutil.copy2(zip_path, output)
-		return upload_or_delete_extension(zip_path, args.cumulocity_url, args.username,
-		                                  args.password, args.name, args.delete, args.restart, printMsg=True)
+		if not args.delete:
+			_copy_to_output(args, zip_path)
+		with profiler.phase('delete' if args.delete else 'upload'):
+			return upload_or_delete_extension(zip_path, args.cumulocity_url, args.username,
+			                                  args.password, args.name, args.delete, args.restart, printMsg=True)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+"""
+Build all the extensions listed in a workspace manifest, in a pool of processes.
+
+The workspace manifest is a JSON file containing either a list of extensions, or an object with an
+"extensions" list and optional "defaults" applied to every extension. Each extension has "input" and
+"output" keys, and optionally "priority", "cdp", "cdpPerPackage", "native", "stripDocs", "maxEventSize",
+"include" and "exclude", with the same meaning as the build extension arguments. Relative paths are relative to
+the directory of the manifest.
+"""
+import json, os, time
+from concurrent.futures import ProcessPoolExecutor
+
+import apamadocCache, buildExtension, inputManifest
+
+EXTENSION_KEYS = {
+	# key in the manifest -> (argument of build_extension, type)
+	'input': ('input', str),
+	'output': ('output', str),
+	'priority': ('priority', int),
+	'cdp': ('cdp', bool),
+	'cdpPerPackage': ('cdp_per_package', bool),
+	'native': ('native', bool),
+	'stripDocs': ('strip_docs', bool),
+	'maxEventSize': ('max_event_size', int),
+	'include': ('include', list),
+	'exclude': ('exclude', list),
+}
+TYPE_NAMES = {str: 'string', int: 'integer', bool: 'boolean', list: 'list'}
+
+def read_workspace(manifest):
+	"""
+	Read a workspace manifest.
+	:param manifest: The JSON file listing the extensions.
+	:return: List of dictionaries of build_extension arguments, one for each extension.
+	"""
+	baseDir = os.path.dirname(os.path.abspath(manifest))
+	with open(manifest, encoding='utf8') as f:
+		workspace = json.load(f)
+	if isinstance(workspace, list):
+		workspace = {'extensions': workspace}
+	if not isinstance(workspace, dict) or not isinstance(workspace.get('extensions'), list):
+		raise Exception('The workspace manifest must contain a list of extensions: %s' % manifest)
+	defaults = workspace.get('defaults', {})
+	if not isinstance(defaults, dict):
+		raise Exception('The "defaults" of the workspace manifest must be an object: %s' % manifest)
+
+	extensions = []
+	for entry in workspace['extensions']:
+		if not isinstance(entry, dict) or 'input' not in entry or 'output' not in entry:
+			raise Exception('Each extension in the workspace manifest must have "input" and "output" keys: %s' % json.dumps(entry))
+		extension = {}
+		for key, value in dict(defaults, **entry).items():
+			if key not in EXTENSION_KEYS:
+				raise Exception('Unknown key "%s" in the workspace manifest, expected one of: %s' % (key, ', '.join(EXTENSION_KEYS)))
+			(argument, valueType) = EXTENSION_KEYS[key]
+			if (value is not None and not isinstance(value, valueType)) or (valueType is int and isinstance(value, bool)):
+				raise Exception('The "%s" key in the workspace manifest must be a %s: %s' % (key, TYPE_NAMES[valueType], json.dumps(entry)))
+			extension[argument] = value
+		extension['input'] = os.path.normpath(os.path.join(baseDir, extension['input']))
+		extension['output'] = os.path.normpath(os.path.join(baseDir, extension['output']))
+		extensions.append(extension)
+	outputs = [os.path.normcase(os.path.abspath(e['output'])) for e in extensions]
+	if len(set(outputs)) != len(outputs):
+		raise Exception('Each extension in the workspace manifest must have a different output: %s' % manifest)
+	return extensions
+
+def check_environment(extensions):
+	"""Check the Apama installation has what all the extensions need, so that a problem shared by all of them fails the build before it starts."""
+	apamaHome = os.getenv('APAMA_HOME', None)
+	if not apamaHome or not os.path.isdir(apamaHome):
+		raise Exception('APAMA_HOME is not set or does not exist. Please run this script from an apama_env shell or Apama Command Prompt.')
+	if any(not e.get('native') for e in extensions):
+		if 'APAMA_JRE' not in os.environ:
+			raise Exception('APAMA_JRE is not set, which is required by extensions that do not use "native" metadata extraction.')
+		if not os.path.exists(os.path.join(apamaHome, 'lib', 'ap-generate-apamadoc.jar')):
+			raise Exception('The Apama installation does not contain lib/ap-generate-apamadoc.jar: %s' % apamaHome)
+	if any(e.get('cdp') or e.get('strip_docs') for e in extensions):
+		if not any(os.path.exists(os.path.join(apamaHome, 'bin', f)) for f in ['engine_package', 'engine_package.exe']):
+			raise Exception('The Apama installation does not contain bin/engine_package, which is required by extensions using "cdp" or "stripDocs": %s' % apamaHome)
+
+def _build_one(extension, tmpDir, cacheDir, compression):
+	"""Build one extension of a workspace, returning the zip file, the error if any, and the number of seconds taken."""
+	start = time.perf_counter()
+	try:
+		zip_file = buildExtension.build_extension(tmpDir=tmpDir, cacheDir=cacheDir, compression=compression, **extension)
+		return (str(zip_file), None, time.perf_counter() - start)
+	except Exception as e:
+		return (None, str(e) or type(e).__name__, time.perf_counter() - start)
+
+def scan_inputs(extensions):
+	"""
+	Walk the input directory of each extension, once for all the extensions sharing an input directory.
+	:param extensions: List of dictionaries of build_extension arguments, as returned by read_workspace.
+	:return: List of the InputManifest of each extension, with its include and exclude patterns applied,
+	  or None if its input directory does not exist, which fails the build of that extension.
+	"""
+	scans = {}
+	for e in extensions:
+		if e['input'] not in scans and os.path.isdir(e['input']):
+			scans[e['input']] = inputManifest.InputManifest.scan(e['input'])
+	return [scans[e['input']].select(e.get('include'), e.get('exclude')) if e['input'] in scans else None for e in extensions]
+
+def build_workspace(extensions, tmpDir, cacheDir=None, compression=None, jobs=None, printMsg=False):
+	"""
+	Build several extensions concurrently, in a pool of processes. The extensions share the apamadoc and CDP caches.
+	:param extensions: List of dictionaries of build_extension arguments, as returned by read_workspace. Extensions
+	  sharing an input directory, such as with different include and exclude patterns, share a single walk of it.
+	:param tmpDir: The temporary directory. Each extension uses a separate directory inside it.
+	:param cacheDir: The cache directory, defaults to the ANALYTICS_BUILDER_CACHE_DIR environment variable, or
+	  otherwise a directory inside tmpDir which is shared by the extensions of this build.
+	:param compression: The compression level of the zip files.
+	:param jobs: The number of extensions to build concurrently, defaults to the number of CPUs.
+	:param printMsg: Print the result and time of each extension.
+	:return: List of (input directory, zip file or None, error or None, seconds) for each extension.
+	"""
+	check_environment(extensions)
+	cacheDir = apamadocCache.default_cache_dir(cacheDir) or os.path.join(tmpDir, 'cache')
+	start = time.perf_counter()
+	with ProcessPoolExecutor(max_workers=jobs) as pool:
+		futures = [pool.submit(_build_one, dict(extension, manifest=manifest), os.path.join(tmpDir, 'extension_%d' % i), cacheDir, compression)
+		           for i, (extension, manifest) in enumerate(zip(extensions, scan_inputs(extensions)))]
+		results = [(extension['input'],) + future.result() for extension, future in zip(extensions, futures)]
+	elapsed = time.perf_counter() - start
+
+	failures = [r for r in results if r[2] is not None]
+	if printMsg:
+		for (input, zip_file, error, seconds) in results:
+			if error is not None:
+				print(f'FAILED  {seconds:7.2f}s  {input}: {error}')
+			else:
+				print(f'OK      {seconds:7.2f}s  {input}: created {zip_file}')
+		print(f'Built {len(results) - len(failures)} of {len(results)} extensions in {elapsed:.2f}s')
+	if failures:
+		raise Exception(f'Failed to build {len(failures)} of {len(results)} extensions')
+	return results
+
+def add_arguments(parser):
+	parser.add_argument('--manifest', metavar='JSON_FILE', type=str, required=True, help='the workspace manifest listing the extensions to build')
+	parser.add_argument('--jobs', metavar='N', type=int, required=False, help='the number of extensions to build concurrently (defaults to the number of CPUs)')
+	parser.add_argument('--cacheDir', metavar='DIR', type=str, required=False, help=f'the directory to cache build output in between builds (defaults to the {apamadocCache.CACHE_DIR_ENV} environment variable, otherwise the extensions only share a cache during this build)')
+	parser.add_argument('--compression', metavar='LEVEL', type=int, choices=range(0, 10), required=False, help='the compression level of the extension zips, from 0 (store the files without compressing them) to 9 (defaults to 6)')
+
+def run(args):
+	build_workspace(read_workspace(args.manifest), args.tmpDir, args.cacheDir, args.compression, args.jobs, printMsg=True)
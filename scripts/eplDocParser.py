@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+"""
+Pure-Python extraction of the ApamaDoc structure used for block metadata.
+
+Parses the package, using statements, event and monitor declarations, event members, constants,
+actions and doc comments (including @param and @$ tags) of mon files, and builds the same
+Packages/Package/Type elements that ap-generate-apamadoc.jar writes to structure.xml. The result
+can be passed straight to BlockGenerator.getAllValidBlockElements, without starting a JVM.
+Action bodies and monitor contents are skipped, as they do not contribute to block metadata.
+"""
+import re
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+from pathlib import Path
+
+# Types which apamadoc never qualifies with a package.
+BUILTIN_TYPES = {'integer', 'float', 'decimal', 'string', 'boolean', 'any', 'location', 'context', 'chunk',
+                 'listener', 'stream', 'action', 'sequence', 'dictionary', 'optional'}
+
+_tokenRE = re.compile(r'''
+	(?P<ws>\s+)
+	|(?P<doc>/\*\*(?!/).*?\*/)
+	|(?P<comment>/\*.*?\*/|//[^\n]*)
+	|(?P<string>"(?:\\.|[^"\\])*")
+	|(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?[dD]?)
+	|(?P<ident>\#?[A-Za-z_$][\w$]*)
+	|(?P<op>:=|.)
+''', re.DOTALL | re.VERBOSE)
+
+Token = namedtuple('Token', ['kind', 'text', 'start', 'end'])
+
+# Parsed declarations. Types are (name, [type arguments]) tuples, resolved to packages once all files are parsed.
+TypeDecl = namedtuple('TypeDecl', ['category', 'name', 'doc', 'members', 'actions'])
+MemberDecl = namedtuple('MemberDecl', ['name', 'type', 'doc', 'constant', 'value'])
+ActionDecl = namedtuple('ActionDecl', ['name', 'params', 'doc'])
+FileDecl = namedtuple('FileDecl', ['package', 'usings', 'types'])
+DocComment = namedtuple('DocComment', ['description', 'params', 'dollarTags'])
+
+def tokenize(source):
+	"""Split EPL source into tokens, dropping whitespace and non-doc comments."""
+	tokens = []
+	for m in _tokenRE.finditer(source):
+		kind = m.lastgroup
+		if kind == 'ws' or kind == 'comment':
+			continue
+		text = m.group()
+		if kind == 'ident' and text.startswith('#'):
+			text = text[1:]  # escaped keyword used as an identifier
+		tokens.append(Token(kind, text, m.start(), m.end()))
+	return tokens
+
+# Characters which cannot join with a neighbouring token, so need no space next to them.
+_SEPARATORS = set('(){}[];,"')
+
+def strip_docs(source):
+	"""
+	Remove the comments, doc comments and redundant whitespace from EPL source, such as once the block metadata
+	has been generated from it. String literals are kept as they are, and so are the line breaks, so that the
+	line numbers of errors in the stripped source are unchanged.
+	:param source: The EPL source.
+	:return: The stripped source.
+	"""
+	out = []
+	newlines = 0
+	spaced = False  # whether there was whitespace or a comment since the last token
+	last = None
+	for m in _tokenRE.finditer(source):
+		kind = m.lastgroup
+		text = m.group()
+		if kind in ('ws', 'doc', 'comment'):
+			newlines += text.count('\n')
+			spaced = True
+			continue
+		if newlines:
+			out.append('\n' * newlines)
+		elif spaced and last is not None and last[-1] not in _SEPARATORS and text[0] not in _SEPARATORS:
+			out.append(' ')
+		out.append(text)
+		newlines = 0
+		spaced = False
+		last = text
+	if newlines:
+		out.append('\n')
+	return ''.join(out)
+
+def _codeBlocksToPre(lines):
+	"""Turn a <code> element that spans several lines into <pre>, as apamadoc does, so that its line breaks are kept."""
+	out, inCode = [], False
+	for line in lines:
+		if inCode:
+			if '</code>' in line:
+				line = line.replace('</code>', '</pre>', 1)
+				inCode = False
+		else:
+			head, code, tail = line.rpartition('<code>')
+			if code and '</code>' not in tail:
+				line = head + '<pre>' + tail
+				inCode = True
+		out.append(line)
+	return out
+
+def parse_doc_comment(text):
+	"""
+	Parse a doc comment in the way apamadoc does.
+	Lines of a paragraph are joined with a space and paragraphs are separated by a blank line; lines inside
+	<pre>, or inside a <code> element spanning several lines, which becomes <pre>, are kept as they are.
+	Block tags start a new section which runs until the next tag.
+	:param text: The comment, including the /** and */ delimiters.
+	:return: DocComment with the description, a map of @param name to text and a list of (@$tag, text).
+	"""
+	lines = []
+	for line in text[3:-2].splitlines():
+		line = line.strip()
+		if line.startswith('*'):
+			line = line[1:]
+		lines.append(line)
+
+	sections = [[]]
+	for line in lines:
+		if line.strip().startswith('@'):
+			sections.append([line.strip()])
+		else:
+			sections[-1].append(line)
+
+	paragraphs, current, inPre = [], [], False
+	for line in _codeBlocksToPre(sections[0]):
+		if inPre:
+			current[-1] += '\n' + line
+		elif line.strip():
+			current.append(line.strip())
+		elif current:
+			paragraphs.append(' '.join(current))
+			current = []
+		inPre = (inPre or '<pre>' in line) and '</pre>' not in line.split('<pre>')[-1]
+	if current:
+		paragraphs.append(' '.join(current))
+
+	params, dollarTags = {}, []
+	for section in sections[1:]:
+		tag, _, rest = section[0].partition(' ')
+		value = ' '.join([rest.strip()] + [l.strip() for l in section[1:] if l.strip()]).strip()
+		if tag == '@param':
+			name, _, value = value.partition(' ')
+			params[name] = value.strip()
+		elif tag.startswith('@$'):
+			dollarTags.append((tag[1:], value))
+	return DocComment('\n\n '.join(paragraphs), params, dollarTags)
+
+class _FileParser(object):
+	"""Recursive-descent parser for the declarations in a single mon file."""
+
+	def __init__(self, source):
+		self.source = source
+		self.tokens = tokenize(source)
+		self.pos = 0
+
+	def _peek(self, offset=0):
+		i = self.pos + offset
+		return self.tokens[i] if i < len(self.tokens) else Token('eof', '', len(self.source), len(self.source))
+
+	def _next(self):
+		tok = self._peek()
+		self.pos += 1
+		return tok
+
+	def _accept(self, text):
+		if self._peek().text == text and self._peek().kind in ('op', 'ident'):
+			self.pos += 1
+			return True
+		return False
+
+	def _expect(self, text):
+		tok = self._next()
+		if tok.text != text:
+			raise SyntaxError(f'Expected "{text}" but found "{tok.text}" at line {self.source.count(chr(10), 0, tok.start) + 1}')
+		return tok
+
+	def _ident(self):
+		tok = self._next()
+		if tok.kind != 'ident':
+			raise SyntaxError(f'Expected an identifier but found "{tok.text}" at line {self.source.count(chr(10), 0, tok.start) + 1}')
+		return tok.text
+
+	def _takeDoc(self):
+		"""Consume any doc comments, returning the last one (the one attached to the next declaration)."""
+		doc = None
+		while self._peek().kind == 'doc':
+			doc = self._next().text
+		return parse_doc_comment(doc) if doc else None
+
+	def _qualifiedName(self):
+		name = self._ident()
+		while self._peek().text == '.' and self._peek(1).kind == 'ident':
+			self.pos += 1
+			name += '.' + self._ident()
+		return name
+
+	def _type(self):
+		name = self._qualifiedName()
+		args = []
+		if self._accept('<'):
+			args.append(self._type())
+			while self._accept(','):
+				args.append(self._type())
+			self._expect('>')
+		if name == 'action' and self._accept('returns'):
+			self._type()
+		return (name, args)
+
+	def _skipBalanced(self):
+		"""Skip a {...} block, starting at the opening brace."""
+		depth = 0
+		while self._peek().kind != 'eof':
+			tok = self._next()
+			if tok.kind != 'op': continue
+			if tok.text == '{': depth += 1
+			elif tok.text == '}':
+				depth -= 1
+				if depth == 0: return
+
+	def _skipStatement(self):
+		"""Skip up to and including the next ';' or balanced {...} block at this level."""
+		while self._peek().kind != 'eof':
+			if self._peek().text == '{' and self._peek().kind == 'op':
+				self._skipBalanced()
+				return
+			if self._next().text == ';':
+				return
+
+	def _valueText(self):
+		"""Return the source text of an expression up to the terminating ';'."""
+		start = self._peek().start
+		end = start
+		depth = 0
+		while self._peek().kind != 'eof':
+			tok = self._peek()
+			if tok.kind == 'op':
+				if tok.text in '([{': depth += 1
+				elif tok.text in ')]}': depth -= 1
+				elif tok.text == ';' and depth == 0: break
+			end = tok.end
+			self.pos += 1
+		self._expect(';')
+		return self.source[start:end].strip()
+
+	def _eventBody(self, decl):
+		self._expect('{')
+		while True:
+			doc = self._takeDoc()
+			tok = self._peek()
+			if tok.kind == 'eof' or tok.text == '}':
+				self._next()
+				return
+			if tok.text == 'constant':
+				self._next()
+				memberType = self._type()
+				name = self._ident()
+				self._expect(':=')
+				decl.members.append(MemberDecl(name, memberType, doc, True, self._valueText()))
+			elif tok.text == 'import' and tok.kind == 'ident':
+				self._skipStatement()
+			elif (tok.text == 'action' and self._peek(1).kind == 'ident') or (tok.text == 'static' and self._peek(1).text == 'action'):
+				self._accept('static')
+				self._next()
+				name = self._ident()
+				params = []
+				self._expect('(')
+				while not self._accept(')'):
+					paramType = self._type()
+					params.append((self._ident(), paramType))
+					self._accept(',')
+				if self._accept('returns'):
+					self._type()
+				decl.actions.append(ActionDecl(name, params, doc))
+				self._skipBalanced()
+			elif tok.kind == 'ident':
+				start = self.pos
+				try:
+					self._accept('wildcard')
+					memberType = self._type()
+					names = [self._ident()]
+					while self._accept(','):
+						names.append(self._ident())
+					self._expect(';')
+				except SyntaxError:
+					# not a field, so skip the whole statement
+					self.pos = start
+					self._skipStatement()
+					continue
+				decl.members.extend(MemberDecl(name, memberType, doc, False, None) for name in names)
+			else:
+				self._skipStatement()
+
+	def parse(self):
+		package = ''
+		usings = {}
+		types = []
+		while self._peek().kind != 'eof':
+			doc = self._takeDoc()
+			tok = self._peek()
+			if tok.text == 'package' and tok.kind == 'ident':
+				self._next()
+				package = self._qualifiedName()
+				self._expect(';')
+			elif tok.text == 'using' and tok.kind == 'ident':
+				self._next()
+				name = self._qualifiedName()
+				usings[name.rpartition('.')[2]] = name
+				self._expect(';')
+			elif tok.text == 'event' and tok.kind == 'ident':
+				self._next()
+				decl = TypeDecl('Event', self._ident(), doc, [], [])
+				self._eventBody(decl)
+				types.append(decl)
+			elif tok.text == 'monitor' and tok.kind == 'ident':
+				self._next()
+				types.append(TypeDecl('Monitor', self._ident(), doc, [], []))
+				self._skipStatement()
+			elif tok.text == '{' and tok.kind == 'op':
+				self._skipBalanced()
+			else:
+				self._next()
+		return FileDecl(package, usings, types)
+
+def parse_mon_file(monFile):
+	"""
+	Parse the declarations in a mon file.
+	:param monFile: Path to the mon file, or an InputFile, which may be in memory.
+	:return: FileDecl with the package, using statements and types of the file.
+	"""
+	try:
+		return _FileParser((monFile if hasattr(monFile, 'read_text') else Path(monFile)).read_text(encoding='utf-8-sig')).parse()
+	except SyntaxError as err:
+		raise Exception(f'Unable to parse {monFile}: {err}')
+
+# Types that apamadoc reports as any, as a block input of one of these types accepts any wire.
+_ANY_TYPES = {'apama.analyticsbuilder.Value'}
+
+class _Resolver(object):
+	"""Resolves type names the way apamadoc does: types declared in the catalog get a package attribute, others are fully qualified."""
+
+	def __init__(self, declared):
+		self.declared = declared
+
+	def resolve(self, name, fileDecl):
+		if name in BUILTIN_TYPES:
+			return None, name
+		if '.' not in name:
+			if name in fileDecl.usings:
+				name = fileDecl.usings[name]
+			elif (fileDecl.package, name) in self.declared:
+				return fileDecl.package, name
+		package, _, simpleName = name.rpartition('.')
+		if package and (package, simpleName) in self.declared:
+			return package, simpleName
+		if name in _ANY_TYPES:
+			return None, 'any'
+		return None, name
+
+def _addDescription(element, text):
+	if text:
+		ElementTree.SubElement(element, 'Description').text = text
+
+def _addDollarFields(element, doc):
+	if doc and doc.dollarTags:
+		dollarFields = ElementTree.SubElement(element, 'DollarFields')
+		for name, value in doc.dollarTags:
+			dollarField = ElementTree.SubElement(dollarFields, 'DollarField', name=name)
+			ElementTree.SubElement(dollarField, 'Description').text = value
+
+def _addTypeAttributes(element, typeRef, fileDecl, resolver):
+	package, name = resolver.resolve(typeRef[0], fileDecl)
+	if package:
+		element.set('package', package)
+	element.set('type', name)
+	if typeRef[1]:
+		parameters = ElementTree.SubElement(element, 'Parameters')
+		for arg in typeRef[1]:
+			_addTypeAttributes(ElementTree.SubElement(parameters, 'Parameter'), arg, fileDecl, resolver)
+
+def _typeElement(package, typeDecl, fileDecl, resolver):
+	typeElement = ElementTree.SubElement(package, 'Type', category=typeDecl.category, name=typeDecl.name)
+	_addDescription(typeElement, typeDecl.doc and typeDecl.doc.description)
+	_addDollarFields(typeElement, typeDecl.doc)
+	for m in typeDecl.members:
+		member = ElementTree.SubElement(typeElement, 'Member', name=m.name)
+		if m.constant:
+			member.set('constant', 'true')
+			member.set('typeValue', m.value)
+		_addTypeAttributes(member, m.type, fileDecl, resolver)
+		_addDescription(member, m.doc and m.doc.description)
+		_addDollarFields(member, m.doc)
+	for a in typeDecl.actions:
+		action = ElementTree.SubElement(typeElement, 'Action', name=a.name)
+		_addDescription(action, a.doc and a.doc.description)
+		_addDollarFields(action, a.doc)
+		if a.params:
+			parameters = ElementTree.SubElement(action, 'Parameters')
+			for name, paramType in a.params:
+				parameter = ElementTree.SubElement(parameters, 'Parameter', name=name)
+				_addTypeAttributes(parameter, paramType, fileDecl, resolver)
+				_addDescription(parameter, a.doc and a.doc.params.get(name))
+	return typeElement
+
+def generate_structure(monFiles):
+	"""
+	Build the structure.xml root element for a set of mon files.
+	:param monFiles: The mon files, in the order their types should appear.
+	:return: The Packages element.
+	"""
+	files = [parse_mon_file(f) for f in monFiles]
+	resolver = _Resolver({(f.package, t.name) for f in files for t in f.types})
+	root = ElementTree.Element('Packages')
+	packages = {}
+	for f in files:
+		if not f.types: continue
+		if f.package not in packages:
+			packages[f.package] = ElementTree.SubElement(root, 'Package', name=f.package, display=f.package)
+		for t in f.types:
+			_typeElement(packages[f.package], t, f, resolver)
+	return root
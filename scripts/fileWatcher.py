@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+"""
+Watch an input directory for changes to the files of an extension.
+
+On Linux, the directories are watched with inotify, so that changes are seen immediately without
+walking the directory. Elsewhere, or if inotify is not available, the directory is polled.
+"""
+import ctypes, ctypes.util, os, select, struct, sys, time
+
+from inputManifest import InputManifest, file_kind, matches
+
+DEFAULT_DEBOUNCE = 0.5
+DEFAULT_POLL_INTERVAL = 1.0
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct('iIII')
+
+def _directories(inputDir, exclude):
+	"""Return the directories to watch, relative to the input directory, skipping excluded directories."""
+	directories = ['']
+	for root, dirs, _ in os.walk(inputDir):
+		prefix = os.path.relpath(root, inputDir).replace(os.sep, '/')
+		prefix = '' if prefix == '.' else prefix + '/'
+		dirs[:] = [d for d in dirs if not (exclude and matches(prefix + d, exclude))]
+		directories.extend(prefix + d for d in dirs)
+	return directories
+
+class PollingWatcher(object):
+	"""Watches a directory by comparing the sizes and modification times of its files at regular intervals."""
+	kind = 'polling'
+
+	def __init__(self, inputDir, include=None, exclude=None, interval=DEFAULT_POLL_INTERVAL):
+		self.inputDir = inputDir
+		self.include = include
+		self.exclude = exclude
+		self.interval = interval
+		self._snapshot = self._scan()
+
+	def _scan(self):
+		return {f.rel: (f.size, f.mtime_ns) for f in InputManifest.scan(self.inputDir, self.include, self.exclude).files}
+
+	def wait(self, timeout=None):
+		"""
+		Wait for the files to change.
+		:param timeout: The number of seconds to wait, or None to wait until a change.
+		:return: Whether any file changed.
+		"""
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+			if remaining > 0:
+				time.sleep(remaining)
+			snapshot = self._scan()
+			if snapshot != self._snapshot:
+				self._snapshot = snapshot
+				return True
+			if deadline is not None and time.monotonic() >= deadline:
+				return False
+
+	def close(self):
+		pass
+
+class InotifyWatcher(object):
+	"""Watches a directory and its subdirectories with Linux inotify."""
+	kind = 'inotify'
+
+	def __init__(self, inputDir, include=None, exclude=None):
+		self.inputDir = os.path.abspath(inputDir)
+		self.include = include
+		self.exclude = exclude
+		self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+		self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if self._fd < 0:
+			raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+		self._watches = {}  # watch descriptor -> directory relative to the input directory
+		try:
+			self._sync()
+		except Exception:
+			self.close()
+			raise
+
+	def _sync(self):
+		"""Watch any new directories, such as after a directory was created or moved into the input directory."""
+		watched = set(self._watches.values())
+		for rel in _directories(self.inputDir, self.exclude):
+			if rel in watched: continue
+			wd = self._libc.inotify_add_watch(self._fd, os.fsencode(os.path.join(self.inputDir, rel)), WATCH_MASK)
+			if wd < 0:
+				errno = ctypes.get_errno()
+				if rel == '' or errno not in (2, 20):  # ENOENT and ENOTDIR mean it has gone already
+					raise OSError(errno, f'Cannot watch {os.path.join(self.inputDir, rel)}: {os.strerror(errno)}')
+				continue
+			self._watches[wd] = rel
+
+	def _isRelevant(self, rel, mask):
+		if self.exclude and matches(rel, self.exclude): return False
+		if mask & IN_ISDIR: return True
+		if file_kind(os.path.basename(rel)) is None: return False
+		return not self.include or matches(rel, self.include)
+
+	def _readEvents(self):
+		"""Read the pending events, returning whether any are for files of the extension."""
+		try:
+			data = os.read(self._fd, 64 * 1024)
+		except BlockingIOError:
+			return False
+		changed = resync = False
+		offset = 0
+		while offset < len(data):
+			(wd, mask, _, length) = _EVENT.unpack_from(data, offset)
+			name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0').decode(sys.getfilesystemencoding(), 'surrogateescape')
+			offset += _EVENT.size + length
+			if mask & IN_Q_OVERFLOW:
+				changed = resync = True
+				continue
+			if mask & IN_IGNORED:
+				self._watches.pop(wd, None)
+				continue
+			directory = self._watches.get(wd)
+			if directory is None: continue
+			rel = directory + '/' + name if directory and name else directory or name
+			if self._isRelevant(rel, mask):
+				changed = True
+				if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+					resync = True
+		if resync:
+			self._sync()
+		return changed
+
+	def wait(self, timeout=None):
+		"""
+		Wait for the files to change.
+		:param timeout: The number of seconds to wait, or None to wait until a change.
+		:return: Whether any file changed.
+		"""
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			remaining = None if deadline is None else max(0, deadline - time.monotonic())
+			(ready, _, _) = select.select([self._fd], [], [], remaining)
+			if ready and self._readEvents():
+				return True
+			if not ready and deadline is not None:
+				return False
+
+	def close(self):
+		if self._fd >= 0:
+			os.close(self._fd)
+			self._fd = -1
+
+def create_watcher(inputDir, include=None, exclude=None, poll=False):
+	"""
+	Create a watcher for an input directory, using inotify if it is available, otherwise polling.
+	:param inputDir: The input directory.
+	:param include: Patterns of the files to include, as for InputManifest.
+	:param exclude: Patterns of the files and directories to exclude, as for InputManifest.
+	:param poll: Always poll the directory, such as for network file systems which do not report changes to inotify.
+	:return: The watcher.
+	"""
+	if not poll and sys.platform.startswith('linux'):
+		try:
+			return InotifyWatcher(inputDir, include, exclude)
+		except (OSError, AttributeError):
+			pass  # inotify is not available, or there are too many directories to watch
+	return PollingWatcher(inputDir, include, exclude)
+
+def wait_for_change(watcher, debounce=DEFAULT_DEBOUNCE):
+	"""
+	Wait until the files change, then until there have been no further changes for the debounce period,
+	so that the changes of an editor saving several files, or a version control checkout, result in one rebuild.
+	:param watcher: The watcher, from create_watcher.
+	:param debounce: The number of seconds without changes to wait for.
+	"""
+	watcher.wait()
+	while watcher.wait(debounce):
+		pass
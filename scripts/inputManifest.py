@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+import hashlib, os, re, shutil
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+
+import apamadocCache
+
+MON = 'mon'
+EVT = 'evt'
+MESSAGES = 'messages'
+DEFAULT_LANGUAGE = 'EN'  # The language of the block metadata, and of messages files without a language suffix.
+
+# messages.json, *-messages.json, and the same with a language suffix such as messages_de.json or *-messages_pt_BR.json
+_messagesRE = re.compile(r'(?:^|-)messages(?:_([A-Za-z]{2,3}(?:[_-][A-Za-z0-9]{2,8})?))?\.json$')
+
+def messages_language(name):
+	"""Return the language of a messages file from its name, such as 'DE' for *-messages_de.json or 'EN' for *-messages.json, or None if it is not a messages file."""
+	m = _messagesRE.search(name)
+	if not m: return None
+	return (m.group(1) or DEFAULT_LANGUAGE).upper().replace('-', '_')
+
+def file_kind(name):
+	"""Return the kind of an input file from its name, or None if it is not part of an extension."""
+	if name.endswith('.mon'): return MON
+	if name.endswith('.evt'): return EVT
+	if messages_language(name): return MESSAGES
+	return None
+
+def matches(rel, patterns):
+	"""Return whether a path relative to the input directory, using '/' as the separator, matches any of the patterns."""
+	return any(fnmatchcase(rel, p) for p in patterns)
+
+class InputFile(object):
+	"""
+	A file of the input directory, with its size and modification time from the directory walk.
+	Files of an in-memory input have their content in data, and a path relative to the input.
+	"""
+
+	def __init__(self, path, rel, kind, size, mtime_ns, data=None):
+		self.path = path
+		self.rel = rel
+		self.kind = kind
+		self.size = size
+		self.mtime_ns = mtime_ns
+		self.data = data
+		self._sha256 = None
+
+	@property
+	def sha256(self):
+		"""The SHA-256 hex digest of the content, which is only read when first needed."""
+		if self._sha256 is None:
+			self._sha256 = hashlib.sha256(self.data).hexdigest() if self.data is not None else apamadocCache.file_digest(self.path)
+		return self._sha256
+
+	def read_bytes(self):
+		return self.data if self.data is not None else self.path.read_bytes()
+
+	def read_text(self, encoding='utf8'):
+		return self.data.decode(encoding) if self.data is not None else self.path.read_text(encoding=encoding)
+
+	def __str__(self):
+		return str(self.path)
+
+	def __repr__(self):
+		return f'InputFile({self.rel!r}, {self.kind!r}, {self.size})'
+
+class InputManifest(object):
+	"""
+	The mon, evt and messages files of an input directory, found by a single walk of the directory.
+
+	Include and exclude patterns are matched against paths relative to the input directory, using
+	'/' as the separator. As with fnmatch, '*' also matches '/'. A directory matching an exclude pattern
+	is not walked at all, and if there are include patterns, a file must match at least one of them.
+	"""
+
+	def __init__(self, inputDir, files, include=None, exclude=None):
+		self.inputDir = Path(inputDir) if inputDir is not None else None
+		self.files = sorted(files, key=lambda f: f.rel)
+		self.include = list(include or [])
+		self.exclude = list(exclude or [])
+
+	@classmethod
+	def scan(cls, inputDir, include=None, exclude=None):
+		"""
+		Walk the input directory once, recording the files that are part of an extension.
+		:param inputDir: The input directory.
+		:param include: Patterns of the files to include, defaults to all files.
+		:param exclude: Patterns of the files and directories to exclude.
+		:return: The InputManifest.
+		"""
+		inputDir = Path(inputDir).resolve()
+		include = list(include or [])
+		exclude = list(exclude or [])
+		files = []
+		pending = [(str(inputDir), '')]
+		while pending:
+			(directory, prefix) = pending.pop()
+			with os.scandir(directory) as entries:
+				for entry in entries:
+					rel = prefix + entry.name
+					if exclude and matches(rel, exclude): continue
+					if entry.is_dir(follow_symlinks=False):
+						pending.append((entry.path, rel + '/'))
+						continue
+					kind = file_kind(entry.name)
+					if kind is None or not entry.is_file(): continue
+					if include and not matches(rel, include): continue
+					stat = entry.stat()
+					files.append(InputFile(Path(entry.path), rel, kind, stat.st_size, stat.st_mtime_ns))
+		return cls(inputDir, files, include, exclude)
+
+	@classmethod
+	def from_files(cls, contents, include=None, exclude=None):
+		"""
+		Create the manifest of an in-memory input, which has no input directory.
+		:param contents: Dictionary of path relative to the input, using '/' as the separator, to the content of the file as bytes or a string.
+		:param include: Patterns of the files to include, defaults to all files.
+		:param exclude: Patterns of the files and directories to exclude.
+		:return: The InputManifest.
+		"""
+		include = list(include or [])
+		exclude = list(exclude or [])
+		files = []
+		for rel, data in contents.items():
+			rel = PurePosixPath(rel).as_posix().lstrip('/')
+			parts = rel.split('/')
+			if exclude and any(matches('/'.join(parts[:i]), exclude) for i in range(1, len(parts) + 1)): continue
+			kind = file_kind(parts[-1])
+			if kind is None: continue
+			if include and not matches(rel, include): continue
+			if isinstance(data, str):
+				data = data.encode('utf8')
+			files.append(InputFile(PurePosixPath(rel), rel, kind, len(data), 0, data))
+		return cls(None, files, include, exclude)
+
+	def select(self, include=None, exclude=None):
+		"""
+		Select the files matching include and exclude patterns, as if the input directory had been walked with them,
+		such as for several extensions built from one walk of a shared input directory.
+		:param include: Patterns of the files to include, defaults to all files.
+		:param exclude: Patterns of the files and directories to exclude.
+		:return: The InputManifest of the selected files.
+		"""
+		if self.filtered:
+			raise Exception('Cannot select files from an input manifest which already has include or exclude patterns')
+		include = list(include or [])
+		exclude = list(exclude or [])
+		files = []
+		for f in self.files:
+			parts = f.rel.split('/')
+			if exclude and any(matches('/'.join(parts[:i]), exclude) for i in range(1, len(parts) + 1)): continue
+			if include and not matches(f.rel, include): continue
+			files.append(f)
+		return self.__class__(self.inputDir, files, include, exclude)
+
+	@property
+	def filtered(self):
+		"""Whether include or exclude patterns may have left out some of the files of the input directory."""
+		return bool(self.include or self.exclude)
+
+	def of_kind(self, kind):
+		return [f for f in self.files if f.kind == kind]
+
+	@property
+	def mons(self):
+		return self.of_kind(MON)
+
+	@property
+	def evts(self):
+		return self.of_kind(EVT)
+
+	@property
+	def messages(self):
+		"""The messages files of all languages, with all messages.json (or messages_<language>.json) files before the *-messages.json files."""
+		messages = self.of_kind(MESSAGES)
+		plain = [f for f in messages if f.path.name.split('_', 1)[0] in ('messages.json', 'messages')]
+		return plain + [f for f in messages if f not in plain]
+
+	def stage(self, files, targetDir):
+		"""
+		Copy files into a directory, keeping their paths relative to the input directory, such as to run apamadoc over only those files.
+		:param files: The InputFiles to copy.
+		:param targetDir: The directory to copy them to, which is replaced.
+		:return: The directory.
+		"""
+		targetDir = Path(targetDir)
+		if targetDir.exists():
+			shutil.rmtree(targetDir)
+		for f in files:
+			target = targetDir / f.rel
+			target.parent.mkdir(parents=True, exist_ok=True)
+			if f.data is not None:
+				target.write_bytes(f.data)
+			else:
+				shutil.copyfile(f.path, target)
+		targetDir.mkdir(parents=True, exist_ok=True)
+		return targetDir
@@ -12,36 +12,55 @@ BLOCK_METADATA_EVENT = buildExtension.BLOCK_METADATA_EVENT
 BLOCK_MESSAGES_EVENT = buildExtension.BLOCK_MESSAGES_EVENT
 
 def add_arguments_extract(parser):
-	parser.add_argument('--input', metavar='INPUT', type=str, required=True, help='the input directory (should contain <name>-messages.json and <name>.json)')
+	parser.add_argument('--input', metavar='INPUT', type=str, required=True, help='the input directory (should contain <name>_messages.evt, any <name>_messages_<language>.evt, and <name>_metadata.evt)')
 	parser.add_argument('--output', metavar='OUTPUT', type=str, required=True, help='the output directory')
 
 def add_arguments_pack(parser):
-	parser.add_argument('--input', metavar='INPUT', type=str, required=True, help='the input directory (should contain <name>_messages.evt and <name>_metadata.evt)')
+	parser.add_argument('--input', metavar='INPUT', type=str, required=True, help='the input directory (should contain EN/<name>.json and <name>-messages.json, and any <name>-messages_<language>.json)')
 	parser.add_argument('--output', metavar='OUTPUT', type=str, required=True, help='the output directory')
 	parser.add_argument('--name', metavar='NAME', type=str, required=True, help='the name of the block catalog')
+	parser.add_argument('--maxEventSize', metavar='BYTES', type=int, required=False, help='split the block metadata and messages into several events, each with at most this many bytes of JSON')
+
+def _merge_shard(merged, data):
+	"""Merge the JSON of a sharded event into the JSON of the earlier shards."""
+	if merged is None:
+		return data
+	if isinstance(merged, dict) and isinstance(data, dict) and isinstance(merged.get('analytics'), list):
+		merged['analytics'].extend(data.get('analytics', []))
+	else:
+		merged.update(data)
+	return merged
 
 def run_json_extract(args):
 	input = Path(args.input).resolve()
 	output = Path(args.output).resolve()
-	for filename in list(input.rglob('*_messages.evt')) + list(input.rglob('*_metadata.evt')):
+	extracted = {} # (lang, name + suffix) -> JSON, with any shards merged
+	for filename in list(input.rglob('*_messages.evt')) + list(input.rglob('*_messages_*.evt')) + list(input.rglob('*_metadata.evt')):
 		with open(filename, encoding=ENCODING) as f:
 			for line in f:
+				line = line.rstrip('\r\n')
 				suffix=None
 				if line.startswith(BLOCK_METADATA_EVENT): suffix=''
 				if line.startswith(BLOCK_MESSAGES_EVENT): suffix='-messages'
 				if suffix != None:
 					jsonversion = '['+line.split('(', 1)[1][0:-1]+']'
 					(name, lang, jsonstr) = json.loads(jsonversion)
-					(output / Path(lang)).mkdir(parents=True, exist_ok=True)
-					with open(output / Path(lang) / Path(name+suffix+'.json'), 'w', encoding=ENCODING) as w:
-						json.dump(json.loads(jsonstr), w, indent='\t')
+					name = name.split(buildExtension.SHARD_SEPARATOR, 1)[0]
+					if suffix and lang != buildExtension.DEFAULT_LANGUAGE:
+						suffix += '_' + lang.lower()  # so that json pack packs them as messages of that language
+					key = (lang, name+suffix)
+					extracted[key] = _merge_shard(extracted.get(key), json.loads(jsonstr))
+	for (lang, filename), data in extracted.items():
+		(output / Path(lang)).mkdir(parents=True, exist_ok=True)
+		with open(output / Path(lang) / Path(filename+'.json'), 'w', encoding=ENCODING) as w:
+			json.dump(data, w, indent='\t')
 
 def run_json_pack(args):
 	input = Path(args.input).resolve()
 	output = Path(args.output).resolve()
 	name = args.name
-	buildExtension.gen_messages_evt_file(name, input, output, {})
+	buildExtension.gen_messages_evt_file(name, input, output, {}, args.maxEventSize)
 	metadata = Path(input / ('EN/' + name + '.json')).read_text(encoding=ENCODING)
-	buildExtension.write_evt_file(output, f'{name}_metadata.evt', f'{BLOCK_METADATA_EVENT}("{name}", "EN", {buildExtension.embeddable_json_str(metadata)})')
+	buildExtension.write_evt_file(output, f'{name}_metadata.evt', '\n'.join(buildExtension.metadata_events(name, metadata, args.maxEventSize)))
 
 
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+# $Copyright (c) 2019 Software AG, Darmstadt, Germany and/or Software AG USA Inc., Reston, VA, USA, and/or its subsidiaries and/or its affiliates and/or their licensors.$
+# Use, reproduction, transfer, publication or disclosure is prohibited except as specifically provided for in your License Agreement with Software AG
+"""
+Per-phase timing and resource usage of analytics_builder commands.
+
+Code marks its phases with `with profiler.phase('name'):`, which does nothing unless a profile is
+active. Phases nest, and are reported with their enclosing phases in the name, e.g. 'build extension/metadata/apamadoc'.
+Phases may run concurrently in several threads, in which case their CPU time and bytes read and written,
+which are measured for the whole process, overlap. The peak RSS of a phase is the high-water mark of the process
+when the phase ended, which includes the memory used before the phase started, not the peak during the phase.
+"""
+import json, os, sys, threading, time
+from contextlib import contextmanager
+
+try:
+	import resource
+except ImportError:  # not available on Windows
+	resource = None
+
+_active = None
+
+class _NoPhase(object):
+	def __enter__(self): return self
+	def __exit__(self, *args): return False
+
+_noPhase = _NoPhase()
+
+def _ioCounters():
+	"""Return the bytes read and written by this process, or None if not available (Linux only)."""
+	try:
+		with open('/proc/self/io') as f:
+			counters = dict(line.split(':', 1) for line in f if ':' in line)
+		return int(counters['rchar']), int(counters['wchar'])
+	except (OSError, KeyError, ValueError):
+		return None
+
+def _peakRSS():
+	"""
+	Return the peak resident set size in bytes so far of this process and of the largest waited-for child process.
+	These are high-water marks for the lifetime of the process, so never go down.
+	"""
+	if resource is None: return (None, None)
+	scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+	return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+	        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+def _sample():
+	t = os.times()
+	return (time.perf_counter(), t[0] + t[1], t[2] + t[3], _ioCounters())
+
+class Profiler(object):
+	"""
+	Records the wall time, CPU time, bytes read and written, and the peak RSS of the process so far, of each phase of a command.
+	"""
+
+	def __init__(self, command):
+		self.command = command
+		self.phases = []
+		self._local = threading.local()
+		self._start = time.perf_counter()
+		self._startTime = time.time()  # to place the phases of other processes, whose perf_counter differs
+
+	def _stack(self):
+		"""Return the names of the enclosing phases of the current thread."""
+		if not hasattr(self._local, 'stack'):
+			self._local.stack = []
+		return self._local.stack
+
+	@contextmanager
+	def phase(self, name):
+		stack = self._stack()
+		stack.append(name)
+		path = '/'.join(stack)
+		(wall, cpu, childCpu, io) = _sample()
+		try:
+			yield
+		finally:
+			(endWall, endCpu, endChildCpu, endIo) = _sample()
+			stack.pop()
+			(peakRSS, childPeakRSS) = _peakRSS()
+			self.phases.append({
+				'name': path,
+				'startSeconds': round(wall - self._start, 6),
+				'wallSeconds': round(endWall - wall, 6),
+				'cpuSeconds': round(endCpu - cpu, 6),
+				'childCpuSeconds': round(endChildCpu - childCpu, 6),  # CPU of processes such as the apamadoc JVM
+				'processPeakRSSBytes': peakRSS,  # of the process up to the end of the phase, not only during it
+				'childProcessPeakRSSBytes': childPeakRSS,
+				'readBytes': endIo[0] - io[0] if io and endIo else None,
+				'writeBytes': endIo[1] - io[1] if io and endIo else None,
+			})
+
+	def merge(self, report):
+		"""Add the phases of the report of another process inside the current phases of this thread, starting when they started in that process."""
+		stack = self._stack()
+		offset = report['startTime'] - self._startTime
+		for p in report['phases']:
+			self.phases.append(dict(p, name='/'.join(stack + [p['name']]), startSeconds=round(p['startSeconds'] + offset, 6)))
+
+	def report(self):
+		"""Return the report as a dictionary, with the phases in the order they started."""
+		return {
+			'command': self.command,
+			'python': sys.version.split()[0],
+			'platform': sys.platform,
+			'startTime': round(self._startTime, 6),
+			'phases': sorted(self.phases, key=lambda p: p['startSeconds']),
+		}
+
+	def write(self, reportFile):
+		with open(reportFile, 'w', encoding='utf8') as f:
+			json.dump(self.report(), f, indent=4)
+
+	def summary(self):
+		"""Return a human-readable table of the phases."""
+		def mb(value): return '-' if value is None else '%.1f' % (value / (1024 * 1024))
+		lines = ['%-50s %10s %10s %10s %10s %10s %10s' % ('Phase', 'Wall(s)', 'CPU(s)', 'Child(s)', 'MaxRSS(MB)', 'Read(MB)', 'Write(MB)')]
+		for p in self.report()['phases']:
+			lines.append('%-50s %10.3f %10.3f %10.3f %10s %10s %10s' % (
+				p['name'], p['wallSeconds'], p['cpuSeconds'], p['childCpuSeconds'],
+				mb(p['processPeakRSSBytes']), mb(p['readBytes']), mb(p['writeBytes'])))
+		return '\n'.join(lines)
+
+def phase(name):
+	"""Return a context manager recording a phase of the active profile, which does nothing if no profile is active."""
+	return _active.phase(name) if _active is not None else _noPhase
+
+def active():
+	"""Return whether a profile is active, such as to decide whether to profile work done in another process."""
+	return _active is not None
+
+def merge(report):
+	"""
+	Add the phases of a report from another process, such as a worker of a process pool, to the active profile,
+	inside the current phases. Does nothing if no profile is active or the report is None.
+	"""
+	if _active is not None and report is not None:
+		_active.merge(report)
+
+def bind(function):
+	"""
+	Return a function which runs function inside the current phases, such as to run it in another thread.
+	"""
+	profiler = _active
+	if profiler is None: return function
+	enclosing = list(profiler._stack())
+
+	def run(*args, **kwargs):
+		previous = profiler._stack()[:]
+		profiler._local.stack = list(enclosing)
+		try:
+			return function(*args, **kwargs)
+		finally:
+			profiler._local.stack = previous
+	return run
+
+@contextmanager
+def profile(command, reportFile=None, printSummary=False, collect=False):
+	"""
+	Profile a command, if either a report file or a summary is requested.
+	:param command: The name of the command, used as the outermost phase.
+	:param reportFile: The file to write the JSON report to, even if the command fails.
+	:param printSummary: Print a table of the phases.
+	:param collect: Profile the command even without a report file or summary, so the caller can read the phases from the yielded Profiler.
+	"""
+	global _active
+	if not reportFile and not printSummary and not collect:
+		yield None
+		return
+	previous = _active
+	_active = Profiler(command)
+	try:
+		with _active.phase(command):
+			yield _active
+	finally:
+		profiler, _active = _active, previous
+		if reportFile:
+			profiler.write(reportFile)
+		if printSummary:
+			print(profiler.summary())